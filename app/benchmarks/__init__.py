@@ -0,0 +1,4 @@
+"""
+Benchmark and regression scripts for the parsing hot paths.
+Run them from the app directory, e.g. python -m benchmarks.parser_bench
+"""
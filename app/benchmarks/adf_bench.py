@@ -0,0 +1,76 @@
+"""
+Benchmark of the iterative ADF renderer against the recursive ADFParser on 20 to 2000 block documents.
+
+Also renders a list nested deeper than the recursion limit, which only the iterative renderer handles,
+and times the batch conversion of a Jira-sized corpus: one at a time, then parse_adf_batch uncached
+(worker processes when the batch is large enough, see ADF_PARSER_*) and cached, keyed by issue
+versions (as the Jira fetch does) and by payload hashes.
+
+Usage (from the app directory): python -m benchmarks.adf_bench [--repeat N] [--issues N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.adf_parser import ADFParser
+from services.adf_batch import parse_adf_batch
+from services.cache_manager import CacheManager
+from benchmarks.adf_corpus import build_adf_corpus, build_adf_document, build_deep_document, DEEP_NESTING
+from benchmarks.legacy_adf_parser import LegacyADFParser
+
+
+def time_parser(parser, document, repeat: int) -> float:
+    """Get the best wall-clock time of a parser over several runs, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser(document)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Runs per document (best time is reported)")
+    arg_parser.add_argument("--issues", type=int, default=2000, help="Descriptions in the batch corpus")
+    args = arg_parser.parse_args()
+
+    print(f"{'document':>12} {'ADF KB':>8} {'text KB':>8} {'legacy ms':>10} {'new ms':>8} {'speedup':>8}")
+    for entry in build_adf_corpus():
+        document = entry['document']
+        adf_kb = len(json.dumps(document)) / 1024
+        text_kb = len(ADFParser.parse_adf_to_text(document)) / 1024
+        legacy_ms = time_parser(LegacyADFParser.parse_adf_to_text, document, args.repeat)
+        new_ms = time_parser(ADFParser.parse_adf_to_text, document, args.repeat)
+        print(f"{entry['name']:>12} {adf_kb:>8.1f} {text_kb:>8.1f} {legacy_ms:>10.2f} {new_ms:>8.2f} {legacy_ms / new_ms:>7.1f}x")
+
+    deep = build_deep_document()
+    try:
+        LegacyADFParser.parse_adf_to_text(deep)
+        legacy_result = "ok"
+    except RecursionError:
+        legacy_result = "RecursionError"
+    new_ms = time_parser(ADFParser.parse_adf_to_text, deep, args.repeat)
+    print(f"\nList nested {DEEP_NESTING} levels deep: legacy {legacy_result}, new {new_ms:.2f} ms")
+
+    descriptions = [build_adf_document(10 + seed % 40, seed=seed) for seed in range(args.issues)]
+    versions = [f"BENCH-{seed}@2024-05-02T10:15:32.000+0000" for seed in range(args.issues)]
+    start = time.perf_counter()
+    expected = [ADFParser.parse_adf_to_text(description) for description in descriptions]
+    print(f"\n{args.issues} descriptions, one at a time: {(time.perf_counter() - start) * 1000:.0f} ms")
+    for name, batch_versions in (("issue versions", versions), ("payload hashes", None)):
+        CacheManager.get_cache().invalidate(namespace="adf_text")
+        for run in ("uncached", "cached"):
+            start = time.perf_counter()
+            texts = parse_adf_batch(descriptions, batch_versions)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            assert texts == expected
+            print(f"  batch keyed by {name}, {run}: {elapsed_ms:.0f} ms")
+
+if __name__ == "__main__":
+    main()
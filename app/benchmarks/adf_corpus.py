@@ -0,0 +1,117 @@
+"""
+Synthetic corpus of Jira descriptions in Atlassian Document Format (ADF).
+Documents have the structure of real ticket descriptions: headings, paragraphs with marks and
+links, mentions, hard breaks, nested bullet and ordered lists, task lists, tables with formatted
+cells, panels, blockquotes and code blocks with pasted logs. One document nests lists deeper
+than the Python recursion limit.
+"""
+
+import random
+from typing import Any, Dict, List
+
+# Top-level blocks per document
+DOCUMENT_SIZES = [20, 200, 2000]
+
+# Nesting depth of the deep document (the recursion limit is 1000 by default)
+DEEP_NESTING = 1500
+
+_WORDS = ("the shopper opens checkout and the saved card is preselected while taxes shipping and "
+          "discounts are listed in the order summary before confirming the payment").split()
+_LOG_LINES = [
+    "2024-05-02 10:15:32 ERROR [checkout] POST /v2/orders returned 500",
+    "2024-05-02 10:15:32 WARN  [auth] token refresh failed, retrying in 2s",
+    "    at com.example.checkout.OrderService.submit(OrderService.java:142)",
+    "2024-05-02 10:15:33 INFO  [billing] invoice 4821 generated",
+]
+
+
+def _text(rng: random.Random, words: int) -> Dict[str, Any]:
+    node = {"type": "text", "text": ' '.join(rng.choice(_WORDS) for _ in range(words)) + ' '}
+    marks = []
+    if rng.random() < 0.15:
+        marks.append({"type": "strong"})
+    if rng.random() < 0.1:
+        marks.append({"type": "em"})
+    if rng.random() < 0.05:
+        marks.append({"type": "link", "attrs": {"href": "https://example.atlassian.net/browse/CM-42"}})
+    if rng.random() < 0.05:
+        marks.append({"type": "code"})
+    if marks:
+        node["marks"] = marks
+    return node
+
+
+def _paragraph(rng: random.Random) -> Dict[str, Any]:
+    content = []
+    for _ in range(rng.randint(1, 6)):
+        content.append(_text(rng, rng.randint(2, 12)))
+        roll = rng.random()
+        if roll < 0.1:
+            content.append({"type": "mention", "attrs": {"id": "5b10ac8d82e05b22cc7d4ef5", "text": "@Jane Doe"}})
+        elif roll < 0.2:
+            content.append({"type": "hardBreak"})
+    return {"type": "paragraph", "content": content}
+
+
+def _list(rng: random.Random, depth: int) -> Dict[str, Any]:
+    items = []
+    for _ in range(rng.randint(2, 5)):
+        item_content = [_paragraph(rng)]
+        if depth < 3 and rng.random() < 0.3:
+            item_content.append(_list(rng, depth + 1))
+        items.append({"type": "listItem", "content": item_content})
+    return {"type": rng.choice(["bulletList", "orderedList"]), "content": items}
+
+
+def _table(rng: random.Random) -> Dict[str, Any]:
+    rows = []
+    for row_index in range(rng.randint(2, 8)):
+        cell_type = "tableHeader" if row_index == 0 else "tableCell"
+        rows.append({"type": "tableRow", "content": [
+            {"type": cell_type, "attrs": {}, "content": [_paragraph(rng)]} for _ in range(rng.randint(2, 5))
+        ]})
+    return {"type": "table", "attrs": {"isNumberColumnEnabled": False, "layout": "default"}, "content": rows}
+
+
+def _block(rng: random.Random) -> Dict[str, Any]:
+    roll = rng.random()
+    if roll < 0.4:
+        return _paragraph(rng)
+    if roll < 0.5:
+        return {"type": "heading", "attrs": {"level": rng.randint(1, 4)}, "content": [_text(rng, 3)]}
+    if roll < 0.65:
+        return _list(rng, 0)
+    if roll < 0.7:
+        return {"type": "taskList", "attrs": {"localId": "tasks"}, "content": [
+            {"type": "taskItem", "attrs": {"localId": str(index), "state": rng.choice(["TODO", "DONE"])},
+             "content": [_text(rng, 5)]} for index in range(rng.randint(2, 5))
+        ]}
+    if roll < 0.8:
+        return _table(rng)
+    if roll < 0.87:
+        logs = '\n'.join(rng.choice(_LOG_LINES) for _ in range(rng.randint(3, 40)))
+        return {"type": "codeBlock", "attrs": {"language": "text"}, "content": [{"type": "text", "text": logs}]}
+    if roll < 0.94:
+        return {"type": "panel", "attrs": {"panelType": "info"}, "content": [_paragraph(rng), _list(rng, 1)]}
+    return {"type": "blockquote", "content": [_paragraph(rng)]}
+
+
+def build_adf_document(blocks: int, seed: int = 42) -> Dict[str, Any]:
+    """Build a reproducible ADF document with the given number of top-level blocks."""
+    rng = random.Random(seed)
+    return {"type": "doc", "version": 1, "content": [_block(rng) for _ in range(blocks)]}
+
+
+def build_deep_document(depth: int = DEEP_NESTING) -> Dict[str, Any]:
+    """Build an ADF document with one list nested depth levels deep."""
+    node: Dict[str, Any] = {"type": "paragraph", "content": [{"type": "text", "text": "innermost item"}]}
+    for level in range(depth):
+        node = {"type": "bulletList", "content": [{"type": "listItem", "content": [
+            {"type": "paragraph", "content": [{"type": "text", "text": f"level {depth - level} "}]}, node
+        ]}]}
+    return {"type": "doc", "version": 1, "content": [node]}
+
+
+def build_adf_corpus() -> List[Dict[str, Any]]:
+    """Build the named documents of the benchmark: one per size in DOCUMENT_SIZES."""
+    return [{"name": f"{blocks} blocks", "document": build_adf_document(blocks)} for blocks in DOCUMENT_SIZES]
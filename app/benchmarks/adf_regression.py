@@ -0,0 +1,94 @@
+"""
+Regression check of the iterative ADF renderer against the recursive ADFParser it replaced.
+
+Both must give the same text for the synthetic ADF corpus and a set of malformed or unusual
+documents. A list nested deeper than the recursion limit must render with the new parser (the
+legacy parser raises RecursionError). The batch API (parse_adf_batch and the page-by-page
+ADFBatchParser) must give the same text as converting one description at a time, uncached and cached.
+The sections of every document (extract_sections, and split_sections of its text) must join back
+into its text.
+
+Usage (from the app directory): python -m benchmarks.adf_regression
+"""
+
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.adf_parser import ADFParser
+from services.adf_batch import ADFBatchParser, parse_adf_batch
+from services.cache_manager import CacheManager
+from benchmarks.adf_corpus import build_adf_corpus, build_adf_document, build_deep_document, DEEP_NESTING
+from benchmarks.legacy_adf_parser import LegacyADFParser
+
+EDGE_CASES = [
+    None,
+    "",
+    "Plain text description",
+    "{not json}",
+    {"type": "doc", "content": []},
+    {"type": "other", "content": [{"type": "text", "text": "not a document"}]},
+    {"type": "doc", "content": [None, "text", {"type": "paragraph"}, {"type": "paragraph", "content": None}]},
+    {"type": "doc", "content": [{"type": "paragraph", "content": [{"type": "text", "text": "", "marks": [{"type": "strong"}]}]}]},
+    {"type": "doc", "content": [{"type": "paragraph", "content": [
+        {"type": "text", "text": "link", "marks": [{"type": "link", "attrs": {}}, {"type": "strong"}, {"type": "unknown"}]}]}]},
+    {"type": "doc", "content": [{"type": "heading", "attrs": {"level": 3}}, {"type": "codeBlock", "attrs": {}}]},
+    {"type": "doc", "content": [{"type": "orderedList", "content": [
+        {"type": "paragraph", "content": [{"type": "text", "text": "stray"}]},
+        {"type": "listItem", "content": []},
+        {"type": "listItem", "content": [{"type": "paragraph", "content": [{"type": "text", "text": "third"}]}]}]}]},
+    {"type": "doc", "content": [{"type": "taskList", "content": [{"type": "taskItem", "content": [{"type": "text", "text": "no state"}]}]}]},
+    {"type": "doc", "content": [{"type": "table", "content": [{"type": "tableRow", "content": []}, {"type": "tableRow", "content": [
+        {"type": "tableCell", "content": [{"type": "paragraph", "content": [{"type": "text", "text": "cell"}]}]}]}]}]},
+    {"type": "doc", "content": [{"type": "bulletList", "content": []}, {"type": "paragraph", "content": [{"type": "text", "text": "after"}]}]},
+    json.dumps(build_adf_document(5, seed=3)),
+]
+
+
+def main() -> int:
+    failures = 0
+    documents = [(document['name'], document['document']) for document in build_adf_corpus()]
+    documents += [(f"edge case {index}", case) for index, case in enumerate(EDGE_CASES, 1)]
+    documents += [(f"seed {seed}", build_adf_document(50, seed=seed)) for seed in range(20)]
+    for name, document in documents:
+        expected = LegacyADFParser.parse_adf_to_text(document)
+        rendered = ADFParser.parse_adf_to_text(document)
+        if rendered != expected:
+            failures += 1
+            print(f"{name}: output differs\n    new:    {rendered[:120]!r}\n    legacy: {expected[:120]!r}")
+        for mode, sections in (("extract_sections", ADFParser.extract_sections(document)),
+                               ("split_sections", ADFParser.split_sections(expected))):
+            if "\n".join(section['text'] for section in sections) != expected:
+                failures += 1
+                print(f"{name}: {mode} does not join back into the text")
+
+    expected_texts = [LegacyADFParser.parse_adf_to_text(document) for _, document in documents]
+    CacheManager.get_cache().invalidate(namespace="adf_text")
+    for run in ("uncached", "cached"):
+        if parse_adf_batch([document for _, document in documents]) != expected_texts:
+            failures += 1
+            print(f"parse_adf_batch ({run}): output differs")
+    batch_parser = ADFBatchParser()
+    for start in range(0, len(documents), 7):
+        batch_parser.submit([document for _, document in documents[start:start + 7]])
+    if batch_parser.results() != expected_texts:
+        failures += 1
+        print("ADFBatchParser: output differs")
+
+    try:
+        deep_text = ADFParser.parse_adf_to_text(build_deep_document())
+        if f"level {DEEP_NESTING} " not in deep_text or not deep_text.endswith("innermost item"):
+            failures += 1
+            print("Deep document: text is missing")
+    except RecursionError:
+        failures += 1
+        print("Deep document: RecursionError")
+
+    print(f"{len(documents) + 1} documents, " + ("all match" if not failures else f"{failures} failures"))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Benchmark of cache key generation for similarity analysis keys that include a TestRail corpus.
+
+Compares the previous MD5-over-JSON key with the fingerprint-based key, for a plain list and for a
+FingerprintedList (as returned by the cached TestRail loader).
+
+Usage (from the app directory): python -m benchmarks.cache_key_bench [--repeat N]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.cache_manager import CacheManager
+from services.fingerprint import FingerprintedList, HASH_BACKEND
+
+CORPUS_SIZES = [100, 1000, 5000]
+
+
+def legacy_cache_key(data, prefix: str = "") -> str:
+    """The MD5-over-JSON key used before fingerprints."""
+    if isinstance(data, (dict, list)):
+        data_str = json.dumps(data, sort_keys=True)
+    else:
+        data_str = str(data)
+    return f"{prefix}_{hashlib.md5(data_str.encode()).hexdigest()}"
+
+
+def build_testrail_corpus(size: int):
+    """Build TestRail-like test cases with separated steps."""
+    return [{
+        "id": case_id,
+        "title": f"Verify checkout flow variant {case_id} with saved payment method",
+        "section_id": case_id % 40,
+        "priority_id": case_id % 4 + 1,
+        "refs": f"CM-{1000 + case_id}",
+        "custom_preconds": "User is logged in and has at least one saved card. " * 3,
+        "custom_steps_separated": [
+            {"content": f"Step {step} of case {case_id}: open the page and fill in the form fields",
+             "expected": f"Step {step} succeeds and the confirmation message for case {case_id} is shown"}
+            for step in range(1, 7)
+        ],
+    } for case_id in range(size)]
+
+
+def time_key(key_function, key_data, repeat: int) -> float:
+    """Get the best wall-clock time of a key function over several runs, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        key_function(key_data)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Runs per corpus (best time is reported)")
+    args = arg_parser.parse_args()
+
+    generated = [{"title": "Generated case", "steps": [{"content": "Do something", "expected": "It works"}]}]
+    print(f"Hash backend: {HASH_BACKEND}")
+    print(f"{'cases':>6} {'size MB':>8} {'md5+json ms':>12} {'list ms':>8} {'fingerprinted ms':>17} {'build ms':>9}")
+    for size in CORPUS_SIZES:
+        corpus = build_testrail_corpus(size)
+        start = time.perf_counter()
+        fingerprinted = FingerprintedList(corpus)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        def key_data(existing):
+            return {"generated": generated, "existing": existing, "threshold": 0.5, "user_story_key": "CM-1"}
+
+        legacy_ms = time_key(legacy_cache_key, key_data(corpus), args.repeat)
+        list_ms = time_key(CacheManager._generate_cache_key, key_data(corpus), args.repeat)
+        fingerprinted_ms = time_key(CacheManager._generate_cache_key, key_data(fingerprinted), args.repeat)
+        size_mb = len(json.dumps(corpus)) / (1024 * 1024)
+        print(f"{size:>6} {size_mb:>8.1f} {legacy_ms:>12.2f} {list_ms:>8.2f} {fingerprinted_ms:>17.3f} {build_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
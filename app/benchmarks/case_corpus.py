@@ -0,0 +1,138 @@
+"""
+Synthetic corpus of test case generation outputs.
+Documents follow the output format of prompts/test_case_generation.py (plain text) and the
+older markdown table format, with the variations seen in model output: multi-line actions,
+bulleted preconditions, missing fields, extra blank lines and "Note:" lines.
+"""
+
+import random
+from typing import List
+
+CORPUS_SIZES = [10, 50, 100, 250, 500]
+
+_ACTIONS = [
+    "Navigate to the document library",
+    "Open the workflow settings page",
+    "Upload a PDF document",
+    "Assign the document to a reviewer",
+    "Click the Approve button",
+    "Enter an invalid email address in the sharing dialog",
+    "Log out and log in as the reviewer",
+    "Filter the list by status",
+    "Submit the form without mandatory fields",
+    "Open the notification center",
+]
+_EXPECTED = [
+    "The page loads without errors",
+    "The document is listed with status Draft",
+    "A validation message is displayed",
+    "The reviewer receives a notification",
+    "The status changes to Approved",
+    "The action is blocked with a permissions error",
+    "Only matching documents are displayed",
+]
+_PRECONDITIONS = [
+    "User is logged in as an administrator",
+    "At least one document exists in the library",
+    "Workflow feature flag is enabled",
+    "Reviewer account is active",
+]
+_TITLES = [
+    "Verify document approval workflow",
+    "Validate sharing with invalid email",
+    "Check reviewer notification delivery",
+    "Ensure unauthorized users cannot approve",
+    "Verify filtering documents by status",
+    "Validate mandatory field errors on submit",
+]
+_TAGS = ["Smoke", "Regression", "UI", "API", "Negative", "Workflow", "Permissions", "Notifications"]
+_PRIORITIES = ["Critical", "High", "Medium", "Low"]
+
+
+def _plain_case(rng: random.Random, number: int) -> str:
+    lines = [f"## TC-{number:03d} - {rng.choice(_TITLES)} ({number})" if rng.random() < 0.8
+             else f"TC-{number:03d} - {rng.choice(_TITLES)} ({number})"]
+    lines.append(f"- Scenario ID: S-{number:02d}")
+    lines.append(f"- Priority: {rng.choice(_PRIORITIES)}")
+    lines.append(f"- Automation: {rng.choice(['Yes', 'No'])}")
+    if rng.random() < 0.9:
+        lines.append(f"- Tags: {', '.join(rng.sample(_TAGS, rng.randint(1, 3)))}")
+    lines.append("")
+    lines.append("- Preconditions:")
+    for precondition in rng.sample(_PRECONDITIONS, rng.randint(1, 3)):
+        lines.append(f"- {precondition}" if rng.random() < 0.5 else precondition)
+    lines.append("")
+    lines.append("- Test Steps:")
+    for step in range(1, rng.randint(2, 6) + 1):
+        lines.append(f"{step}. {rng.choice(_ACTIONS)}")
+        if rng.random() < 0.2:
+            lines.append("   using the default test account")
+        lines.append(f"   - Expected: {rng.choice(_EXPECTED)}")
+        lines.append("")
+    if rng.random() < 0.1:
+        lines.append("Note: Run against the staging environment")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def _markdown_case(rng: random.Random, number: int) -> str:
+    lines = [f"### TC-{number:03d} – {rng.choice(_TITLES)} ({number})"]
+    lines.append(f"**Scenario ID:** S-{number:02d}")
+    lines.append(f"**Priority:** {rng.choice(_PRIORITIES)}")
+    lines.append(f"**Automation:** {rng.choice(['Yes', 'No'])}")
+    lines.append(f"**Tags:** {', '.join(rng.sample(_TAGS, rng.randint(1, 3)))}")
+    lines.append("")
+    lines.append("Preconditions |")
+    for precondition in rng.sample(_PRECONDITIONS, rng.randint(1, 3)):
+        lines.append(f"| {precondition} |")
+    lines.append("Test Steps |")
+    lines.append("| # | Action | Expected | Actual | Status |")
+    lines.append("|---|--------|----------|--------|--------|")
+    for step in range(1, rng.randint(2, 6) + 1):
+        lines.append(f"| {step} | {rng.choice(_ACTIONS)} | {rng.choice(_EXPECTED)} | - | Not Run |")
+    lines.append("Notes | Review after execution")
+    lines.append("")
+    return "\n".join(lines)
+
+
+def build_document(case_count: int, markdown: bool = False, seed: int = 0) -> str:
+    """
+    Build one generation output with the given number of test cases
+    
+    Args:
+        case_count: Number of TC-### test cases in the document
+        markdown: Use the markdown table format instead of the plain text format
+        seed: Random seed, so runs are reproducible
+    
+    Returns:
+        The document text
+    """
+    rng = random.Random(seed)
+    parts = [
+        "TRACEABILITY MATRIX",
+        "===================",
+        "| Requirement/AC | Scenario ID(s) |",
+        "|----------------|----------------|",
+    ]
+    parts += [f"| AC-{number} | S-{number:02d} |" for number in range(1, case_count + 1)]
+    parts += ["", "DETAILED TEST CASES", "==================", ""]
+    case_builder = _markdown_case if markdown else _plain_case
+    parts += [case_builder(rng, number) for number in range(1, case_count + 1)]
+    parts += ["EDGE CASES", "=========="]
+    parts += [f"{number}. {rng.choice(_ACTIONS)} twice in a row" for number in range(1, 11)]
+    parts += ["", "TAG GLOSSARY", "============", "- Smoke: Quick tests to verify basic functionality",
+              "- Regression: Tests to ensure existing features still work", ""]
+    return "\n".join(parts)
+
+
+def build_corpus(sizes: List[int] = None, seed: int = 0) -> List[dict]:
+    """Build plain text and markdown documents for every corpus size."""
+    corpus = []
+    for size in sizes or CORPUS_SIZES:
+        for markdown in (False, True):
+            corpus.append({
+                "name": f"{'markdown' if markdown else 'plain'}-{size}",
+                "case_count": size,
+                "text": build_document(size, markdown=markdown, seed=seed + size),
+            })
+    return corpus
@@ -0,0 +1,137 @@
+"""
+Synthetic corpus of Jira user stories and bug tickets for the sanitizer benchmarks.
+Stories and bugs follow the shape returned by JiraClient (key, title, description, and labels for
+bugs) with the sensitive data seen in real tickets: issue keys, Jira links, e-mail addresses,
+client names, system names, API tokens, and some non-ASCII text. Bug descriptions also carry
+pasted log lines with URLs and tokens.
+"""
+
+import random
+from typing import Any, Dict, List
+
+CORPUS_SIZES = [100, 1000]
+
+_TITLES = [
+    "Save payment method during checkout",
+    "Show order history for the last 12 months",
+    "Export invoices as PDF",
+    "Notify the customer when the order ships",
+    "Allow admins to deactivate users",
+    "Filter products by availability",
+]
+_SENTENCES = [
+    "As a registered shopper I want to save my payment method so that checkout is faster.",
+    "Given the cart contains items, when the shopper opens the checkout page, then the saved cards are listed.",
+    "The default card is preselected and the order summary shows taxes, shipping and discounts.",
+    "Error messages are displayed inline and validation happens on blur.",
+    "The export must include every invoice of the selected period, sorted by date.",
+    "Only users with the administrator role can see the deactivate button.",
+    "The list refreshes without reloading the page when a filter changes.",
+    "Out-of-stock products are shown greyed out at the end of the list.",
+]
+_SENSITIVE = [
+    "Follow-up of CM-{n}.",
+    "See https://company.atlassian.net/browse/CM-{n} for the original request.",
+    "Reported by rafael.fernandes@company.com.",
+    "Contact qa.team{n}@example.org for test accounts.",
+    "client: Acme Retail",
+    "The BE contract is documented in the API reference.",
+    "Depends on PROJ-{n} and TASK-{n}.",
+    "Staging token AIza{token}",
+    "Check the System settings in the PM tool.",
+    "Docs: www.example.com/docs/checkout",
+    "Traduções e acentuação devem ser exibidas corretamente (ção, é, ü).",
+]
+
+
+_BUG_TITLES = [
+    "Checkout fails with a 500 error for saved cards",
+    "Invoice PDF is empty for orders with discounts",
+    "Order history shows duplicated entries",
+    "Deactivated users can still log in",
+    "Availability filter ignores out-of-stock products",
+]
+_BUG_STEPS = [
+    "Log in as a registered shopper.",
+    "Add two items to the cart and open the checkout page.",
+    "Select the saved card and confirm the order.",
+    "Open the order history and filter by the last 30 days.",
+    "Export the invoice of the latest order.",
+    "Deactivate the user from the admin panel and log in again.",
+]
+_BUG_RESULTS = [
+    "Expected: the order is confirmed. Actual: an error page is displayed.",
+    "Expected: the PDF lists every item. Actual: the PDF has no lines.",
+    "Expected: each order is listed once. Actual: orders appear twice.",
+    "Expected: the login is rejected. Actual: the user reaches the dashboard.",
+]
+_LOG_LINES = [
+    "ERROR [checkout] POST https://api.example.com/v2/orders returned 500 (request id {token})",
+    "WARN  [auth] token refresh failed for user: Jane Doe",
+    "INFO  [billing] invoice {n} generated by billing@company.com",
+    "DEBUG [http] Authorization: Bearer ATATT{long_token}",
+    "ERROR [payments] provider key sk-{key} rejected",
+    "at com.company.checkout.OrderService.submit(OrderService.java:{n})",
+]
+_LABELS = ["regression", "checkout", "BE", "FE", "customer-reported", "CM-hotfix", "payments", "ux"]
+
+
+def _token(rng: random.Random, length: int = 35) -> str:
+    return ''.join(rng.choice("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789") for _ in range(length))
+
+
+def build_story(rng: random.Random, number: int) -> Dict[str, str]:
+    """Build one story with 2 to 5 paragraphs and 0 to 4 sensitive values."""
+    paragraphs = []
+    for _ in range(rng.randint(2, 5)):
+        sentences = [rng.choice(_SENTENCES) for _ in range(rng.randint(2, 6))]
+        if rng.random() < 0.6:
+            sentences.insert(rng.randrange(len(sentences) + 1),
+                             rng.choice(_SENSITIVE).format(n=rng.randint(1, 9999), token=_token(rng)))
+        paragraphs.append(' '.join(sentences))
+    return {
+        "key": f"CM-{1000 + number}",
+        "title": f"{rng.choice(_TITLES)} ({number})",
+        "description": '\n\n'.join(paragraphs),
+    }
+
+
+def build_story_corpus(size: int, seed: int = 42) -> List[Dict[str, str]]:
+    """Build a reproducible corpus of stories."""
+    rng = random.Random(seed)
+    return [build_story(rng, number) for number in range(size)]
+
+
+def build_bug(rng: random.Random, number: int) -> Dict[str, Any]:
+    """Build one bug with steps to reproduce, expected and actual results, 0 to 8 log lines and 0 to 3 labels."""
+    steps = rng.sample(_BUG_STEPS, rng.randint(2, 4))
+    lines = ["Steps to reproduce:"] + [f"{index}. {step}" for index, step in enumerate(steps, 1)]
+    lines.append(rng.choice(_BUG_RESULTS))
+    if rng.random() < 0.5:
+        lines.append(rng.choice(_SENSITIVE).format(n=rng.randint(1, 9999), token=_token(rng)))
+    log_lines = [rng.choice(_LOG_LINES).format(n=rng.randint(1, 9999), token=_token(rng, 32),
+                                               long_token=_token(rng, 120), key=_token(rng, 48))
+                 for _ in range(rng.choice([0, 0, 2, 8]))]
+    if log_lines:
+        lines += ["", "Logs:"] + log_lines
+    return {
+        "key": f"CM-{5000 + number}",
+        "title": f"{rng.choice(_BUG_TITLES)} ({number})",
+        "description": '\n'.join(lines),
+        "labels": rng.sample(_LABELS, rng.randint(0, 3)),
+    }
+
+
+def build_bug_corpus(size: int, seed: int = 7) -> List[Dict[str, Any]]:
+    """Build a reproducible corpus of bug tickets."""
+    rng = random.Random(seed)
+    return [build_bug(rng, number) for number in range(size)]
+
+
+def build_text_corpus(size: int) -> List[str]:
+    """Get every field of size stories and size bugs (labels included), as sanitize_stories_list and sanitize_bugs_list see them."""
+    texts = [story[field] for story in build_story_corpus(size) for field in ('key', 'title', 'description')]
+    for bug in build_bug_corpus(size):
+        texts.extend(bug[field] for field in ('key', 'title', 'description'))
+        texts.extend(bug['labels'])
+    return texts
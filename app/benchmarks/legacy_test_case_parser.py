@@ -0,0 +1,256 @@
+"""
+Reference copy of the regex-cascade extract_test_case_info that testrail_client.py used
+before the single-pass parser. Kept unchanged so the benchmark and regression scripts
+can compare both implementations on the same corpus.
+"""
+
+import re
+from typing import List, Dict
+import streamlit as st
+
+def extract_test_case_info_legacy(text: str) -> List[Dict]:
+    """Extract test case information from AI-generated text."""
+    test_cases = []
+    format_detected = "None"
+    
+    # First, try to extract from the new plain text TC-### format
+    tc_pattern = r'TC-\d+\s*-\s*(.+?)(?=\n|$)'
+    tc_matches = list(re.finditer(tc_pattern, text, re.IGNORECASE | re.DOTALL))
+    
+    if tc_matches:
+        format_detected = "Plain text TC-### format"
+        st.info(f"🔍 Detected {len(tc_matches)} test cases in plain text format")
+        
+        for match in tc_matches:
+            title = match.group(1).strip()
+            
+            # Look for the content that follows this TC section
+            start_pos = match.end()
+            # Find the next section or end of text
+            next_section = re.search(r'TC-\d+', text[start_pos:], re.IGNORECASE)
+            if next_section:
+                end_pos = start_pos + next_section.start()
+            else:
+                end_pos = len(text)
+            
+            tc_content = text[start_pos:end_pos]
+            
+            # Extract information from the plain text format
+            steps = []
+            preconditions = ''
+            expected_results = ''
+            automation = 'No'  # Default value
+            priority = 'Medium'  # Default value
+            tags = ''  # Default value
+            scenario_id = ''  # Default value
+            
+            # Extract Scenario ID
+            scenario_match = re.search(r'Scenario ID:\s*([^\n]+)', tc_content, re.IGNORECASE)
+            if scenario_match:
+                scenario_id = scenario_match.group(1).strip()
+            
+            # Extract Priority
+            priority_match = re.search(r'Priority:\s*([^\n]+)', tc_content, re.IGNORECASE)
+            if priority_match:
+                priority = priority_match.group(1).strip()
+            
+            # Extract Automation status
+            automation_match = re.search(r'Automation:\s*([^\n]+)', tc_content, re.IGNORECASE)
+            if automation_match:
+                automation = automation_match.group(1).strip()
+            
+            # Extract Tags
+            tags_match = re.search(r'Tags:\s*([^\n]+)', tc_content, re.IGNORECASE)
+            if tags_match:
+                tags = tags_match.group(1).strip()
+            
+            # Extract preconditions
+            precond_match = re.search(r'Preconditions:\s*\n(.*?)(?=\n\w+:|$)', tc_content, re.IGNORECASE | re.DOTALL)
+            if precond_match:
+                preconditions = precond_match.group(1).strip()
+            
+            # Extract test steps with expected results
+            steps_match = re.search(r'Test Steps:\s*\n(.*?)(?=\n\w+:|$)', tc_content, re.IGNORECASE | re.DOTALL)
+            if steps_match:
+                steps_text = steps_match.group(1)
+                
+                # Parse numbered steps with expected results in the format:
+                # 1. [Action/Step]
+                #    - Expected: [Expected result]
+                step_pattern = r'(\d+)\.\s*(.+?)(?=\n\s*-\s*Expected:|\n\d+\.|\n\w+:|$)'
+                expected_pattern = r'-\s*Expected:\s*(.+?)(?=\n\d+\.|\n\w+:|$)'
+                
+                step_matches = list(re.finditer(step_pattern, steps_text, re.DOTALL))
+                expected_matches = list(re.finditer(expected_pattern, steps_text, re.DOTALL))
+                
+                for i, step_match in enumerate(step_matches):
+                    step_content = step_match.group(2).strip()
+                    expected = ''
+                    
+                    # Find corresponding expected result
+                    if i < len(expected_matches):
+                        expected = expected_matches[i].group(1).strip()
+                    
+                    steps.append({
+                        'content': step_content,
+                        'expected': expected
+                    })
+            
+            # If no structured steps found, try alternative patterns
+            if not steps:
+                # Look for simple numbered steps (without expected results)
+                simple_step_pattern = r'(\d+)\.\s*(.+?)(?=\n\d+\.|\n\w+:|$)'
+                simple_matches = re.findall(simple_step_pattern, tc_content, re.DOTALL)
+                for step_num, step_content in simple_matches:
+                    steps.append({'content': step_content.strip(), 'expected': ''})
+                
+                # Also try to find any remaining numbered steps in the entire content
+                if not steps:
+                    remaining_step_pattern = r'(\d+)\.\s*(.+?)(?=\n\d+\.|\n\w+:|$)'
+                    remaining_matches = re.findall(remaining_step_pattern, tc_content, re.DOTALL)
+                    for step_num, step_content in remaining_matches:
+                        steps.append({'content': step_content.strip(), 'expected': ''})
+            
+            # Create test case structure with all extracted fields
+            test_case = {
+                'title': title,
+                'steps': steps if steps else [{'content': 'Test case steps not found', 'expected': ''}],
+                'preconditions': preconditions,
+                'expected_results': expected_results,
+                'automation': automation,
+                'priority': priority,
+                'tags': tags,
+                'scenario_id': scenario_id
+            }
+            
+            test_cases.append(test_case)
+    
+    # If no plain text format found, try the markdown format
+    if not test_cases:
+        # Look for markdown format
+        tc_pattern = r'###\s*TC-\d+\s*–\s*(.+?)(?=\n|$)'
+        tc_matches = list(re.finditer(tc_pattern, text, re.IGNORECASE | re.DOTALL))
+        
+        if tc_matches:
+            format_detected = "Markdown format"
+            st.info(f"🔍 Detected {len(tc_matches)} test cases in markdown format")
+            
+            for match in tc_matches:
+                title = match.group(1).strip()
+                
+                # Look for the content that follows this TC section
+                start_pos = match.end()
+                # Find the next section or end of text
+                next_section = re.search(r'###\s*TC-\d+', text[start_pos:], re.IGNORECASE)
+                if next_section:
+                    end_pos = start_pos + next_section.start()
+                else:
+                    end_pos = len(text)
+                
+                tc_content = text[start_pos:end_pos]
+                
+                # Extract information from markdown format
+                steps = []
+                preconditions = ''
+                expected_results = ''
+                automation = 'No'  # Default value
+                priority = 'Medium'  # Default value
+                tags = ''  # Default value
+                scenario_id = ''  # Default value
+                
+                # Extract Scenario ID
+                scenario_match = re.search(r'\*\*Scenario ID:\*\*\s*([^\n]+)', tc_content, re.IGNORECASE)
+                if scenario_match:
+                    scenario_id = scenario_match.group(1).strip()
+                
+                # Extract Priority
+                priority_match = re.search(r'\*\*Priority:\*\*\s*([^\n]+)', tc_content, re.IGNORECASE)
+                if priority_match:
+                    priority = priority_match.group(1).strip()
+                
+                # Extract Automation status
+                automation_match = re.search(r'\*\*Automation:\*\*\s*([^\n]+)', tc_content, re.IGNORECASE)
+                if automation_match:
+                    automation = automation_match.group(1).strip()
+                
+                # Extract Tags
+                tags_match = re.search(r'\*\*Tags:\*\*\s*([^\n]+)', tc_content, re.IGNORECASE)
+                if tags_match:
+                    tags = tags_match.group(1).strip()
+                
+                # Extract preconditions from markdown table
+                precond_match = re.search(r'Preconditions\s*\|\s*\n(.*?)(?=\n\w+\s*\|)', tc_content, re.IGNORECASE | re.DOTALL)
+                if precond_match:
+                    preconditions = precond_match.group(1).strip()
+                
+                # Extract test steps from markdown table
+                steps_match = re.search(r'Test Steps\s*\|\s*\n(.*?)(?=\n\w+\s*\|)', tc_content, re.IGNORECASE | re.DOTALL)
+                if steps_match:
+                    steps_text = steps_match.group(1)
+                    # Parse table rows
+                    row_pattern = r'(\d+)\s*\|\s*(.+?)\s*\|\s*(.+?)\s*\|\s*(.+?)\s*\|\s*(.+?)\s*\|'
+                    row_matches = re.findall(row_pattern, steps_text, re.DOTALL)
+                    
+                    for row in row_matches:
+                        step_num, action, expected, actual, status = row
+                        steps.append({
+                            'content': action.strip(),
+                            'expected': expected.strip()
+                        })
+                
+                # Create test case structure with all extracted fields
+                test_case = {
+                    'title': title,
+                    'steps': steps if steps else [{'content': 'Test case steps not found', 'expected': ''}],
+                    'preconditions': preconditions,
+                    'expected_results': expected_results,
+                    'automation': automation,
+                    'priority': priority,
+                    'tags': tags,
+                    'scenario_id': scenario_id
+                }
+                
+                test_cases.append(test_case)
+    
+    # If still no test cases found, try legacy format
+    if not test_cases:
+        format_detected = "Legacy format"
+        st.info("🔍 Trying legacy format extraction")
+        
+        # Simple extraction for legacy format
+        lines = text.split('\n')
+        current_case = None
+        
+        for line in lines:
+            line = line.strip()
+            if line.startswith('TC-') and '-' in line:
+                if current_case:
+                    test_cases.append(current_case)
+                
+                # Extract title
+                title = line.split('-', 1)[1].strip()
+                current_case = {
+                    'title': title,
+                    'steps': [],
+                    'preconditions': '',
+                    'expected_results': '',
+                    'automation': 'No',
+                    'priority': 'Medium',
+                    'tags': '',
+                    'scenario_id': ''
+                }
+            elif current_case and line.startswith(('1.', '2.', '3.', '4.', '5.')):
+                step_content = line.split('.', 1)[1].strip()
+                current_case['steps'].append({'content': step_content, 'expected': ''})
+        
+        if current_case:
+            test_cases.append(current_case)
+    
+    st.info(f"🔍 Extracted {len(test_cases)} test cases using {format_detected}")
+    
+    # Debug: Show automation status for first few cases
+    for i, case in enumerate(test_cases[:3]):
+        st.info(f"🔍 Case {i+1}: Automation = '{case.get('automation', 'N/A')}', Priority = '{case.get('priority', 'N/A')}'")
+    
+    return test_cases
+
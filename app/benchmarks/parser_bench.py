@@ -0,0 +1,43 @@
+"""
+Benchmark of extract_test_case_info against the legacy regex parser on 10 to 500 test cases.
+
+Usage (from the app directory): python -m benchmarks.parser_bench [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from testrail_client import extract_test_case_info
+from benchmarks.case_corpus import build_corpus
+from benchmarks.legacy_test_case_parser import extract_test_case_info_legacy
+
+
+def time_parser(parser, text: str, repeat: int) -> float:
+    """Get the best wall-clock time of a parser over several runs, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Runs per document (best time is reported)")
+    args = arg_parser.parse_args()
+    
+    print(f"{'document':>14} {'size KB':>8} {'legacy ms':>10} {'new ms':>8} {'speedup':>8}")
+    for document in build_corpus():
+        text = document['text']
+        legacy_ms = time_parser(extract_test_case_info_legacy, text, args.repeat)
+        new_ms = time_parser(extract_test_case_info, text, args.repeat)
+        print(f"{document['name']:>14} {len(text) / 1024:>8.1f} {legacy_ms:>10.2f} {new_ms:>8.2f} {legacy_ms / new_ms:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Regression check of extract_test_case_info against the legacy regex parser.
+
+Both parsers must find the same test cases with the same title, scenario ID, priority,
+automation flag and tags. The legacy parser let text run past section boundaries (the test
+steps ended up in the preconditions, and the EDGE CASES list in the last test case), so for
+preconditions and steps the new value must be the start of the legacy value.
+
+Usage (from the app directory): python -m benchmarks.parser_regression
+"""
+
+import os
+import sys
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from testrail_client import extract_test_case_info
+from benchmarks.case_corpus import build_corpus
+from benchmarks.legacy_test_case_parser import extract_test_case_info_legacy
+
+EXACT_FIELDS = ['title', 'scenario_id', 'priority', 'automation', 'tags', 'expected_results']
+
+
+def compare_cases(new_cases: List[Dict], legacy_cases: List[Dict]) -> List[str]:
+    """
+    Compare the output of both parsers for one document
+    
+    Returns:
+        List of differences (empty if the outputs are equivalent)
+    """
+    if len(new_cases) != len(legacy_cases):
+        return [f"found {len(new_cases)} test cases, legacy parser found {len(legacy_cases)}"]
+    
+    differences = []
+    for index, (new, legacy) in enumerate(zip(new_cases, legacy_cases), 1):
+        for field in EXACT_FIELDS:
+            if new[field] != legacy[field]:
+                differences.append(f"case {index} {field}: {new[field]!r} != {legacy[field]!r}")
+        if not legacy['preconditions'].startswith(new['preconditions']):
+            differences.append(f"case {index} preconditions: {new['preconditions']!r} is not a prefix of {legacy['preconditions']!r}")
+        if len(new['steps']) > len(legacy['steps']):
+            differences.append(f"case {index}: {len(new['steps'])} steps, legacy parser found {len(legacy['steps'])}")
+            continue
+        for step_number, (new_step, legacy_step) in enumerate(zip(new['steps'], legacy['steps']), 1):
+            for key in ('content', 'expected'):
+                if not legacy_step[key].startswith(new_step[key]):
+                    differences.append(f"case {index} step {step_number} {key}: {new_step[key]!r} != {legacy_step[key]!r}")
+    return differences
+
+
+def main() -> int:
+    failures = 0
+    for document in build_corpus():
+        new_cases = extract_test_case_info(document['text'])
+        legacy_cases = extract_test_case_info_legacy(document['text'])
+        differences = compare_cases(new_cases, legacy_cases)
+        if len(new_cases) != document['case_count']:
+            differences.insert(0, f"expected {document['case_count']} test cases, found {len(new_cases)}")
+        status = "OK" if not differences else f"{len(differences)} differences"
+        print(f"{document['name']:>14}: {len(new_cases)} test cases - {status}")
+        for difference in differences[:5]:
+            print(f"    {difference}")
+        failures += bool(differences)
+    
+    print("All documents match" if not failures else f"{failures} documents differ")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
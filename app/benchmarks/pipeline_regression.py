@@ -0,0 +1,107 @@
+"""
+Regression check of the early start of test case generation in the QA pipeline.
+
+Analysis outputs in the format of the user story analysis prompt (one heading per task) are
+streamed in small chunks through quality_risks_ready, as run_story_pipeline does. The risks section
+must be detected complete before the stream ends (while the Focus Areas and Open Questions are still
+being written), and the risks extracted at that point must be the Impact & Risk Assessment section
+only, the same as extracted from the complete output.
+
+Usage (from the app directory): python -m benchmarks.pipeline_regression
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.qa_pipeline import extract_quality_risks, quality_risks_ready
+
+# Streamed chunk size, about what Gemini sends per chunk
+CHUNK_CHARS = 24
+
+_RISKS = """- **Checkout summary**: totals are recalculated when the saved card changes.
+- **Payments API**: a second submit while the first is pending may create two orders.
+- Risk: duplicate order on double submit - **Likelihood 3 × Impact 5**
+- Risk: stale tax total after changing the shipping address - **Likelihood 4 × Impact 3**"""
+
+_FOCUS_AND_QUESTIONS = """- Boundary values of discount codes (0%, 100%, expired)
+- Role permissions of guest and registered shoppers
+- Concurrency of submit and payment confirmation
+
+{questions}
+1. Should the saved card be preselected for guest shoppers?
+2. What happens when the tax service is unavailable?"""
+
+_UNDERSTANDING = """The shopper sees the saved card preselected at checkout and can confirm the payment with taxes,
+shipping and discounts listed in the order summary."""
+
+_CONNECTIONS = """- CM-101 Saved cards: shares the card vault component.
+- CM-87 Order summary: the same totals are rendered."""
+
+ANALYSIS_OUTPUTS = {
+    "markdown headings": f"""### 1. Confirm Understanding
+{_UNDERSTANDING}
+
+### 2. Contextual Connections
+{_CONNECTIONS}
+
+### 3. Impact & Risk Assessment
+{_RISKS}
+
+### 4. Focus Areas for Test Analysis
+{_FOCUS_AND_QUESTIONS.format(questions="### 5. Open Questions for the Team")}
+""",
+    "bold numbered headings": f"""**1. Confirm Understanding**
+{_UNDERSTANDING}
+
+**2. Contextual Connections**
+{_CONNECTIONS}
+
+**3. Impact and Risk Assessment**
+{_RISKS}
+
+**4. Focus Areas for Test Analysis**
+{_FOCUS_AND_QUESTIONS.format(questions="**5. Open Questions for the Team**")}
+""",
+    "quality risks label": f"""Understanding: {_UNDERSTANDING}
+
+Quality Risks:
+{_RISKS}
+
+Suggested Areas for Focus:
+{_FOCUS_AND_QUESTIONS.format(questions="Open Questions:")}
+""",
+}
+
+
+def main() -> int:
+    failures = 0
+    for name, output in ANALYSIS_OUTPUTS.items():
+        chunks = [output[start:start + CHUNK_CHARS] for start in range(0, len(output), CHUNK_CHARS)]
+        streamed = ""
+        ready_at = None
+        for index, chunk in enumerate(chunks):
+            streamed += chunk
+            if quality_risks_ready(streamed):
+                ready_at = index
+                break
+
+        if ready_at is None or ready_at >= len(chunks) - 1:
+            failures += 1
+            print(f"{name}: risks only detected when the stream ended")
+            continue
+        early_risks = extract_quality_risks(streamed)
+        if early_risks != _RISKS or extract_quality_risks(output) != _RISKS:
+            failures += 1
+            print(f"{name}: extracted risks differ\n    early: {early_risks[:120]!r}\n    full:  {extract_quality_risks(output)[:120]!r}")
+            continue
+        print(f"{name}: generation starts at chunk {ready_at + 1} of {len(chunks)} "
+              f"({len(streamed) * 100 // len(output)}% of the analysis streamed)")
+
+    print(f"{len(ANALYSIS_OUTPUTS)} analysis outputs, " + ("all match" if not failures else f"{failures} failures"))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
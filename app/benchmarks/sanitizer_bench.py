@@ -0,0 +1,117 @@
+"""
+Benchmark of the single-pass sanitizer against the sequential reference on 100 and 1000 stories and bugs.
+
+Times every story and bug field without the cache, as on a cache miss, in ms and MB/s; then
+whole story lists sanitized field by field (sanitize_user_story) and in one batch
+(sanitize_stories_list), with an empty and with a warm cache; then the cost of each pattern
+category (and of the fixed-string replacements) applied on its own, to judge new patterns.
+
+Usage (from the app directory): python -m benchmarks.sanitizer_bench [--repeat N]
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.cache_manager import CacheManager
+from services.data_sanitizer import DataSanitizer
+from benchmarks.jira_corpus import CORPUS_SIZES, build_story_corpus, build_text_corpus
+
+
+def time_sanitizer(sanitize, texts, repeat: int) -> float:
+    """Get the best wall-clock time to sanitize every text over several runs, in milliseconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            sanitize(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def time_cold_and_warm(sanitize_stories, stories, repeat: int):
+    """Get the time of one run with an empty sanitization cache and the best time of warm runs, in milliseconds."""
+    CacheManager.get_cache().invalidate(namespace="sanitized_text")
+    start = time.perf_counter()
+    sanitize_stories(stories)
+    cold_ms = (time.perf_counter() - start) * 1000
+    return cold_ms, time_sanitizer(sanitize_stories, [stories], repeat)
+
+
+def megabytes_per_second(texts, milliseconds: float) -> float:
+    """Get the throughput of sanitizing texts, in MB of text (UTF-8) per second."""
+    return sum(len(text.encode("utf-8")) for text in texts) / 1e6 / (milliseconds / 1000)
+
+
+def time_categories(sanitizer: DataSanitizer, texts, repeat: int):
+    """
+    Time each pattern category applied on its own (the patterns one after another, as sanitize_sequential does)
+
+    Returns:
+        List of (category, patterns, replacements made by the engine, ms); the fixed-string
+        replacements are reported as custom_values
+    """
+    matches = Counter(category for text in texts for _, _, category, _ in sanitizer.engine.sanitize_with_matches(text)[1])
+    results = []
+    for category, patterns in sanitizer.sensitive_patterns.items():
+        compiled = [re.compile(pattern, re.IGNORECASE) for pattern in dict.fromkeys(patterns)]
+        replacement = sanitizer.replacements[category]
+
+        def apply_category(text, compiled=compiled, replacement=replacement):
+            for pattern in compiled:
+                text = pattern.sub(replacement, text)
+            return text
+
+        results.append((category, len(compiled), matches[category], time_sanitizer(apply_category, texts, repeat)))
+
+    def apply_literals(text):
+        for original, replacement in sanitizer.custom_replacements.items():
+            text = text.replace(original, replacement)
+        return text
+
+    results.append(("custom_values", len(sanitizer.custom_replacements), matches["custom_values"],
+                    time_sanitizer(apply_literals, texts, repeat)))
+    return results
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--repeat", type=int, default=5, help="Runs per corpus (best time is reported)")
+    args = arg_parser.parse_args()
+
+    sanitizer = DataSanitizer()
+    engine = sanitizer.engine
+    print(f"{'stories':>8} {'bugs':>5} {'size KB':>8} {'sequential ms':>14} {'MB/s':>6} {'single pass ms':>15} {'MB/s':>6} {'speedup':>8}")
+    for size in CORPUS_SIZES:
+        texts = build_text_corpus(size)
+        sequential_ms = time_sanitizer(engine.sanitize_sequential, texts, args.repeat)
+        single_pass_ms = time_sanitizer(engine.sanitize, texts, args.repeat)
+        size_kb = sum(len(text) for text in texts) / 1024
+        print(f"{size:>8} {size:>5} {size_kb:>8.1f} {sequential_ms:>14.1f} {megabytes_per_second(texts, sequential_ms):>6.2f} "
+              f"{single_pass_ms:>15.1f} {megabytes_per_second(texts, single_pass_ms):>6.2f} {sequential_ms / single_pass_ms:>7.1f}x")
+
+    print(f"\n{'stories':>8} {'per field cold ms':>18} {'batch cold ms':>14} {'per field warm ms':>18} {'batch warm ms':>14}")
+    for size in CORPUS_SIZES:
+        stories = build_story_corpus(size)
+        field_cold_ms, field_warm_ms = time_cold_and_warm(
+            lambda story_list: [sanitizer.sanitize_user_story(story) for story in story_list], stories, args.repeat)
+        batch_cold_ms, batch_warm_ms = time_cold_and_warm(sanitizer.sanitize_stories_list, stories, args.repeat)
+        print(f"{size:>8} {field_cold_ms:>18.1f} {batch_cold_ms:>14.1f} {field_warm_ms:>18.1f} {batch_warm_ms:>14.1f}")
+
+    texts = build_text_corpus(CORPUS_SIZES[-1])
+    categories = time_categories(sanitizer, texts, args.repeat)
+    total_ms = sum(milliseconds for _, _, _, milliseconds in categories)
+    print(f"\nPattern categories on their own ({CORPUS_SIZES[-1]} stories and bugs)")
+    print(f"{'category':>15} {'patterns':>9} {'replacements':>13} {'ms':>8} {'MB/s':>7} {'share':>6}")
+    for category, pattern_count, replacements, milliseconds in categories:
+        print(f"{category:>15} {pattern_count:>9} {replacements:>13} {milliseconds:>8.1f} "
+              f"{megabytes_per_second(texts, milliseconds):>7.2f} {milliseconds / total_ms:>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Golden-output check of DataSanitizer.sanitize_text.
+
+The fixture (benchmarks/fixtures/sanitizer_golden.json) holds texts of the synthetic story and bug
+corpus and the texts of sanitizer_regression.EDGE_CASES, with their output from sanitize_text
+when the fixture was built. Any engine change must reproduce it exactly; a pattern change that is
+meant to change the output needs the fixture rebuilt (--update) and the diff reviewed.
+
+Usage (from the app directory): python -m benchmarks.sanitizer_golden [--update]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.data_sanitizer import DataSanitizer
+from benchmarks.jira_corpus import build_text_corpus
+from benchmarks.sanitizer_regression import EDGE_CASES
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "sanitizer_golden.json")
+
+# Stories and bugs in the fixture
+GOLDEN_CORPUS_SIZE = 50
+
+
+def build_fixture(sanitizer: DataSanitizer) -> dict:
+    """Sanitize the golden texts with the current rules."""
+    texts = list(dict.fromkeys(build_text_corpus(GOLDEN_CORPUS_SIZE) + EDGE_CASES))
+    return {
+        "rules_fingerprint": sanitizer.rules_fingerprint,
+        "cases": [{"text": text, "sanitized": sanitizer.sanitize_text(text)} for text in texts],
+    }
+
+
+def main() -> int:
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--update", action="store_true", help="Rebuild the fixture from the current sanitize_text")
+    args = arg_parser.parse_args()
+
+    sanitizer = DataSanitizer()
+    if sanitizer.pseudonymize:
+        print("Unset SANITIZER_PSEUDONYMIZE: the fixture holds the placeholder output")
+        return 2
+
+    if args.update:
+        os.makedirs(os.path.dirname(FIXTURE_PATH), exist_ok=True)
+        with open(FIXTURE_PATH, "w", encoding="utf-8") as fixture_file:
+            json.dump(build_fixture(sanitizer), fixture_file, ensure_ascii=False, indent=1)
+            fixture_file.write("\n")
+        print(f"Fixture written to {FIXTURE_PATH}")
+        return 0
+
+    with open(FIXTURE_PATH, encoding="utf-8") as fixture_file:
+        fixture = json.load(fixture_file)
+    if fixture["rules_fingerprint"] != sanitizer.rules_fingerprint:
+        print("The sanitization rules changed since the fixture was built; rebuild it with --update "
+              "if the differences below are intended")
+
+    failures = 0
+    for case in fixture["cases"]:
+        sanitized = sanitizer.sanitize_text(case["text"])
+        if sanitized != case["sanitized"]:
+            failures += 1
+            print(f"Mismatch for {case['text'][:60]!r}:\n    now:    {sanitized[:120]!r}\n    golden: {case['sanitized'][:120]!r}")
+    print(f"{len(fixture['cases'])} golden texts, " + ("all match" if not failures else f"{failures} differ"))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Regression check of the single-pass sanitizer against the sequential reference.
+
+Every story and bug field of the synthetic corpus, and a set of texts where the rules interact, must be
+sanitized exactly as when the patterns are applied one after another. Texts the single scan hands
+over to the sequential path are counted; they must stay a small share of the corpus. The matches
+reported by sanitize_with_matches must give the same text when replaced in the original one, and
+the corpus streamed in small, unevenly cut chunks through small windows must sanitize as one text.
+
+Usage (from the app directory): python -m benchmarks.sanitizer_regression
+"""
+
+import os
+import random
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.data_sanitizer import DataSanitizer
+from benchmarks.jira_corpus import build_text_corpus
+
+# Texts where a rule matches inside another rule's match, or a placeholder changes a word boundary
+EDGE_CASES = [
+    "client: Acme CM team",
+    "user: john.doe@example.org",
+    "project = CM and project = ABC",
+    "project=CM-123",
+    "https://company.atlassian.net/browse/CM-42?assignee=rafael.fernandes@company.com",
+    "https://example.com/comp any",
+    "BEhttps://example.com",
+    "TST-1, TESTS, BUTTON, mycompany, Company.com, company.atlassian.net",
+    "sk-" + "a" * 48 + " and ATATT" + "b" * 120,
+    "Ticket CM-7 (customer: Big & Small Co) owned by the FE/BE squads",
+    "Ação no sistema: client: Ünïcode Corp, contato josé@empresa.com.br",
+    # Whitespace gaps as long as the rules allow, so the match is longer than most windows' overlap
+    "client" + " " * 32 + ": Acme Corp",
+    "project" + " " * 32 + "=" + "\n" * 32 + "CM",
+    "",
+]
+
+MAX_SEQUENTIAL_SHARE = 0.1
+
+# Small windows, so the streamed corpus is cut thousands of times; the overlap fits the longest
+# bounded match (a rule with two full whitespace gaps)
+STREAM_WINDOW_CHARS = 512
+STREAM_OVERLAP_CHARS = 80
+
+
+def rebuild(text, matches) -> str:
+    """Replace the reported matches in the original text."""
+    parts = []
+    position = 0
+    for start, end, _, replacement in matches:
+        if start < position or end < start:
+            return "<matches out of order>"
+        parts.append(text[position:start])
+        parts.append(replacement)
+        position = end
+    parts.append(text[position:])
+    return ''.join(parts)
+
+
+def main() -> int:
+    sanitizer = DataSanitizer()
+    engine = sanitizer.engine
+    texts = build_text_corpus(1000)
+
+    failures = 0
+    sequential = 0
+    for text in texts + EDGE_CASES:
+        expected = engine.sanitize_sequential(text)
+        scanned = engine.scan(text)
+        if scanned is None:
+            sequential += 1
+        elif scanned != expected:
+            failures += 1
+            print(f"Mismatch for {text[:60]!r}:\n    single pass: {scanned[:120]!r}\n    sequential:  {expected[:120]!r}")
+        if engine.sanitize(text) != expected:
+            failures += 1
+            print(f"sanitize() differs from the sequential reference for {text[:60]!r}")
+        sanitized, matches = engine.sanitize_with_matches(text)
+        if sanitized != expected or rebuild(text, matches) != expected:
+            failures += 1
+            print(f"sanitize_with_matches() differs from the sequential reference for {text[:60]!r}")
+
+    corpus = '\n\n'.join(texts + EDGE_CASES)
+    rng = random.Random(7)
+    cuts = sorted(rng.sample(range(1, len(corpus)), len(corpus) // 300))
+    chunks = [corpus[start:end] for start, end in zip([0] + cuts, cuts + [len(corpus)])]
+    streamed = ''.join(engine.sanitize_stream(chunks, STREAM_WINDOW_CHARS, STREAM_OVERLAP_CHARS))
+    if streamed != engine.sanitize(corpus):
+        failures += 1
+        print("Streamed corpus differs from the corpus sanitized at once")
+
+    share = sequential / len(texts + EDGE_CASES)
+    print(f"{len(texts + EDGE_CASES)} texts, {sequential} sanitized on the sequential path ({share:.1%})")
+    if share > MAX_SEQUENTIAL_SHARE:
+        failures += 1
+        print(f"More than {MAX_SEQUENTIAL_SHARE:.0%} of the texts needed the sequential path")
+    print("All texts match" if not failures else f"{failures} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
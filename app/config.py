@@ -5,10 +5,37 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 
 load_dotenv()
 
+# Free-tier quotas per Gemini model: (requests per minute, tokens per minute)
+GEMINI_RATE_LIMITS = {
+    "gemini-2.5-pro": (5, 250000),
+    "gemini-2.5-flash": (10, 250000),
+    "gemini-2.5-flash-lite": (15, 250000),
+    "gemini-2.0-flash": (15, 1000000),
+    "gemini-2.0-flash-lite": (30, 1000000),
+    "gemini-1.5-pro": (2, 32000),
+    "gemini-1.5-flash": (15, 1000000),
+}
+
+def get_google_model_name():
+    """Retrieves the Google Gemini model name from .env."""
+    return os.getenv("GOOGLE_MODEL", "gemini-2.0-flash")  # Default to latest Gemini model (free tier)
+
+def get_llm_rate_limits(model_name=None):
+    """
+    Retrieves the requests-per-minute and tokens-per-minute budget for a Gemini model.
+    GOOGLE_MODEL_RPM and GOOGLE_MODEL_TPM in .env override the free-tier defaults.
+    """
+    model_name = model_name or get_google_model_name()
+    default_rpm, default_tpm = GEMINI_RATE_LIMITS.get(model_name, (15, 1000000))
+    return {
+        'requests_per_minute': int(os.getenv("GOOGLE_MODEL_RPM", default_rpm)),
+        'tokens_per_minute': int(os.getenv("GOOGLE_MODEL_TPM", default_tpm)),
+    }
+
 def setup_llm():   
     # Google Gemini API configuration
     api_key = os.getenv("GOOGLE_API_KEY")
-    model_name = os.getenv("GOOGLE_MODEL", "gemini-2.0-flash")  # Default to latest Gemini model (free tier)
+    model_name = get_google_model_name()
     
     if not api_key:
         st.error("❌ GOOGLE_API_KEY not found in environment variables. Please add your Google API key to the .env file.")
@@ -22,6 +49,7 @@ def setup_llm():
             max_output_tokens=4000,  # Increased for longer responses
             request_timeout=120,  # Increased timeout for longer responses
             convert_system_message_to_human=True,  # Handle system messages properly
+            max_retries=1,  # Quota backoff is handled by the process-wide LLM scheduler
         )
         return llm
     except Exception as e:
@@ -37,6 +65,20 @@ def get_jira_project_key_bug():
     # If you use separate keys, change to os.getenv("JIRA_PROJECT_KEY_BUGS")
     return os.getenv("JIRA_PROJECT_KEY") # Assuming single key based on your last request
 
+def get_jira_fetch_config():
+    """Retrieves the Jira search settings (extra fields per issue type, comment limits) from .env."""
+    return {
+        # Fields fetched on top of summary, description, labels and updated; comment and issuelinks
+        # fill the comments and linked tickets of Test Analysis (comments come from the comment endpoint)
+        'story_fields': [field.strip() for field in os.getenv("JIRA_STORY_FIELDS", "comment,issuelinks").split(",") if field.strip()],
+        'bug_fields': [field.strip() for field in os.getenv("JIRA_BUG_FIELDS", "").split(",") if field.strip()],
+        # Most recent comments kept per issue, and characters kept per comment
+        'max_comments': int(os.getenv("JIRA_MAX_COMMENTS", "10")),
+        'comment_max_chars': int(os.getenv("JIRA_COMMENT_MAX_CHARS", "2000")),
+        # Comment requests in flight at once (comments are fetched per issue, see JiraClient._fetch_comments)
+        'comment_workers': max(1, int(os.getenv("JIRA_COMMENT_FETCH_WORKERS", "8"))),
+    }
+
 def get_testrail_config():
     """Retrieves TestRail configuration from .env."""
     return {
@@ -57,4 +99,80 @@ def validate_testrail_config():
     if not config['password']:
         missing_vars.append("TESTRAIL_PASSWORD")
     
-    return missing_vars
\ No newline at end of file
+    return missing_vars
+
+def get_token_budget_config():
+    """Retrieves prompt token budget settings from .env."""
+    return {
+        'policy': os.getenv("LLM_TOKEN_BUDGET_POLICY", "head_tail"),  # truncate, head_tail, summarize or none
+        'default_budget': int(os.getenv("LLM_TOKEN_BUDGET_DEFAULT", "24000")),
+        'chars_per_token': float(os.getenv("LLM_CHARS_PER_TOKEN", "4")),  # Rough Gemini average for English text
+        # Story descriptions over this are cut to their most relevant sections (tables, code and logs go first); 0 keeps them whole
+        'description_budget': int(os.getenv("LLM_DESCRIPTION_TOKEN_BUDGET", "4000")),
+    }
+
+def get_chain_token_budget(chain_name, default=None):
+    """Retrieves the prompt token budget for a chain, e.g. LLM_TOKEN_BUDGET_TEST_AUTOMATION."""
+    value = os.getenv(f"LLM_TOKEN_BUDGET_{chain_name.upper()}")
+    if value:
+        return int(value)
+    return default if default is not None else get_token_budget_config()['default_budget']
+
+def get_cache_config():
+    """Retrieves the tiered cache settings (memory LRU in front of an on-disk store) from .env."""
+    return {
+        'directory': os.getenv("CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")),
+        'memory_max_mb': float(os.getenv("CACHE_MEMORY_MAX_MB", "128")),
+        'disk_max_mb': float(os.getenv("CACHE_DISK_MAX_MB", "512")),
+        # How long past its TTL a stale-while-revalidate entry may still be served while it refreshes
+        'stale_max_seconds': int(os.getenv("CACHE_STALE_MAX_SECONDS", "86400")),
+        # TTLs are spread by +/- this fraction so entries cached together do not expire together
+        'ttl_jitter': float(os.getenv("CACHE_TTL_JITTER", "0.1")),
+        # Codec for large cache entries: auto (zstd, then lz4, then zlib), zstd, lz4, zlib or none
+        'compression': os.getenv("CACHE_COMPRESSION", "auto"),
+    }
+
+def get_cache_warmup_config():
+    """Retrieves the cache warm-up job settings from .env."""
+    return {
+        'interval_seconds': int(os.getenv("CACHE_WARMUP_INTERVAL_SECONDS", "1800")),
+        # Port of the warm-up health/readiness endpoint; 0 disables it
+        'health_port': int(os.getenv("WARMUP_HEALTH_PORT", "8502")),
+        # Defaults to the JQL queries of the Home and Bug Improvement pages for JIRA_PROJECT_KEY
+        'story_jql': os.getenv("CACHE_WARMUP_STORY_JQL"),
+        'bug_jql': os.getenv("CACHE_WARMUP_BUG_JQL"),
+        'testrail_project_ids': [int(project_id) for project_id in
+                                 os.getenv("CACHE_WARMUP_TESTRAIL_PROJECT_IDS", "3").split(",") if project_id.strip()],
+    }
+
+def get_sanitizer_config():
+    """Retrieves the batch sanitization settings from .env."""
+    return {
+        # Worker processes for large batches; 0 uses one per CPU, 1 sanitizes in the app process only
+        'workers': int(os.getenv("SANITIZER_WORKERS", "0")),
+        # Batches with less uncached text than this are sanitized in the app process
+        'parallel_min_chars': int(os.getenv("SANITIZER_PARALLEL_MIN_KB", "2048")) * 1024,
+        # Texts longer than this are sanitized window by window (see DataSanitizer.sanitize_stream)
+        'stream_window_chars': int(os.getenv("SANITIZER_STREAM_WINDOW_KB", "256")) * 1024,
+        # Replace each distinct value with its own token (e.g. [PROJECT_CODE_3FA2B91C07D4E5A6]) and restore them in LLM output
+        'pseudonymize': os.getenv("SANITIZER_PSEUDONYMIZE", "false").lower() in ("1", "true", "yes"),
+        # Tokens and original values kept in memory for restoration; older ones are looked up in the cache
+        'pseudonym_max_entries': int(os.getenv("SANITIZER_PSEUDONYM_MAX_ENTRIES", "10000")),
+        # Key of the token hash, so tokens cannot be reversed by hashing guessed values; random per process if unset
+        'pseudonym_secret': os.getenv("SANITIZER_PSEUDONYM_SECRET"),
+    }
+
+def get_adf_parser_config():
+    """Retrieves the batch ADF conversion settings from .env."""
+    return {
+        # Worker processes for large pages of descriptions; 0 uses one per CPU, 1 converts in the app process only
+        'workers': int(os.getenv("ADF_PARSER_WORKERS", "0")),
+        # Pages with fewer uncached top-level ADF blocks than this are converted in the app process;
+        # sending ADF to a worker costs about as much as converting it, so only large pages gain
+        'parallel_min_blocks': int(os.getenv("ADF_PARSER_PARALLEL_MIN_BLOCKS", "5000")),
+    }
+
+def get_cache_ttl(namespace, default):
+    """Retrieves the TTL in seconds for a cache namespace, e.g. CACHE_TTL_TESTRAIL_CASES."""
+    value = os.getenv(f"CACHE_TTL_{namespace.upper()}")
+    return int(value) if value else default
@@ -2,9 +2,14 @@ from jira import JIRA
 import os
 import requests
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from services.data_sanitizer import DataSanitizer
-from services.adf_parser import ADFParser
+from services.adf_batch import ADFBatchParser
+from services.single_flight import single_flight
+from services.cache_manager import CacheManager, loading_spinner
+from services.fingerprint import FingerprintedList
+from config import get_jira_fetch_config
 
 load_dotenv()
 
@@ -13,6 +18,16 @@ class JiraClient:
     story_jql_query = "project = CM AND type = Story AND created >= -52w AND \"cm groups[checkboxes]\" IN (BE, FE) ORDER BY created DESC"
     bug_jql_query = "project = CM AND type = Bug AND created >= -52w AND \"cm groups[checkboxes]\" IN (BE, FE) ORDER BY created DESC"
 
+    @staticmethod
+    def story_jql_for_project(project_key):
+        """JQL of the user stories listed on the Home page for a project."""
+        return f"project = {project_key} AND type = 'Story' AND created >= -52w AND \"cm groups[checkboxes]\" IN (BE, FE) ORDER BY created DESC"
+
+    @staticmethod
+    def bug_jql_for_project(project_key):
+        """JQL of the bug tickets listed on the Bug Improvement page for a project."""
+        return f"project = {project_key} AND type = 'Bug' AND created >= -52w AND \"cm groups[checkboxes]\" IN (BE, FE) ORDER BY created DESC"
+
     def __init__(self):
         self.base_url = os.getenv("JIRA_BASE_URL")
         self.email = os.getenv("JIRA_EMAIL")
@@ -54,12 +69,39 @@ class JiraClient:
             error_msg = f"Failed to connect to Jira: {str(e)}"
             return None, "connection_error", error_msg
 
-    def _get_all_issues(self, jql_query, max_results=None):
+    # Fields every search requests; more are added per issue type (see get_jira_fetch_config)
+    base_fields = ["summary", "description", "labels", "updated"]
+
+    def _get_all_issues(self, jql_query, max_results=None, extra_fields=()):
         """
         Helper method to retrieve all issues matching a JQL query using direct REST API calls.
+        Concurrent requests for the same JQL share one fetch instead of paging through Jira twice.
+        """
+        fields = self.base_fields + [field for field in extra_fields if field not in self.base_fields]
+        request_key = f"jira_issues:{self.base_url}:{jql_query}:{max_results}:{','.join(fields)}"
+        return single_flight.do(request_key, lambda: self._fetch_all_issues(jql_query, max_results, fields))
+
+    def _fetch_all_issues(self, jql_query, max_results=None, fields=None):
+        """
+        Retrieve all issues matching a JQL query using direct REST API calls.
         This bypasses the Jira Python library's limitations and retrieves ALL matching issues.
+        Only the given fields are requested; issue links come with the issues, in the same search.
+        The search would return whole comment threads, so when "comment" is among the fields the most
+        recent JIRA_MAX_COMMENTS comments of each issue are fetched from the comment endpoint instead,
+        a page of issues at a time. Descriptions and comments are converted from ADF to text
+        (description_text, comments_text) page by page while the next page downloads.
+        
+        Raises:
+            ConnectionError: If a page cannot be fetched, so an incomplete result is never returned (or cached)
         """
+        fields = fields or self.base_fields
+        fetch_config = get_jira_fetch_config()
+        fetch_comments = 'comment' in fields and fetch_config['max_comments'] > 0
+        search_fields = [field for field in fields if field != 'comment']
+        comment_executor = ThreadPoolExecutor(max_workers=fetch_config['comment_workers'],
+                                              thread_name_prefix="jira-comments") if fetch_comments else None
         all_issues = []
+        adf_parser = ADFBatchParser()
         start_at = 0
         batch_size = 100  # Jira's recommended batch size
         
@@ -79,7 +121,7 @@ class JiraClient:
                     "jql": jql_query,
                     "startAt": start_at,
                     "maxResults": batch_size,
-                    "fields": ["summary", "description", "labels"]
+                    "fields": search_fields
                 }
                 
                 response = requests.post(url, json=payload, headers=headers, auth=auth)
@@ -99,15 +141,31 @@ class JiraClient:
                     class MockIssue:
                         def __init__(self, data):
                             self.key = data['key']
+                            self.description_text = ""
+                            self.comments_text = ""
                             self.fields = type('MockFields', (), {
                                 'summary': data['fields'].get('summary', ''),
                                 'description': data['fields'].get('description', ''),
-                                'labels': data['fields'].get('labels', [])
+                                'labels': data['fields'].get('labels', []),
+                                'updated': data['fields'].get('updated'),
+                                'issuelinks': data['fields'].get('issuelinks') or []
                             })()
+                            # Filled from the comment endpoint (see _fetch_comments)
+                            self.comments = []
+                            self.omitted_comments = 0
                     
                     jira_issues.append(MockIssue(issue_data))
                 
+                if comment_executor:
+                    fetched = comment_executor.map(
+                        lambda issue: self._fetch_comments(issue.key, fetch_config['max_comments']), jira_issues
+                    )
+                    for issue, (comments, total) in zip(jira_issues, fetched):
+                        issue.comments = comments
+                        issue.omitted_comments = max(total - len(comments), 0)
+                
                 all_issues.extend(jira_issues)
+                adf_parser.submit(*self._adf_documents(jira_issues))
                 
                 print(f"Fetched batch of {len(issues)} issues (total so far: {len(all_issues)})")
                 
@@ -125,86 +183,174 @@ class JiraClient:
                     
             except Exception as e:
                 print(f"Error retrieving issues batch starting at {start_at}: {e}")
-                break
+                adf_parser.close()
+                if comment_executor:
+                    comment_executor.shutdown(wait=False, cancel_futures=True)
+                raise ConnectionError(f"Jira search failed at issue {start_at}: {e}") from e
         
+        if comment_executor:
+            comment_executor.shutdown(wait=False)
+        
+        # Each issue's description is followed by its comments in the converted texts
+        texts = iter(adf_parser.results())
+        for issue in all_issues:
+            issue.description_text = next(texts)
+            comment_texts = [next(texts) for _ in issue.comments]
+            issue.comments_text = self._format_comments(issue, comment_texts, fetch_config['comment_max_chars'])
         return all_issues
 
-    @st.cache_data(ttl=3600, show_spinner="Fetching user stories from Jira...")  # Cache for 1 hour
-    def _cached_get_user_stories(_self, jql_query, max_results=None):
+    def _fetch_comments(self, issue_key, max_comments):
+        """
+        Fetch the most recent comments of an issue, so long threads are never downloaded whole.
+        Returns a tuple of (comments in chronological order, total comments of the issue).
+        """
+        response = requests.get(
+            f"{self.base_url}/rest/api/3/issue/{issue_key}/comment",
+            params={"startAt": 0, "maxResults": max_comments, "orderBy": "-created"},
+            headers={"Accept": "application/json"},
+            auth=(self.email, self.api_token)
+        )
+        response.raise_for_status()
+        data = response.json()
+        comments = list(reversed(data.get('comments') or []))
+        return comments, data.get('total', len(comments))
+
+    @staticmethod
+    def _adf_documents(issues):
+        """
+        ADF documents of a page of issues to convert: each description followed by its comments.
+        An issue's (or comment's) update time changes with its text, so it versions the cached text.
+        Returns a tuple of (documents, versions), versions being None if an update time is missing.
+        """
+        documents, versions = [], []
+        for issue in issues:
+            documents.append(issue.fields.description)
+            versions.append(f"{issue.key}@{issue.fields.updated}" if issue.fields.updated else None)
+            for comment in issue.comments:
+                documents.append(comment.get('body'))
+                versions.append(f"{issue.key}/comment/{comment.get('id')}@{comment.get('updated')}"
+                                if comment.get('id') and comment.get('updated') else None)
+        return documents, (versions if all(versions) else None)
+
+    @staticmethod
+    def _format_comments(issue, comment_texts, max_chars):
+        """Format the kept comments of an issue for the prompt: date and text, each cut to max_chars."""
+        formatted = []
+        if issue.omitted_comments:
+            formatted.append(f"[{issue.omitted_comments} earlier comments omitted]")
+        for comment, text in zip(issue.comments, comment_texts):
+            if not text:
+                continue
+            if len(text) > max_chars:
+                text = text[:max_chars] + f"... [{len(text) - max_chars} characters omitted]"
+            created = (comment.get('created') or '')[:10]
+            formatted.append(f"[{created}] {text}" if created else text)
+        return "\n\n".join(formatted)
+
+    @staticmethod
+    def _linked_tickets(issue):
+        """Keys of the issues linked to an issue, comma separated."""
+        keys = []
+        for link in issue.fields.issuelinks:
+            linked = link.get('outwardIssue') or link.get('inwardIssue') or {}
+            if linked.get('key') and linked['key'] not in keys:
+                keys.append(linked['key'])
+        return ", ".join(keys)
+
+    def _cached_get_user_stories(self, jql_query, max_results=None, raise_errors=False):
         """
         Cached version of user stories retrieval.
-        This prevents repeated API calls for the same query within 1 hour.
+        Stories are kept in the tiered cache for 1 hour (and survive restarts).
+        A failed fetch (of any page) raises in the loader, so nothing is cached and [] is returned
+        (or the error is raised if raise_errors is set).
         """
         try:
-            issues = _self._get_all_issues(jql_query, max_results)
-            user_stories = []
-            for issue in issues:
-                # Parse ADF description to plain text
-                description = issue.fields.description if issue.fields.description else "No description available."
-                if description and description != "No description available.":
-                    description = ADFParser.parse_adf_to_text(description)
-                
-                user_stories.append({
-                    "key": issue.key,
-                    "title": issue.fields.summary,
-                    "description": description
-                })
-            
-            print(f"Retrieved {len(user_stories)} user stories from Jira")
-            
-            # Sanitize the stories before returning
-            sanitized_stories = _self.sanitizer.sanitize_stories_list(user_stories)
-            return sanitized_stories
+            return CacheManager.cache_jira_stories(
+                jql_query, max_results, lambda: self._load_user_stories(jql_query, max_results)
+            )
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Error retrieving Jira issues: {e}")
             return []
 
-    def get_user_stories(self, jql_query=story_jql_query, max_results=None):
+    def _load_user_stories(self, jql_query, max_results=None):
+        """Fetch, parse and sanitize the user stories matching a JQL query."""
+        with loading_spinner("Fetching user stories from Jira..."):
+            issues = self._get_all_issues(jql_query, max_results, get_jira_fetch_config()['story_fields'])
+        user_stories = []
+        for issue in issues:
+            # ADF description converted to plain text during the fetch
+            description = issue.description_text if issue.fields.description else "No description available."
+            
+            user_stories.append({
+                "key": issue.key,
+                "title": issue.fields.summary,
+                "description": description,
+                "comments": issue.comments_text,
+                "linked_tickets": self._linked_tickets(issue)
+            })
+        
+        print(f"Retrieved {len(user_stories)} user stories from Jira")
+        
+        # Sanitize the stories before returning
+        return FingerprintedList(self.sanitizer.sanitize_stories_list(user_stories))
+
+    def get_user_stories(self, jql_query=story_jql_query, max_results=None, raise_errors=False):
         """
         Retrieves ALL user stories from Jira based on a JQL query using pagination.
-        Returns a sanitized list of dictionaries with key, title, and description.
-        Uses caching to improve performance.
+        Returns a sanitized list of dictionaries with key, title, description, comments and linked tickets.
+        Uses caching to improve performance. On failure [] is returned, or the error is raised
+        if raise_errors is set (e.g. by the cache warmer).
         """
-        return self._cached_get_user_stories(jql_query, max_results)
+        return self._cached_get_user_stories(jql_query, max_results, raise_errors)
 
-    @st.cache_data(ttl=3600, show_spinner="Fetching bug tickets from Jira...")  # Cache for 1 hour
-    def _cached_get_bug_tickets(_self, jql_query, max_results=None):
+    def _cached_get_bug_tickets(self, jql_query, max_results=None, raise_errors=False):
         """
         Cached version of bug tickets retrieval.
-        This prevents repeated API calls for the same query within 1 hour.
+        Bug tickets are kept in the tiered cache for 1 hour (and survive restarts).
+        A failed fetch (of any page) raises in the loader, so nothing is cached and [] is returned
+        (or the error is raised if raise_errors is set).
         """
         try:
-            issues = _self._get_all_issues(jql_query, max_results)
-            bug_tickets = []
-            for issue in issues:
-                # Parse ADF description to plain text
-                description = issue.fields.description if issue.fields.description else "No description available."
-                if description and description != "No description available.":
-                    description = ADFParser.parse_adf_to_text(description)
-                
-                bug_tickets.append({
-                    "key": issue.key,
-                    "title": issue.fields.summary,
-                    "description": description,
-                    "labels": issue.fields.labels if issue.fields.labels else []
-                })
-            
-            print(f"Retrieved {len(bug_tickets)} bug tickets from Jira")
-            
-            # Sanitize the bug tickets before returning
-            sanitized_bugs = _self.sanitizer.sanitize_bugs_list(bug_tickets)
-            return sanitized_bugs
+            return CacheManager.cache_jira_bugs(
+                jql_query, max_results, lambda: self._load_bug_tickets(jql_query, max_results)
+            )
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"Error retrieving Jira bug issues: {e}")
             return []
 
-    def get_bug_tickets(self, jql_query=bug_jql_query, max_results=None):
+    def _load_bug_tickets(self, jql_query, max_results=None):
+        """Fetch, parse and sanitize the bug tickets matching a JQL query."""
+        with loading_spinner("Fetching bug tickets from Jira..."):
+            issues = self._get_all_issues(jql_query, max_results, get_jira_fetch_config()['bug_fields'])
+        bug_tickets = []
+        for issue in issues:
+            # ADF description converted to plain text during the fetch
+            description = issue.description_text if issue.fields.description else "No description available."
+            
+            bug_tickets.append({
+                "key": issue.key,
+                "title": issue.fields.summary,
+                "description": description,
+                "labels": issue.fields.labels if issue.fields.labels else []
+            })
+        
+        print(f"Retrieved {len(bug_tickets)} bug tickets from Jira")
+        
+        # Sanitize the bug tickets before returning
+        return FingerprintedList(self.sanitizer.sanitize_bugs_list(bug_tickets))
+
+    def get_bug_tickets(self, jql_query=bug_jql_query, max_results=None, raise_errors=False):
         """
         Retrieves ALL bug tickets from Jira based on a JQL query using pagination.
         Returns a sanitized list of dictionaries with key, title, description, and labels.
-        Uses caching to improve performance.
+        Uses caching to improve performance. On failure [] is returned, or the error is raised
+        if raise_errors is set (e.g. by the cache warmer).
         """
-        return self._cached_get_bug_tickets(jql_query, max_results)
+        return self._cached_get_bug_tickets(jql_query, max_results, raise_errors)
 
     if __name__ == "__main__":
         try:
@@ -1,4 +1,5 @@
 import streamlit as st
+import asyncio
 import time
 import sys
 import os
@@ -7,6 +8,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.llm_chains import invoke_with_timeout
+from services.qa_pipeline import run_story_pipeline, extract_quality_risks, AUTOMATION_FRAMEWORKS
 
 st.set_page_config(layout="wide", page_title="Test Analysis - AI QA Assistant")
 
@@ -74,6 +76,19 @@ if 'existing_stories' in st.session_state and st.session_state['existing_stories
                     help="Optional: Enter or modify Jira ticket keys separated by commas"
                 )
 
+        # Pipeline mode runs Test Design and Test Automation right after the analysis
+        pipeline_mode = st.checkbox(
+            "Pipeline mode: also generate test cases and automation prompts",
+            value=False,
+            help="Test case generation starts as soon as the Quality Risks are available, and automation prompts are generated concurrently per test case"
+        )
+        if pipeline_mode:
+            pipeline_framework = st.selectbox(
+                "Automation Framework for Pipeline",
+                AUTOMATION_FRAMEWORKS,
+                help="Framework used for the generated automation prompts"
+            )
+
         if st.button("Get AI Insights & Risks (Test Analysis)", key="get_ai_insights", type="primary"):
             # Get the user story analysis chain from session state
             user_story_analysis_chain = st.session_state.get('user_story_analysis_chain')
@@ -88,25 +103,80 @@ if 'existing_stories' in st.session_state and st.session_state['existing_stories
                     # Create context string from stories
                     context_str = "\n\n".join([f"Key: {s['key']}\nTitle: {s['title']}\nDescription: {s['description']}" for s in st.session_state['existing_stories']])
                     
-                    with st.spinner("Generating insights... (timeout: 120s)"):
-                        analysis_output = invoke_with_timeout(
-                            user_story_analysis_chain,
-                            {
-                                "context_user_stories": context_str,
-                                "new_story_title": title,
-                                "new_story_description": description,
-                                "new_story_comments": comments,
-                                "new_story_linked_tickets_comma_separated": linked_tickets
-                            },
-                            timeout_seconds=120
-                        )
+                    analysis_inputs = {
+                        "context_user_stories": context_str,
+                        "new_story_title": title,
+                        "new_story_description": description,
+                        "new_story_comments": comments,
+                        "new_story_linked_tickets_comma_separated": linked_tickets
+                    }
+                    
+                    test_case_generation_chain = st.session_state.get('test_case_generation_chain')
+                    test_automation_chain = st.session_state.get('test_automation_chain')
+                    if pipeline_mode and test_case_generation_chain and test_automation_chain:
                         st.subheader("AI Analysis")
-                        st.markdown(analysis_output)
-                        st.session_state['last_quality_risks'] = analysis_output.split("Quality Risks:")[-1].split("Suggested Areas for Focus")[0].strip()
-                        st.session_state['last_new_story_title'] = selected_story['title']
-                        st.session_state['last_new_story_description'] = selected_story.get('description', '')
-                        st.session_state['last_new_story_comments'] = new_story_comments
-                        st.session_state['last_new_story_linked_tickets'] = new_story_linked_tickets
+                        analysis_placeholder = st.empty()
+                        status_placeholder = st.empty()
+                        
+                        def show_progress(event, payload):
+                            if event == "analysis_chunk":
+                                analysis_placeholder.markdown(payload)
+                            elif event == "risks_ready":
+                                status_placeholder.info("🔄 Quality Risks identified - generating test cases...")
+                            elif event == "test_cases_done":
+                                status_placeholder.info(f"🔄 {len(payload)} test cases generated - generating automation prompts...")
+                        
+                        start_time = time.time()
+                        with st.spinner("Running Analysis → Design → Automation pipeline..."):
+                            try:
+                                pipeline_result = asyncio.run(run_story_pipeline(
+                                    user_story_analysis_chain,
+                                    test_case_generation_chain,
+                                    test_automation_chain,
+                                    analysis_inputs,
+                                    pipeline_framework,
+                                    on_event=show_progress
+                                ))
+                            except Exception as e:
+                                pipeline_result = None
+                                status_placeholder.empty()
+                                st.error(f"❌ Pipeline failed: {str(e)}")
+                        
+                        if pipeline_result:
+                            status_placeholder.empty()
+                            analysis_output = pipeline_result['analysis_output']
+                            analysis_placeholder.markdown(analysis_output)
+                            st.session_state['last_quality_risks'] = pipeline_result['quality_risks']
+                            st.session_state['generated_test_cases_output'] = pipeline_result['test_cases_output']
+                            st.session_state['generated_test_cases_parsed'] = pipeline_result['test_cases']
+                            st.session_state['generated_test_cases'] = pipeline_result['test_cases']
+                            st.session_state['generated_automation_code'] = "\n\n".join(
+                                f"### {item['title']}\n\n{item['output']}" for item in pipeline_result['automation_outputs']
+                            )
+                            st.session_state['automation_framework'] = pipeline_framework
+                            
+                            with st.expander(f"📝 Generated Test Cases ({len(pipeline_result['test_cases'])})"):
+                                st.markdown(pipeline_result['test_cases_output'])
+                            with st.expander(f"🤖 Automation Prompts ({len(pipeline_result['automation_outputs'])})"):
+                                for item in pipeline_result['automation_outputs']:
+                                    st.markdown(f"### {item['title']}")
+                                    st.markdown(item['output'])
+                            st.success(f"🎉 Pipeline finished in {time.time() - start_time:.0f}s. Results are available on the Test Design, Test Automation and TestRail Integration pages.")
+                    else:
+                        with st.spinner("Generating insights... (timeout: 120s)"):
+                            analysis_output = invoke_with_timeout(
+                                user_story_analysis_chain,
+                                analysis_inputs,
+                                timeout_seconds=120
+                            )
+                            st.subheader("AI Analysis")
+                            st.markdown(analysis_output)
+                            st.session_state['last_quality_risks'] = extract_quality_risks(analysis_output)
+                    
+                    st.session_state['last_new_story_title'] = selected_story['title']
+                    st.session_state['last_new_story_description'] = selected_story.get('description', '')
+                    st.session_state['last_new_story_comments'] = new_story_comments
+                    st.session_state['last_new_story_linked_tickets'] = new_story_linked_tickets
             else:
                 st.error("❌ User Story Analysis chain not available. Please check the main page for initialization status.")
 else:
@@ -6,8 +6,20 @@ import os
 # Add the parent directory to the path so we can import from app
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from services.llm_chains import invoke_with_timeout
-from testrail_client import extract_test_case_info
+from services.llm_chains import invoke_with_timeout, stream_chain
+from services.llm_scheduler import RateLimitExceeded
+from testrail_client import (extract_test_case_info, parse_structured_test_cases, format_structured_test_cases,
+                             IncrementalTestCaseParser, find_similar_for_case)
+
+# TestRail project searched for similar test cases (same as the TestRail Integration page)
+TESTRAIL_PROJECT_ID = 3
+
+
+def _warn_partial_cases(parser):
+    """Tell the user that the test cases parsed before a streamed generation failed were not saved."""
+    if parser is not None and parser.test_cases:
+        st.warning(f"⚠️ Generation stopped after {len(parser.test_cases)} parsed test case(s); "
+                   "they were not saved for the other pages. Please generate again.")
 
 st.set_page_config(layout="wide", page_title="Test Design - AI QA Assistant")
 
@@ -20,13 +32,37 @@ if 'last_new_story_title' in st.session_state and 'last_new_story_description' i
     st.subheader("Identified Quality Risks from Previous Step:")
     st.markdown(st.session_state['last_quality_risks'])
 
+    output_format = st.radio(
+        "Output format:",
+        ["Structured (JSON)", "Markdown"],
+        horizontal=True,
+        help="Structured output is parsed in a single pass and validated against a schema; Markdown is streamed and each test case is parsed as soon as it is complete"
+    )
+    use_structured_output = output_format == "Structured (JSON)"
+    
+    testrail_client = st.session_state.get('testrail_client')
+    match_while_generating = False
+    if not use_structured_output and testrail_client and testrail_client.client:
+        match_while_generating = st.checkbox(
+            "Search TestRail for similar test cases while generating",
+            value=True,
+            help="Each test case is compared with the existing TestRail cases as soon as it is generated"
+        )
+    
     if st.button("Generate Suggested Test Cases & Regression Scenarios", type="primary"):
         # Get the test case generation chain from session state
-        test_case_generation_chain = st.session_state.get('test_case_generation_chain')
+        chain_key = 'test_case_generation_json_chain' if use_structured_output else 'test_case_generation_chain'
+        test_case_generation_chain = st.session_state.get(chain_key)
         if test_case_generation_chain:
             # Create a simple progress indicator
             progress_placeholder = st.empty()
             status_placeholder = st.empty()
+            parser = None
+            
+            # Drop the results of the previous run, so the other pages never use them with this story's inputs
+            for key in ('generated_test_cases', 'generated_test_cases_output',
+                        'generated_test_cases_parsed', 'streamed_similar_cases'):
+                st.session_state.pop(key, None)
             
             try:
                 # Use original data directly (sanitization handled in background)
@@ -34,44 +70,104 @@ if 'last_new_story_title' in st.session_state and 'last_new_story_description' i
                 description = st.session_state['last_new_story_description']
                 risks = st.session_state['last_quality_risks']
                 
-                with st.spinner("AI is generating test cases... (timeout: 120s)"):
-                    # Show initial status
-                    status_placeholder.info("🔄 Starting AI processing...")
-                    
-                    # Invoke the chain with timeout
-                    test_cases_output = invoke_with_timeout(
-                        test_case_generation_chain,
-                        {
-                            "new_story_title": title,
-                            "new_story_description": description,
-                            "quality_risks": risks
-                        },
-                        timeout_seconds=120
-                    )
-                    
-                    # Clear status indicators
-                    progress_placeholder.empty()
-                    status_placeholder.empty()
+                inputs = {
+                    "new_story_title": title,
+                    "new_story_description": description,
+                    "quality_risks": risks
+                }
+                
+                if use_structured_output:
+                    with st.spinner("AI is generating test cases... (timeout: 120s)"):
+                        # Show initial status
+                        status_placeholder.info("🔄 Starting AI processing...")
+                        
+                        # Invoke the chain with timeout
+                        test_cases_output = invoke_with_timeout(test_case_generation_chain, inputs, timeout_seconds=120)
+                        
+                        # Clear status indicators
+                        progress_placeholder.empty()
+                        status_placeholder.empty()
+                        
+                        # Extract test case information
+                        generated_test_cases = parse_structured_test_cases(test_cases_output)
+                        if generated_test_cases is None:
+                            st.warning("⚠️ The structured output could not be validated; falling back to text extraction.")
+                            generated_test_cases = extract_test_case_info(test_cases_output)
+                        else:
+                            # Keep a readable version for display and for the later pages
+                            test_cases_output = format_structured_test_cases(test_cases_output)
+                        
+                        # Show results
+                        st.subheader("✅ AI-Generated Test Cases & Regression Scenarios")
+                        st.markdown(test_cases_output)
+                else:
+                    prepared_cases = None
+                    if match_while_generating:
+                        with st.spinner("Loading existing TestRail test cases..."):
+                            prepared_cases = testrail_client.get_prepared_cases(project_id=TESTRAIL_PROJECT_ID)
                     
-                    # Store the generated test cases in session state
-                    st.session_state['generated_test_cases_output'] = test_cases_output
+                    st.subheader("✅ AI-Generated Test Cases & Regression Scenarios")
+                    output_col, cases_col = st.columns([3, 2])
+                    with output_col:
+                        output_placeholder = st.empty()
+                    with cases_col:
+                        st.markdown("**Parsed test cases**")
+                        cases_container = st.container()
                     
-                    # Extract test case information
-                    generated_test_cases = extract_test_case_info(test_cases_output)
-                    st.session_state['generated_test_cases_parsed'] = generated_test_cases
+                    parser = IncrementalTestCaseParser()
+                    streamed_matches = []
                     
-                    # Show results
-                    st.subheader("✅ AI-Generated Test Cases & Regression Scenarios")
-                    st.markdown(test_cases_output)
+                    def show_test_cases(test_cases):
+                        for test_case in test_cases:
+                            with cases_container:
+                                st.markdown(f"**{len(streamed_matches) + 1}. {test_case['title']}** "
+                                            f"({test_case['priority']}, automation: {test_case['automation']})")
+                                if prepared_cases is not None:
+                                    matches = find_similar_for_case(test_case, prepared_cases)
+                                    for _, existing_case, similarity in matches:
+                                        st.caption(f"↳ Similar: C{existing_case.get('id', '?')} - "
+                                                   f"{existing_case.get('title', 'N/A')} ({similarity:.2f})")
+                                    if not matches:
+                                        st.caption("↳ No similar TestRail cases")
+                                    streamed_matches.append(matches)
+                                else:
+                                    streamed_matches.append([])
                     
-                    # Store for later use in TestRail tab
-                    st.session_state['generated_test_cases'] = generated_test_cases
+                    test_cases_output = ""
+                    status_placeholder.info("🔄 Generating test cases...")
+                    for chunk in stream_chain(test_case_generation_chain, inputs, timeout_seconds=120):
+                        test_cases_output += chunk
+                        output_placeholder.markdown(test_cases_output)
+                        show_test_cases(parser.feed(chunk))
+                    show_test_cases(parser.close())
+                    status_placeholder.empty()
                     
-                    st.success("🎉 Test cases generated successfully! You can now use the 'TestRail Integration' page to find similar existing test cases.")
+                    generated_test_cases = parser.test_cases
+                    st.session_state['streamed_similar_cases'] = [match for matches in streamed_matches for match in matches]
+                
+                # Store the generated test cases in session state
+                st.session_state['generated_test_cases_output'] = test_cases_output
+                st.session_state['generated_test_cases_parsed'] = generated_test_cases
+                
+                # Store for later use in TestRail tab
+                st.session_state['generated_test_cases'] = generated_test_cases
+                
+                st.success("🎉 Test cases generated successfully! You can now use the 'TestRail Integration' page to find similar existing test cases.")
                     
+            except RateLimitExceeded:
+                progress_placeholder.empty()
+                status_placeholder.empty()
+                st.error("❌ The AI service is rate limited right now. Please wait a minute and try again.")
+                _warn_partial_cases(parser)
+            except TimeoutError as e:
+                progress_placeholder.empty()
+                status_placeholder.empty()
+                st.error(f"❌ Test case generation timed out: {str(e)}")
+                _warn_partial_cases(parser)
             except Exception as e:
                 progress_placeholder.empty()
                 status_placeholder.empty()
+                _warn_partial_cases(parser)
                 st.error(f"❌ An error occurred: {str(e)}")
                 st.error(f"Error type: {type(e).__name__}")
                 import traceback
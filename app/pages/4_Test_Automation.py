@@ -1,46 +1,12 @@
 import streamlit as st
 import sys
 import os
-from typing import List, Dict
 
 # Add the parent directory to the path so we can import from app
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.llm_chains import invoke_with_timeout
-
-def format_test_cases_for_automation(automation_cases: List[Dict], framework_pref: str, additional_context: str) -> str:
-    """Format test cases for automation input."""
-    formatted_output = f"Framework: {framework_pref}\n"
-    if additional_context:
-        formatted_output += f"Additional Context: {additional_context}\n"
-    formatted_output += "\nTest Cases:\n"
-    
-    for i, case in enumerate(automation_cases, 1):
-        formatted_output += f"\n--- Test Case {i} ---\n"
-        formatted_output += f"Title: {case.get('title', 'N/A')}\n"
-        formatted_output += f"Priority: {case.get('priority', 'N/A')}\n"
-        formatted_output += f"Tags: {case.get('tags', 'N/A')}\n"
-        
-        # Preconditions
-        preconditions = case.get('preconditions', '')
-        if preconditions:
-            formatted_output += f"Preconditions: {preconditions}\n"
-        
-        # Steps
-        steps = case.get('steps', [])
-        if steps:
-            formatted_output += "Steps:\n"
-            for j, step in enumerate(steps, 1):
-                if isinstance(step, dict):
-                    formatted_output += f"  {j}. Action: {step.get('action', 'N/A')}\n"
-                    if step.get('expected_result'):
-                        formatted_output += f"     Expected: {step['expected_result']}\n"
-                else:
-                    formatted_output += f"  {j}. {step}\n"
-        
-        formatted_output += "\n"
-    
-    return formatted_output
+from services.qa_pipeline import format_test_cases_for_automation, is_automation_candidate, AUTOMATION_FRAMEWORKS
 
 st.set_page_config(layout="wide", page_title="Test Automation - AI QA Assistant")
 
@@ -60,11 +26,7 @@ else:
         generated_test_cases = st.session_state['generated_test_cases']
         
         # Filter test cases marked for automation
-        automation_cases = []
-        for case in generated_test_cases:
-            automation_status = case.get('automation', '').lower()
-            if automation_status in ['yes', 'true', 'y', '1']:
-                automation_cases.append(case)
+        automation_cases = [case for case in generated_test_cases if is_automation_candidate(case)]
         
         st.info(f"📊 Found {len(automation_cases)} test cases marked for automation out of {len(generated_test_cases)} total cases.")
         
@@ -156,7 +118,7 @@ else:
             with col1:
                 framework_pref = st.selectbox(
                     "Preferred Automation Framework",
-                    ["Selenium + JDI Light + TestNG + Gradle", "OpenAPI + OkHttp + JUnit + Gradle", "k6 + TypeScript", "Playwright + TypeScript"],
+                    AUTOMATION_FRAMEWORKS,
                     help="Select your preferred automation framework for code generation"
                 )
             
@@ -1,11 +1,13 @@
 import streamlit as st
+import pandas as pd
 import sys
 import os
 
 # Add the parent directory to the path so we can import from app
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from services.llm_chains import invoke_with_timeout
+from services.llm_chains import invoke_with_timeout, batch_invoke
+from services.cache_manager import CacheManager
 
 st.set_page_config(layout="wide", page_title="Bug Improvement - AI QA Assistant")
 
@@ -34,6 +36,8 @@ if 'current_bug_labels' not in st.session_state:
     st.session_state['current_bug_labels'] = ""
 if 'existing_bugs' not in st.session_state:
     st.session_state['existing_bugs'] = None
+if 'batch_bug_results' not in st.session_state:
+    st.session_state['batch_bug_results'] = []
 
 # Get Jira client and project key from session state
 jira_client = st.session_state.get('jira_client')
@@ -44,9 +48,11 @@ if jira_client:
     # jira_project_key_bug is now passed as an argument
     retrieve_bugs = st.button(f"Retrieve Bugs from {jira_project_key_bug or 'Jira (Project Key Missing)'}", key="retrieve_bugs_improvement")
 
+    bug_jql_query = jira_client.bug_jql_for_project(jira_project_key_bug)
+
     if retrieve_bugs and jira_project_key_bug:
         with st.spinner("Retrieving Jira bug tickets..."):
-            existing_bugs = jira_client.get_bug_tickets(jql_query=f"project = {jira_project_key_bug} AND type = 'Bug' AND created >= -52w AND \"cm groups[checkboxes]\" IN (BE, FE) ORDER BY created DESC")
+            existing_bugs = jira_client.get_bug_tickets(jql_query=bug_jql_query)
             if existing_bugs:
                 st.session_state['existing_bugs'] = existing_bugs
                 st.success(f"Retrieved {len(existing_bugs)} bug tickets from Jira.")
@@ -55,6 +61,7 @@ if jira_client:
     # Show bug selection if bugs are available
     if st.session_state['existing_bugs']:
         st.subheader("Recently Retrieved Bug Reports")
+        st.caption(f"🕒 {CacheManager.format_data_age(CacheManager.get_jira_data_age('jira_bugs', bug_jql_query))}")
         
         # Create the selectbox for bug selection with callback
         selected_bug_option = st.selectbox(
@@ -113,6 +120,111 @@ if jira_client:
                 st.warning("Please provide a title and description for the bug.")
         else:
             st.error("❌ Bug Improvement chain not available. Please check the main page for initialization status.")
+
+    # Batch mode: improve many retrieved bugs in one run
+    if st.session_state['existing_bugs']:
+        st.markdown("---")
+        st.subheader("Batch Bug Improvement")
+        st.markdown("Improve many bugs in one run. Results appear in the table as each bug finishes.")
+
+        existing_bugs = st.session_state['existing_bugs']
+        bug_options = [f"{bug['key']}: {bug['title']}" for bug in existing_bugs]
+
+        use_all_bugs = st.checkbox(f"Use all {len(existing_bugs)} retrieved bugs (whole JQL result)", key="batch_use_all_bugs")
+        selected_batch_options = st.multiselect(
+            "Select bugs to improve",
+            options=bug_options,
+            disabled=use_all_bugs,
+            key="batch_bug_selection"
+        )
+
+        col1, col2 = st.columns(2)
+        with col1:
+            max_concurrency = st.slider(
+                "Max Concurrent Requests",
+                min_value=1,
+                max_value=10,
+                value=4,
+                help="Number of bugs sent to the AI model at the same time"
+            )
+        with col2:
+            requests_per_minute = st.number_input(
+                "Rate Limit (requests per minute)",
+                min_value=1,
+                max_value=1000,
+                value=15,
+                help="Keep this at or below your Google Gemini quota"
+            )
+
+        if st.button("Improve Selected Bugs", key="run_batch_bug_improvement", type="primary"):
+            bug_improvement_chain = st.session_state.get('bug_improvement_chain')
+            if use_all_bugs:
+                batch_bugs = existing_bugs
+            else:
+                selected_keys = {option.split(":")[0] for option in selected_batch_options}
+                batch_bugs = [bug for bug in existing_bugs if bug['key'] in selected_keys]
+
+            if not bug_improvement_chain:
+                st.error("❌ Bug Improvement chain not available. Please check the main page for initialization status.")
+            elif not batch_bugs:
+                st.warning("Please select at least one bug.")
+            else:
+                batch_results = [{
+                    'Key': bug['key'],
+                    'Title': bug['title'],
+                    'Status': 'Pending',
+                    'Suggestions': ''
+                } for bug in batch_bugs]
+                progress_bar = st.progress(0.0, text=f"Improving 0 of {len(batch_bugs)} bugs...")
+                table_placeholder = st.empty()
+                table_placeholder.dataframe(pd.DataFrame(batch_results), use_container_width=True)
+
+                batch_inputs = [{
+                    "bug_title": bug['title'],
+                    "bug_description": bug['description'],
+                    "bug_labels": ", ".join(bug['labels'])
+                } for bug in batch_bugs]
+
+                completed = 0
+                for index, output in batch_invoke(
+                    bug_improvement_chain,
+                    batch_inputs,
+                    max_concurrency=max_concurrency,
+                    requests_per_minute=requests_per_minute
+                ):
+                    completed += 1
+                    batch_results[index]['Status'] = 'Failed' if output.startswith(("❌", "⏳")) else 'Done'
+                    batch_results[index]['Suggestions'] = output
+                    progress_bar.progress(completed / len(batch_bugs), text=f"Improving {completed} of {len(batch_bugs)} bugs...")
+                    table_placeholder.dataframe(pd.DataFrame(batch_results), use_container_width=True)
+
+                st.session_state['batch_bug_results'] = batch_results
+                st.success(f"✅ Finished improving {len(batch_bugs)} bugs.")
+
+        # Export the last batch run
+        if st.session_state['batch_bug_results']:
+            results_df = pd.DataFrame(st.session_state['batch_bug_results'])
+            with st.expander("📋 Last Batch Results", expanded=True):
+                st.dataframe(results_df, use_container_width=True)
+                for result in st.session_state['batch_bug_results']:
+                    with st.expander(f"{result['Key']}: {result['Title']}"):
+                        st.markdown(result['Suggestions'])
+
+            col1, col2 = st.columns(2)
+            with col1:
+                st.download_button(
+                    label="📥 Export as CSV",
+                    data=results_df.to_csv(index=False),
+                    file_name="bug_improvements.csv",
+                    mime="text/csv"
+                )
+            with col2:
+                st.download_button(
+                    label="📥 Export as JSON",
+                    data=results_df.to_json(orient="records", indent=2),
+                    file_name="bug_improvements.json",
+                    mime="application/json"
+                )
 else:
     st.info("Jira integration is not configured or failed to initialize. Cannot retrieve existing bug reports or provide suggestions.")
     st.info("💡 Please check the main page for Jira connection status.") 
\ No newline at end of file
@@ -8,6 +8,7 @@ from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from testrail_client import TestRailClient, find_similar_test_cases
+from services.cache_manager import CacheManager
 
 st.set_page_config(layout="wide", page_title="TestRail Integration - AI QA Assistant")
 
@@ -78,6 +79,17 @@ else:
             if len(generated_test_cases) > 3:
                 st.markdown(f"... and {len(generated_test_cases) - 3} more cases")
         
+        # Matches found on the Test Design page while the test cases were streaming
+        streamed_similar_cases = st.session_state.get('streamed_similar_cases')
+        if streamed_similar_cases:
+            with st.expander(f"⚡ {len(streamed_similar_cases)} similar test cases found during generation"):
+                st.dataframe(pd.DataFrame([{
+                    'Generated Test Case': gen_case.get('title', 'N/A'),
+                    'TestRail ID': existing_case.get('id', 'N/A'),
+                    'Existing Test Case': existing_case.get('title', 'N/A'),
+                    'Similarity': round(similarity, 2)
+                } for gen_case, existing_case, similarity in streamed_similar_cases]), use_container_width=True)
+        
         # Configuration section
         st.subheader("⚙️ Search Configuration")
         
@@ -134,13 +146,19 @@ else:
                     with st.spinner("Searching TestRail for similar test cases..."):
                         # First get existing test cases from TestRail
                         existing_test_cases = testrail_client.get_all_test_cases(project_id=3)
+                        st.caption(f"🕒 TestRail test cases - {CacheManager.format_data_age(CacheManager.get_testrail_data_age(3, testrail_client.instance))}")
                         
                         if existing_test_cases:
                             # Get similar test cases
-                            similar_cases = find_similar_test_cases(
+                            similar_cases = CacheManager.cache_similarity_analysis(
                                 generated_test_cases,
                                 existing_test_cases,
-                                similarity_threshold=similarity_threshold
+                                similarity_threshold,
+                                lambda: find_similar_test_cases(
+                                    generated_test_cases,
+                                    existing_test_cases,
+                                    similarity_threshold=similarity_threshold
+                                )
                             )
                         else:
                             similar_cases = []
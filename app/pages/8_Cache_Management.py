@@ -2,17 +2,51 @@ import streamlit as st
 import sys
 import os
 import time
+import pandas as pd
 
 # Add the parent directory to the path so we can import from app
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services.cache_manager import CacheManager
+from services.cache_warmer import read_warmup_status
 
 st.set_page_config(layout="wide", page_title="Cache Management - AI QA Assistant")
 
 st.title("⚡ Cache Management")
 st.markdown("Manage application caching to improve performance and control data freshness.")
 
+# Cache layers shown on this page, by namespace
+NAMESPACE_LABELS = {
+    "jira_stories": "Jira User Stories",
+    "jira_bugs": "Jira Bug Tickets",
+    "testrail_cases": "TestRail Test Cases",
+    "testrail_sections": "TestRail Sections",
+    "testrail_index": "TestRail Similarity Index",
+    "llm_responses": "LLM Responses",
+    "adf_text": "Jira Description Text",
+    "sanitized_text": "Text Sanitization",
+    "similarity": "Similarity Analysis",
+    "functions": "Other Cached Functions",
+}
+
+
+def format_bytes(size: float) -> str:
+    """Format a byte count as KB or MB."""
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    return f"{size / 1024:.1f} KB"
+
+
+def format_ttl(seconds: int) -> str:
+    """Format a TTL in seconds as minutes or hours."""
+    if seconds >= 3600 and seconds % 3600 == 0:
+        return f"{seconds // 3600} h"
+    return f"{seconds / 60:.0f} min"
+
+
+cache_status = CacheManager.get_cache_info()
+namespace_stats = cache_status["namespaces"]
+
 # Cache information section
 st.subheader("📊 Cache Information")
 
@@ -20,66 +54,70 @@ col1, col2, col3, col4 = st.columns(4)
 
 with col1:
     st.metric(
-        label="Connection Cache",
-        value="1 hour TTL",
-        help="Jira and TestRail connections are cached for 1 hour"
+        label="Hit Rate",
+        value=f"{cache_status['hit_rate']:.1%}",
+        help="Share of lookups served from memory or disk since the app started (or the counters were reset)"
     )
 
 with col2:
     st.metric(
-        label="Jira Data Cache",
-        value="1 hour TTL",
-        help="User stories and bug tickets are cached for 1 hour"
+        label="Hits / Misses",
+        value=f"{cache_status['hits']} / {cache_status['misses']}",
+        help="Lookups served from the cache vs. lookups that had to load the data"
     )
 
 with col3:
     st.metric(
-        label="TestRail Data Cache", 
-        value="30 min TTL",
-        help="Test cases are cached for 30 minutes, sections for 1 hour"
+        label="Memory Tier",
+        value=format_bytes(cache_status['memory_bytes']),
+        delta=f"of {format_bytes(cache_status['memory_max_bytes'])}",
+        delta_color="off",
+        help=f"Serialized size of the entries in the in-memory LRU (CACHE_MEMORY_MAX_MB); "
+             f"corpora and LLM responses are kept compressed ({cache_status['compression']})"
     )
 
 with col4:
     st.metric(
-        label="LLM Response Cache",
-        value="5 min TTL", 
-        help="AI-generated responses are cached for 5 minutes"
+        label="Disk Tier",
+        value=format_bytes(cache_status['disk_bytes']) if cache_status['disk_enabled'] else "Disabled",
+        delta=f"of {format_bytes(cache_status['disk_max_bytes'])}" if cache_status['disk_enabled'] else None,
+        delta_color="off",
+        help="Size of the entries in the persistent store (CACHE_DISK_MAX_MB)"
     )
 
 # Cache details
 st.subheader("🔍 Cache Details")
 
-cache_info = {
-    "Connection Management": {
-        "Jira Connection": "1 hour TTL - Prevents repeated authentication and connection setup",
-        "TestRail Connection": "1 hour TTL - Prevents repeated authentication and connection setup",
-        "Purpose": "Reduce connection overhead and improve startup performance"
-    },
-    "Jira Integration": {
-        "User Stories": "1 hour TTL - Prevents repeated API calls for story queries",
-        "Bug Tickets": "1 hour TTL - Prevents repeated API calls for bug queries",
-        "Purpose": "Reduce Jira API load and improve response times"
-    },
-    "TestRail Integration": {
-        "Test Cases": "30 minutes TTL - Test cases change less frequently",
-        "Sections": "1 hour TTL - Sections change very infrequently", 
-        "Purpose": "Reduce TestRail API load and improve performance"
-    },
-    "AI/LLM Operations": {
-        "LLM Responses": "5 minutes TTL - Prevents repeated API calls for identical prompts",
-        "Purpose": "Reduce Google Gemini API costs and improve response times"
-    },
-    "Data Processing": {
-        "Text Sanitization": "30 minutes TTL - Sanitization is deterministic",
-        "Similarity Analysis": "10 minutes TTL - Prevents recalculating similarity",
-        "Purpose": "Improve performance for repeated operations"
-    }
-}
+rows = []
+for namespace, stats in namespace_stats.items():
+    rows.append({
+        "Cache": NAMESPACE_LABELS.get(namespace, namespace),
+        "TTL": format_ttl(stats["ttl"]),
+        "Persisted": "Yes" if stats["persisted"] else "No",
+        "Hit Rate": f"{stats['hit_rate']:.0%}",
+        "Memory Hits": stats["memory_hits"],
+        "Disk Hits": stats["disk_hits"],
+        "Stale Hits": stats["stale_hits"],
+        "Misses": stats["misses"],
+        "Expired": stats["expirations"],
+        "Invalidated": stats["invalidations"],
+        "Evictions (mem/disk)": f"{stats['memory_evictions']} / {stats['disk_evictions']}",
+        "Entries (mem/disk)": f"{stats['memory_entries']} / {stats['disk_entries']}",
+        "Size (mem/disk)": f"{format_bytes(stats['memory_bytes'])} / {format_bytes(stats['disk_bytes'])}",
+        "Compression": f"{stats['compression_ratio']:.1f}x" if stats["stored_bytes_written"] else "-",
+        "Loads": stats["loads"],
+        "Load Errors": stats["load_errors"],
+        "Background Refreshes": f"{stats['refreshes']} ({stats['refresh_errors']} failed)",
+        "Avg Load": f"{stats['avg_load_seconds']:.2f}s",
+        "Max Load": f"{stats['max_load_seconds']:.2f}s",
+    })
 
-for category, details in cache_info.items():
-    with st.expander(f"📋 {category}"):
-        for item, description in details.items():
-            st.write(f"**{item}:** {description}")
+st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+st.caption("Compression is the ratio of pickled to stored bytes written since the counters were reset. "
+           "Counters are process-wide and shared by all sessions. Use them to tune CACHE_TTL_<NAMESPACE> "
+           "and the memory/disk limits: many evictions mean a tier is too small, many expirations "
+           "with slow loads mean a TTL is too short. Stale hits were served expired Jira/TestRail data "
+           "while it refreshed in the background.")
 
 # Cache control section
 st.subheader("🎛️ Cache Control")
@@ -88,30 +126,36 @@ col1, col2 = st.columns(2)
 
 with col1:
     st.write("**Cache Actions:**")
-    
+
     if st.button("🗑️ Clear All Caches", type="secondary"):
         CacheManager.clear_all_caches()
         st.rerun()
-    
+
     if st.button("🔄 Refresh Cache Info", type="secondary"):
         st.rerun()
 
+    if st.button("📉 Reset Statistics", type="secondary"):
+        CacheManager.reset_cache_stats()
+        st.rerun()
+
+    auto_refresh = st.checkbox("Auto-refresh statistics every 5 seconds", value=False)
+
 with col2:
     st.write("**Cache Status:**")
-    
-    # Show current cache status
-    cache_status = CacheManager.get_cache_info()
-    
+
     if cache_status["cache_enabled"]:
         st.success("✅ Caching is enabled")
     else:
         st.warning("⚠️ Caching is disabled")
-    
+
+    if not cache_status["disk_enabled"]:
+        st.warning("⚠️ Disk tier unavailable - cached data will not survive a restart")
+
     # Show cache statistics
     if cache_status["cache_enabled"]:
         st.info(f"📈 Cache hits: {cache_status.get('hits', 0)}")
         st.info(f"📉 Cache misses: {cache_status.get('misses', 0)}")
-        
+
         hit_rate = cache_status.get('hit_rate', 0)
         if hit_rate > 0.7:
             st.success(f"🎯 Hit rate: {hit_rate:.1%} (Excellent)")
@@ -120,23 +164,95 @@ with col2:
         else:
             st.warning(f"🎯 Hit rate: {hit_rate:.1%} (Low)")
 
+# Selective invalidation section
+st.subheader("🎯 Selective Invalidation")
+st.markdown("Drop only what is stale - e.g. one TestRail project, one JQL query or old LLM responses - "
+            "and keep the rest of the cache warm.")
+
+col1, col2, col3 = st.columns(3)
+
+with col1:
+    namespace_options = ["All namespaces"] + list(namespace_stats.keys())
+    selected_namespace = st.selectbox(
+        "Namespace",
+        namespace_options,
+        format_func=lambda namespace: NAMESPACE_LABELS.get(namespace, namespace)
+    )
+    invalidate_namespace = None if selected_namespace == "All namespaces" else selected_namespace
+
+with col2:
+    tag_counts = CacheManager.get_cache_tags(invalidate_namespace)
+    tag_options = ["Any tag"] + list(tag_counts.keys())
+    selected_tag = st.selectbox(
+        "Tag",
+        tag_options,
+        format_func=lambda tag: tag if tag == "Any tag" else f"{tag} ({tag_counts[tag]} entries)",
+        help="Tags identify what an entry was cached for: jql:<query>, project:<id>, chain:<name>, story:<key>"
+    )
+    invalidate_tag = None if selected_tag == "Any tag" else selected_tag
+
+with col3:
+    older_than_minutes = st.number_input(
+        "Older than (minutes)",
+        min_value=0,
+        value=0,
+        step=5,
+        help="Only drop entries created more than this many minutes ago (0 = any age)"
+    )
+
+if st.button("🧹 Invalidate Matching Entries", type="secondary"):
+    if invalidate_namespace is None and invalidate_tag is None and older_than_minutes == 0:
+        st.warning("⚠️ Select a namespace, a tag or an age, or use Clear All Caches to drop everything.")
+    else:
+        removed = CacheManager.invalidate(
+            namespace=invalidate_namespace,
+            tag=invalidate_tag,
+            older_than_seconds=older_than_minutes * 60 if older_than_minutes else None
+        )
+        st.success(f"✅ Invalidated {removed} cache entries")
+
+# Cache warm-up section
+st.subheader("🔥 Cache Warm-up")
+
+warmup_status = read_warmup_status()
+if warmup_status is None:
+    st.info("ℹ️ The cache warmer has not run. Start it with `python -m services.cache_warmer` "
+            "(the Docker image starts it with the app).")
+else:
+    if warmup_status["running"]:
+        st.info("⏳ Warm-up in progress...")
+    elif warmup_status["ready"]:
+        finished = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(warmup_status["last_finished_at"]))
+        st.success(f"✅ Last warm-up finished at {finished} in {warmup_status['last_duration_seconds']:.1f}s "
+                   f"({warmup_status['runs']} runs)")
+    elif warmup_status["last_finished_at"]:
+        st.warning("⚠️ Not ready: some warm-up jobs have not loaded their data yet (see the failed jobs below). "
+                   "They are retried on the next warm-up.")
+    if warmup_status.get("next_run_at"):
+        st.caption(f"Next warm-up at {time.strftime('%H:%M:%S', time.localtime(warmup_status['next_run_at']))}")
+    if warmup_status["jobs"]:
+        st.dataframe(pd.DataFrame([
+            {"Job": name, "Status": job["status"], "Items": job["items"],
+             "Duration": f"{job['seconds']:.1f}s", "Error": job["error"] or ""}
+            for name, job in warmup_status["jobs"].items()
+        ]), use_container_width=True, hide_index=True)
+
 # Cache configuration
 st.subheader("⚙️ Cache Configuration")
 
-st.info("💡 Cache settings are configured in the application. For detailed configuration options, see the CACHING_GUIDE.md file.")
+st.info("💡 Cache limits and TTLs are configured in .env (CACHE_MEMORY_MAX_MB, CACHE_DISK_MAX_MB, CACHE_TTL_<NAMESPACE>). See ENV_TEMPLATE.md.")
 
 # Show cache directory info
 cache_dir = CacheManager.get_cache_directory()
 if cache_dir:
     st.write(f"**Cache Directory:** `{cache_dir}`")
-    
+
     # Show cache size if available
     try:
-        import os
         cache_size = sum(os.path.getsize(os.path.join(dirpath, filename))
                         for dirpath, dirnames, filenames in os.walk(cache_dir)
                         for filename in filenames)
-        
+
         if cache_size > 0:
             # Convert to MB
             cache_size_mb = cache_size / (1024 * 1024)
@@ -146,4 +262,8 @@ if cache_dir:
     except Exception as e:
         st.write(f"**Cache Size:** Unable to calculate ({str(e)})")
 else:
-    st.warning("⚠️ Cache directory not configured") 
\ No newline at end of file
+    st.warning("⚠️ Cache directory not configured")
+
+if auto_refresh:
+    time.sleep(5)
+    st.rerun()
@@ -1,3 +1,4 @@
+import html
 import streamlit as st
 import sys
 import os
@@ -53,15 +54,13 @@ with col2:
     st.subheader("🔒 Sanitized Output")
     
     if input_text.strip():
-        # Perform sanitization
-        sanitized_text = sanitizer.sanitize_text(input_text)
+        # Sanitize and summarize in one scan
+        summary = sanitizer.sanitize_with_summary(input_text)
+        sanitized_text = summary['sanitized_text']
         
         # Display sanitized text
         st.text_area("Sanitized text:", value=sanitized_text, height=200, key="sanitized_output_preview")
         
-        # Show sanitization summary
-        summary = sanitizer.get_sanitization_summary(input_text, sanitized_text)
-        
         st.subheader("📊 Sanitization Summary")
         
         # Metrics
@@ -84,8 +83,17 @@ with col2:
         # Visual comparison
         st.subheader("🔍 Side-by-Side Comparison")
         
-        # Create a visual diff-like display
-        original_lines = input_text.split('\n')
+        # Create a visual diff-like display, highlighting the replaced text from the summary matches
+        highlighted_parts = []
+        position = 0
+        for match in summary['matches']:
+            highlighted_parts.append(html.escape(input_text[position:match['start']]))
+            # One highlight per line, so a match spanning lines does not break the line paragraphs
+            highlight = f'<span class="highlight" title="{match["category"]}">'
+            highlighted_parts.append(highlight + html.escape(match['text']).replace('\n', '</span>\n' + highlight) + '</span>')
+            position = match['end']
+        highlighted_parts.append(html.escape(input_text[position:]))
+        original_lines = ''.join(highlighted_parts).split('\n')
         sanitized_lines = sanitized_text.split('\n')
         
         comparison_html = """
@@ -103,13 +111,7 @@ with col2:
         
         for line in original_lines:
             if line.strip():
-                # Highlight sensitive terms
-                highlighted_line = line
-                for category, patterns in sanitizer.sensitive_patterns.items():
-                    for pattern in patterns:
-                        import re
-                        highlighted_line = re.sub(pattern, r'<span class="highlight">\g<0></span>', highlighted_line, flags=re.IGNORECASE)
-                comparison_html += f"<p>{highlighted_line}</p>"
+                comparison_html += f"<p>{line}</p>"
             else:
                 comparison_html += "<p><br></p>"
         
@@ -121,7 +123,7 @@ with col2:
         
         for line in sanitized_lines:
             if line.strip():
-                comparison_html += f"<p>{line}</p>"
+                comparison_html += f"<p>{html.escape(line)}</p>"
             else:
                 comparison_html += "<p><br></p>"
         
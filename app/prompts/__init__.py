@@ -1,5 +1,6 @@
 from .user_story_analysis import user_story_analysis_prompt_template
 from .test_case_generation import test_case_generation_prompt_template
+from .test_case_generation_json import test_case_generation_json_prompt_template
 from .test_automation import test_automation_prompt_template
 from .bug_improvement import bug_improvement_prompt_template
 from .user_story_review import user_story_review_prompt_template
@@ -41,6 +41,9 @@ Act with empathy, diligence and a focus on user experience and product quality.
 5. **Open Questions for the Team**  
    - List any clarifications needed to complete analysis (max 5).  
 
+#### 📤  Output Format  
+Answer with one section per task, in order, each starting with the task title above as a heading on its own line (e.g. `### 3. Impact & Risk Assessment`).
+
 ---
 """
 
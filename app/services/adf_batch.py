@@ -0,0 +1,115 @@
+"""
+Batch conversion of Jira descriptions from ADF to text
+Each page of issues is converted in a background thread while the next page downloads, in worker
+processes when the page holds a lot of ADF. Converted text is cached by the version of the payload
+(issue key and last update time when known, a hash of the ADF otherwise), so refetched issues that
+did not change are not parsed again.
+"""
+
+import json
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, List, Optional
+from config import get_adf_parser_config
+from services.adf_parser import ADFParser
+from services.cache_manager import CacheManager
+from services.fingerprint import fast_hash
+from services.worker_pool import get_worker_pool, get_worker_count, split_by_size
+
+
+def parse_adf_chunk(documents: List[Any]) -> List[str]:
+    """Convert a chunk of ADF descriptions to text (runs in the worker processes)."""
+    return [ADFParser.parse_adf_to_text(document) for document in documents]
+
+
+def _payload_hash(document: Any) -> str:
+    """Hash an ADF payload (dict, JSON string or plain text)."""
+    if isinstance(document, str):
+        return fast_hash(document)
+    return fast_hash(json.dumps(document, separators=(",", ":"), default=str))
+
+
+def _block_count(document: Any) -> int:
+    """Rough amount of work in an ADF payload: top-level blocks, or one per KB of a string payload."""
+    if isinstance(document, dict):
+        content = document.get('content')
+        return len(content) if isinstance(content, list) else 1
+    if isinstance(document, str):
+        return 1 + len(document) // 1024
+    return 1
+
+
+def parse_adf_batch(documents: List[Any], versions: Optional[List[str]] = None) -> List[str]:
+    """
+    Convert many ADF descriptions to text, skipping the ones already converted
+
+    Args:
+        documents: ADF descriptions (dict, JSON string, plain text or None)
+        versions: Optional version of each description that changes whenever it does
+                  (e.g. issue key and last update time); when omitted the ADF payloads are hashed,
+                  which costs about as much as converting them
+
+    Returns:
+        Text of each description, in order
+    """
+    keys = versions if versions is not None else [_payload_hash(document) for document in documents]
+    texts = CacheManager.get_adf_text_batch(keys)
+
+    # Each distinct uncached payload is converted once
+    pending = {}
+    for index, key in enumerate(keys):
+        if key not in texts and key not in pending:
+            pending[key] = index
+    if pending:
+        converted = dict(zip(pending, _parse_uncached([documents[index] for index in pending.values()])))
+        CacheManager.cache_adf_text_batch(converted)
+        texts.update(converted)
+
+    return [texts[key] for key in keys]
+
+
+def _parse_uncached(documents: List[Any]) -> List[str]:
+    """Convert ADF descriptions to text, in worker processes if there is enough ADF."""
+    config = get_adf_parser_config()
+    workers = get_worker_count(config['workers'])
+    sizes = [_block_count(document) for document in documents]
+    if workers <= 1 or sum(sizes) < config['parallel_min_blocks']:
+        return parse_adf_chunk(documents)
+
+    try:
+        results = get_worker_pool(workers).map(parse_adf_chunk, split_by_size(documents, sizes, workers))
+        return [text for chunk_result in results for text in chunk_result]
+    except Exception as e:
+        print(f"ADF worker pool failed, converting in the app process: {e}")
+        get_worker_pool.clear()
+        return parse_adf_chunk(documents)
+
+
+class ADFBatchParser:
+    """
+    Converts the descriptions of a paginated fetch page by page, in the background, so parsing
+    a page overlaps downloading the next one. Pages are converted one at a time, in order.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="adf-batch")
+        self._pages: List[Future] = []
+
+    def submit(self, documents: List[Any], versions: Optional[List[str]] = None) -> None:
+        """Start converting the descriptions of one page (see parse_adf_batch)."""
+        self._pages.append(self._executor.submit(parse_adf_batch, documents, versions))
+
+    def results(self) -> List[str]:
+        """
+        Wait for every submitted page to be converted
+
+        Returns:
+            Text of each description, in submission order
+        """
+        try:
+            return [text for page in self._pages for text in page.result()]
+        finally:
+            self._executor.shutdown(wait=False)
+
+    def close(self) -> None:
+        """Stop converting, dropping the pages not converted yet (when the fetch failed)."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
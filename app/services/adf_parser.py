@@ -4,7 +4,31 @@ Converts ADF JSON content to readable text
 """
 
 import json
-from typing import Any, Dict, List, Union
+import re
+from typing import Any, Callable, Dict, List, Union
+
+# Marks the end of a content array on the stack of ADFParser._write_text
+_END = object()
+
+# Section types of ADFParser.extract_sections, from the most to the least relevant for a prompt
+SECTION_TYPES = ("acceptance_criteria", "heading", "text", "list", "table", "code")
+
+# Section type of each top-level ADF node type (other node types are text)
+_NODE_SECTION_TYPES = {
+    'heading': "heading",
+    'bulletList': "list",
+    'orderedList': "list",
+    'taskList': "list",
+    'table': "table",
+    'codeBlock': "code",
+}
+
+# Headings and lead-in paragraphs (e.g. "Acceptance Criteria:") that start the acceptance criteria
+_ACCEPTANCE_CRITERIA = re.compile(r'^[#*\s]*(acceptance criteria|definition of done|ACs?\b)', re.IGNORECASE)
+
+# Lines of rendered text that start a heading, a list item or a table row
+_HEADING_LINE = re.compile(r'#+ ')
+_LIST_LINE = re.compile(r'(• |\d+\. |\[[ x]\] )')
 
 class ADFParser:
     """
@@ -46,6 +70,119 @@ class ADFParser:
         # Fallback: convert to string
         return str(adf_content)
     
+    @staticmethod
+    def extract_sections(adf_content: Union[str, Dict, None]) -> List[Dict[str, Any]]:
+        """
+        Extract the typed sections of ADF content, so prompts can include only the relevant ones
+        
+        Every top-level block is a section; lists, paragraphs and tables under an acceptance
+        criteria heading (or after an "Acceptance Criteria:" paragraph) are acceptance criteria.
+        
+        Args:
+            adf_content: ADF content as string, dict, or None
+            
+        Returns:
+            Sections in document order, as dictionaries with type (see SECTION_TYPES), heading
+            (text of the heading the section is under), text and size (characters). Their texts
+            joined with newlines give parse_adf_to_text
+        """
+        adf_dict = adf_content
+        if isinstance(adf_content, str) and adf_content.strip().startswith('{'):
+            try:
+                adf_dict = json.loads(adf_content)
+            except json.JSONDecodeError:
+                pass
+        if not isinstance(adf_dict, dict) or adf_dict.get('type') != 'doc' or not adf_dict.get('content'):
+            # Plain text or not a document: recover the sections from the text
+            return ADFParser.split_sections(ADFParser.parse_adf_to_text(adf_content))
+        
+        blocks = []
+        for node in adf_dict['content']:
+            if not isinstance(node, dict):
+                continue
+            out: List[str] = []
+            if ADFParser._write_node(node, out):
+                blocks.append((_NODE_SECTION_TYPES.get(node.get('type', ''), "text"), "".join(out)))
+        return ADFParser._build_sections(blocks)
+    
+    @staticmethod
+    def split_sections(text: str) -> List[Dict[str, Any]]:
+        """
+        Split text rendered by parse_adf_to_text (or any plain description) back into typed sections
+        
+        Args:
+            text: Plain text of a description
+            
+        Returns:
+            Sections in document order, as extract_sections returns them; consecutive
+            paragraphs, list items and table rows form one section
+        """
+        if not text:
+            return []
+        
+        lines = text.split("\n")
+        blocks = []
+        index = 0
+        while index < len(lines):
+            line = lines[index]
+            start = index
+            index += 1
+            if line.startswith("```"):
+                section_type = "code"
+                # Up to the closing fence (the rest of the text if it is missing)
+                while index < len(lines):
+                    index += 1
+                    if lines[index - 1] == "```":
+                        break
+            elif _HEADING_LINE.match(line):
+                section_type = "heading"
+            elif line.startswith("| "):
+                section_type = "table"
+                while index < len(lines) and lines[index].startswith("| "):
+                    index += 1
+            elif _LIST_LINE.match(line):
+                section_type = "list"
+                while index < len(lines) and _LIST_LINE.match(lines[index]):
+                    index += 1
+            else:
+                section_type = "text"
+                while index < len(lines) and not ADFParser._starts_section(lines[index]):
+                    index += 1
+            blocks.append((section_type, "\n".join(lines[start:index])))
+        return ADFParser._build_sections(blocks)
+    
+    @staticmethod
+    def _starts_section(line: str) -> bool:
+        """Check whether a line of rendered text starts a code block, heading, table or list."""
+        return line.startswith(("```", "| ")) or bool(_HEADING_LINE.match(line) or _LIST_LINE.match(line))
+    
+    @staticmethod
+    def _build_sections(blocks: List[tuple]) -> List[Dict[str, Any]]:
+        """
+        Build the sections of a description from its (type, text) blocks, marking acceptance criteria
+        
+        Args:
+            blocks: Section type and text of each block, in document order
+            
+        Returns:
+            Section dictionaries (type, heading, text, size)
+        """
+        sections = []
+        heading = ""
+        in_criteria = False
+        for section_type, text in blocks:
+            if section_type == "heading":
+                heading = text.lstrip("# ")
+                in_criteria = bool(_ACCEPTANCE_CRITERIA.match(heading))
+            elif section_type == "text" and _ACCEPTANCE_CRITERIA.match(text):
+                # Lead-in paragraph: the criteria follow it until the next heading
+                in_criteria = True
+                section_type = "acceptance_criteria"
+            elif in_criteria and section_type in ("text", "list", "table"):
+                section_type = "acceptance_criteria"
+            sections.append({"type": section_type, "heading": heading, "text": text, "size": len(text)})
+        return sections
+    
     @staticmethod
     def _parse_adf_dict(adf_dict: Dict[str, Any]) -> str:
         """
@@ -76,197 +213,181 @@ class ADFParser:
             content: List of ADF content nodes
             
         Returns:
-            Plain text representation
+            Plain text representation (non-empty nodes separated by newlines)
         """
         if not content:
             return ""
         
-        result = []
-        
+        # Every node writes its pieces into one buffer, joined once at the end
+        out: List[str] = []
         for node in content:
-            node_text = ADFParser._parse_node(node)
-            if node_text:
-                result.append(node_text)
-        
-        return "\n".join(result)
+            if not isinstance(node, dict):
+                continue
+            start = len(out)
+            if start:
+                out.append("\n")
+            if not ADFParser._write_node(node, out):
+                del out[start:]
+        
+        return "".join(out)
     
     @staticmethod
-    def _parse_node(node: Dict[str, Any]) -> str:
+    def _write_node(node: Dict[str, Any], out: List[str]) -> bool:
         """
-        Parse a single ADF node to text
+        Write a single ADF node as text
         
         Args:
             node: ADF node dictionary
+            out: Output buffer
             
         Returns:
-            Plain text representation of the node
+            True if the node has text (otherwise what it wrote is dropped)
         """
-        if not isinstance(node, dict):
-            return ""
-        
         node_type = node.get('type', '')
         content = node.get('content', [])
         attrs = node.get('attrs', {})
         
-        # Parse text content
-        text_content = ADFParser._extract_text_from_content(content)
-        
         # Apply formatting based on node type
         if node_type == 'heading':
-            level = attrs.get('level', 1)
-            return f"{'#' * level} {text_content}"
-        
-        elif node_type == 'paragraph':
-            return text_content
+            out.append(f"{'#' * attrs.get('level', 1)} ")
+            ADFParser._write_text(content, out)
+            return True
         
         elif node_type == 'bulletList':
-            return ADFParser._parse_list(content, bullet=True)
+            return ADFParser._write_items(content, out, 'listItem', lambda index, item: "• ")
         
         elif node_type == 'orderedList':
-            return ADFParser._parse_list(content, bullet=False)
+            return ADFParser._write_items(content, out, 'listItem', lambda index, item: f"{index + 1}. ")
         
         elif node_type == 'taskList':
-            return ADFParser._parse_task_list(content)
+            return ADFParser._write_items(
+                content, out, 'taskItem',
+                lambda index, item: "[x] " if item.get('attrs', {}).get('state', 'TODO') == "DONE" else "[ ] "
+            )
         
         elif node_type == 'codeBlock':
-            language = attrs.get('language', '')
-            return f"```{language}\n{text_content}\n```"
+            out.append(f"```{attrs.get('language', '')}\n")
+            ADFParser._write_text(content, out)
+            out.append("\n```")
+            return True
         
         elif node_type == 'blockquote':
-            return f"> {text_content}"
+            out.append("> ")
+            ADFParser._write_text(content, out)
+            return True
         
         elif node_type == 'table':
-            return ADFParser._parse_table(content)
+            return ADFParser._write_items(content, out, 'tableRow', lambda index, item: "| ", " |")
         
         else:
-            # For unknown node types, just return the text content
-            return text_content
+            # Paragraphs and unknown node types: just the text content
+            return ADFParser._write_text(content, out)
     
     @staticmethod
-    def _extract_text_from_content(content: List[Dict[str, Any]]) -> str:
+    def _write_text(content: List[Dict[str, Any]], out: List[str]) -> bool:
         """
-        Extract plain text from ADF content array
+        Write the plain text of an ADF content array, with nested content flattened
+        
+        Nested nodes are walked with an explicit stack of iterators, so deeply nested
+        content (lists in tables in panels) does not recurse.
         
         Args:
             content: List of ADF content nodes
+            out: Output buffer
             
         Returns:
-            Plain text
+            True if any text was written
         """
         if not content:
-            return ""
-        
-        result = []
-        
-        for node in content:
-            if isinstance(node, dict):
-                node_type = node.get('type', '')
-                
-                if node_type == 'text':
-                    text = node.get('text', '')
-                    marks = node.get('marks', [])
-                    
-                    # Apply text formatting
-                    for mark in marks:
-                        mark_type = mark.get('type', '')
-                        if mark_type == 'strong':
-                            text = f"**{text}**"
-                        elif mark_type == 'em':
-                            text = f"*{text}*"
-                        elif mark_type == 'code':
-                            text = f"`{text}`"
-                        elif mark_type == 'link':
-                            href = mark.get('attrs', {}).get('href', '')
-                            if href:
-                                text = f"[{text}]({href})"
-                    
-                    result.append(text)
-                
-                elif 'content' in node:
-                    # Recursively parse nested content
-                    nested_text = ADFParser._extract_text_from_content(node['content'])
-                    if nested_text:
-                        result.append(nested_text)
-        
-        return "".join(result)
-    
-    @staticmethod
-    def _parse_list(content: List[Dict[str, Any]], bullet: bool = True) -> str:
-        """
-        Parse list content to text
-        
-        Args:
-            content: List of ADF list item nodes
-            bullet: Whether this is a bullet list (True) or ordered list (False)
+            return False
+        
+        written = False
+        append = out.append
+        stack = [iter(content)]
+        current = stack[-1]
+        while True:
+            node = next(current, _END)
+            if node is _END:
+                stack.pop()
+                if not stack:
+                    break
+                current = stack[-1]
+                continue
+            if not isinstance(node, dict):
+                continue
             
-        Returns:
-            Formatted list text
-        """
-        if not content:
-            return ""
-        
-        result = []
-        
-        for i, item in enumerate(content):
-            if isinstance(item, dict) and item.get('type') == 'listItem':
-                item_content = ADFParser._extract_text_from_content(item.get('content', []))
-                if item_content:
-                    if bullet:
-                        result.append(f"• {item_content}")
-                    else:
-                        result.append(f"{i + 1}. {item_content}")
-        
-        return "\n".join(result)
-    
-    @staticmethod
-    def _parse_task_list(content: List[Dict[str, Any]]) -> str:
-        """
-        Parse task list content to text
-        
-        Args:
-            content: List of ADF task item nodes
-            
-        Returns:
-            Formatted task list text
-        """
-        if not content:
-            return ""
-        
-        result = []
-        
-        for item in content:
-            if isinstance(item, dict) and item.get('type') == 'taskItem':
-                item_content = ADFParser._extract_text_from_content(item.get('content', []))
-                state = item.get('attrs', {}).get('state', 'TODO')
+            if node.get('type', '') == 'text':
+                text = node.get('text', '')
+                marks = node.get('marks', [])
+                if not marks:
+                    if text:
+                        append(text)
+                        written = True
+                    continue
                 
-                if item_content:
-                    checkbox = "[x]" if state == "DONE" else "[ ]"
-                    result.append(f"{checkbox} {item_content}")
+                # Marks wrap the text in order: the first mark is innermost
+                opening = []
+                closing = []
+                for mark in marks:
+                    mark_type = mark.get('type', '')
+                    if mark_type == 'strong':
+                        opening.append("**")
+                        closing.append("**")
+                    elif mark_type == 'em':
+                        opening.append("*")
+                        closing.append("*")
+                    elif mark_type == 'code':
+                        opening.append("`")
+                        closing.append("`")
+                    elif mark_type == 'link':
+                        href = mark.get('attrs', {}).get('href', '')
+                        if href:
+                            opening.append("[")
+                            closing.append(f"]({href})")
+                out.extend(reversed(opening))
+                append(text)
+                out.extend(closing)
+                written = written or bool(text or closing)
+            
+            elif 'content' in node:
+                nested = node['content']
+                if nested:
+                    current = iter(nested)
+                    stack.append(current)
         
-        return "\n".join(result)
+        return written
     
     @staticmethod
-    def _parse_table(content: List[Dict[str, Any]]) -> str:
+    def _write_items(content: List[Dict[str, Any]], out: List[str], item_type: str,
+                     prefix: Callable[[int, Dict[str, Any]], str], suffix: str = "") -> bool:
         """
-        Parse table content to text
+        Write the items of a list, task list or table, one per line
         
         Args:
-            content: List of ADF table nodes
+            content: List of ADF item nodes
+            out: Output buffer
+            item_type: Type of the item nodes (other nodes are skipped but still numbered)
+            prefix: Function of (index, item) giving the text before an item
+            suffix: Text after an item
             
         Returns:
-            Formatted table text
+            True if any item has text (items without text are dropped)
         """
         if not content:
-            return ""
-        
-        # This is a simplified table parser
-        # For complex tables, you might want to implement more sophisticated formatting
-        result = []
-        
-        for node in content:
-            if isinstance(node, dict) and node.get('type') == 'tableRow':
-                row_content = ADFParser._extract_text_from_content(node.get('content', []))
-                if row_content:
-                    result.append(f"| {row_content} |")
+            return False
+        
+        written = False
+        for index, item in enumerate(content):
+            if not isinstance(item, dict) or item.get('type') != item_type:
+                continue
+            start = len(out)
+            if written:
+                out.append("\n")
+            out.append(prefix(index, item))
+            if ADFParser._write_text(item.get('content', []), out):
+                out.append(suffix)
+                written = True
+            else:
+                del out[start:]
         
-        return "\n".join(result) 
\ No newline at end of file
+        return written
@@ -0,0 +1,99 @@
+"""
+Serialization of cache entries
+Values are pickled and, for large corpora and LLM outputs, compressed with zstd (or LZ4, or zlib
+when neither is installed). The first byte of a payload names its codec.
+"""
+
+import pickle
+import zlib
+from typing import Any, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+# Payload header bytes; pickles start with 0x80 (protocol 2+), so payloads stored before
+# compression existed are still read as plain pickles
+HEADER_PICKLE = b"P"
+HEADER_ZSTD = b"Z"
+HEADER_LZ4 = b"L"
+HEADER_ZLIB = b"z"
+LEGACY_PICKLE = b"\x80"
+
+CODECS = ("zstd", "lz4", "zlib", "none")
+
+# Below this pickled size compression saves too little to pay for itself
+MIN_COMPRESS_BYTES = 1024
+
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+
+
+def resolve_codec(preferred: str = "auto") -> str:
+    """
+    Get the codec to compress with
+
+    Args:
+        preferred: auto (best installed), zstd, lz4, zlib or none
+
+    Returns:
+        An installed codec name (falls back to the best installed one)
+    """
+    available = [codec for codec, module in (("zstd", zstandard), ("lz4", lz4)) if module is not None]
+    available += ["zlib", "none"]
+    if preferred in available:
+        return preferred
+    if preferred not in ("auto", *CODECS):
+        print(f"Unknown cache compression '{preferred}', using {available[0]}")
+    return available[0]
+
+
+def encode(value: Any, codec: str) -> Tuple[bytes, int]:
+    """
+    Pickle and compress a value
+
+    Args:
+        value: Picklable value
+        codec: zstd, lz4, zlib or none (see resolve_codec)
+
+    Returns:
+        Tuple of (payload, pickled size before compression)
+    """
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if codec == "none" or len(data) < MIN_COMPRESS_BYTES:
+        return HEADER_PICKLE + data, len(data)
+    if codec == "zstd":
+        return HEADER_ZSTD + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data), len(data)
+    if codec == "lz4":
+        return HEADER_LZ4 + lz4.frame.compress(data), len(data)
+    return HEADER_ZLIB + zlib.compress(data, ZLIB_LEVEL), len(data)
+
+
+def decode(payload: bytes) -> Any:
+    """
+    Decompress and unpickle a payload produced by encode
+
+    Args:
+        payload: Encoded value
+
+    Returns:
+        The value
+    """
+    header, data = payload[:1], payload[1:]
+    if header == HEADER_PICKLE:
+        return pickle.loads(data)
+    if header == HEADER_ZSTD:
+        return pickle.loads(zstandard.ZstdDecompressor().decompress(data))
+    if header == HEADER_LZ4:
+        return pickle.loads(lz4.frame.decompress(data))
+    if header == HEADER_ZLIB:
+        return pickle.loads(zlib.decompress(data))
+    if header == LEGACY_PICKLE:
+        return pickle.loads(payload)
+    raise ValueError(f"Unknown cache payload header {header!r}")
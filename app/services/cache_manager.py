@@ -1,153 +1,998 @@
 import streamlit as st
-import hashlib
+import contextlib
 import json
-from typing import Dict, List, Any, Optional, Callable
-from datetime import datetime, timedelta
+import os
+import random
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Callable, Tuple
 import time
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from config import get_cache_config, get_cache_ttl
+from services.single_flight import single_flight
+from services.fingerprint import fingerprint
+from services.cache_codec import encode, decode, resolve_codec
+
+# Default TTL (seconds) per cache namespace, whether its entries are also kept on disk, whether
+# expired entries keep being served while a background thread refreshes them (stale-while-revalidate)
+# and whether entries are kept compressed (decoded on every read) in both tiers.
+# TTLs can be overridden with CACHE_TTL_<NAMESPACE> in .env.
+CACHE_NAMESPACES = {
+    "jira_stories": {"ttl": 3600, "disk": True, "stale_while_revalidate": True, "compress": True},
+    "jira_bugs": {"ttl": 3600, "disk": True, "stale_while_revalidate": True, "compress": True},
+    "testrail_cases": {"ttl": 1800, "disk": True, "stale_while_revalidate": True, "compress": True},
+    "testrail_sections": {"ttl": 3600, "disk": True, "stale_while_revalidate": True, "compress": True},
+    # Similarity index (titles and step text) derived from the TestRail test cases
+    "testrail_index": {"ttl": 1800, "disk": True, "stale_while_revalidate": True, "compress": True},
+    "llm_responses": {"ttl": 300, "disk": True, "stale_while_revalidate": False, "compress": True},
+    # Cheaper to recompute than to write to disk for every story; small and read often, so kept decoded
+    "sanitized_text": {"ttl": 1800, "disk": False, "stale_while_revalidate": False, "compress": False},
+    # Text of Jira descriptions by version of their ADF payload, so refetched issues that did not change are not parsed again;
+    # kept decoded, since decompressing is a large part of the cost of parsing
+    "adf_text": {"ttl": 86400, "disk": False, "stale_while_revalidate": False, "compress": False},
+    # Original values of pseudonymization tokens, encrypted by PseudonymMap before they are stored;
+    # outlive the Jira corpora holding the tokens (TTL + stale period)
+    "pseudonyms": {"ttl": 172800, "disk": True, "stale_while_revalidate": False, "compress": False},
+    "similarity": {"ttl": 600, "disk": False, "stale_while_revalidate": False, "compress": False},
+    "functions": {"ttl": 3600, "disk": False, "stale_while_revalidate": False, "compress": False},
+}
+
+DISK_STORE_FILENAME = "cache.sqlite3"
+
+# Counters kept per namespace (see TieredCache.get_stats)
+STAT_COUNTERS = ("memory_hits", "disk_hits", "stale_hits", "misses", "expirations", "memory_evictions",
+                 "disk_evictions", "invalidations", "loads", "load_errors", "load_seconds", "max_load_seconds",
+                 "refreshes", "refresh_errors", "raw_bytes_written", "stored_bytes_written")
+
+_MISSING = object()
+
+# Namespaces whose lookups are skipped (forcing a reload) in the current thread, see CacheManager.force_refresh
+_force_refresh = threading.local()
+
+
+def loading_spinner(text: str):
+    """
+    st.spinner for cache loaders. Loaders also run in background refresh threads,
+    which have no page to draw on, so there the spinner is skipped.
+    """
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return contextlib.nullcontext()
+    return st.spinner(text)
+
+
+class CacheEntry:
+    """
+    A cached value with its namespace, serialized size, expiry times and tags.
+    The entry is fresh until expires_at and may be served stale until stale_until.
+    Entries of compressed namespaces hold only the encoded payload (value is _MISSING).
+    """
+
+    __slots__ = ("value", "payload", "namespace", "size", "created_at", "expires_at", "stale_until", "tags")
+
+    def __init__(self, value: Any, payload: Optional[bytes], namespace: str, size: int, created_at: float,
+                 expires_at: float, stale_until: float, tags: List[str]):
+        self.value = value
+        self.payload = payload
+        self.namespace = namespace
+        self.size = size
+        self.created_at = created_at
+        self.expires_at = expires_at
+        self.stale_until = stale_until
+        self.tags = tags
+
+    def get_value(self) -> Any:
+        """Get the cached value, decompressing the payload of compressed entries."""
+        if self.value is _MISSING:
+            return decode(self.payload)
+        return self.value
+
+
+class TieredCache:
+    """
+    Two-tier cache: a bounded in-memory LRU in front of a persistent SQLite store.
+    Entries belong to a namespace that sets their TTL and whether they are persisted.
+    Both tiers are limited in bytes (serialized size). The memory tier evicts the least
+    recently used entries; the disk tier evicts by last access time, which is stored with
+    the entries so the eviction order survives restarts.
+    Stale-while-revalidate namespaces keep serving an expired entry (for up to stale_max_seconds)
+    while a background thread reloads it; the new value replaces the old one in a single step.
+    Cached values are shared between sessions and must be treated as read-only.
+    """
+
+    def __init__(self, directory: str, memory_max_bytes: int, disk_max_bytes: int,
+                 stale_max_seconds: int = 86400, ttl_jitter: float = 0.1, compression: str = "auto"):
+        self.directory = directory
+        self.codec = resolve_codec(compression)
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.stale_max_seconds = stale_max_seconds
+        self.ttl_jitter = ttl_jitter
+        self._refreshing = set()
+        self._memory: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.RLock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._db = self._open_disk_store()
+
+    def _open_disk_store(self) -> Optional[sqlite3.Connection]:
+        """Open (or create) the SQLite store and drop what expired while the app was stopped."""
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            db = sqlite3.connect(os.path.join(self.directory, DISK_STORE_FILENAME),
+                                 check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    namespace TEXT NOT NULL,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL,
+                    stale_until REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    tags TEXT NOT NULL DEFAULT '[]'
+                )
+            """)
+            columns = [row[1] for row in db.execute("PRAGMA table_info(cache_entries)").fetchall()]
+            if "stale_until" not in columns:
+                # Store created before stale-while-revalidate: existing entries are never served stale
+                db.execute("ALTER TABLE cache_entries ADD COLUMN stale_until REAL NOT NULL DEFAULT 0")
+                db.execute("UPDATE cache_entries SET stale_until = expires_at")
+            db.execute("CREATE INDEX IF NOT EXISTS idx_cache_namespace ON cache_entries (namespace)")
+            db.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_access ON cache_entries (last_access)")
+            db.execute("DELETE FROM cache_entries WHERE stale_until <= ?", (time.time(),))
+            self._disk_bytes = db.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+            self._db = db
+            self._enforce_disk_limit()
+            return db
+        except (OSError, sqlite3.Error) as e:
+            print(f"Disk cache unavailable at {self.directory}, using memory only: {e}")
+            return None
+
+    @staticmethod
+    def _full_key(namespace: str, key: str) -> str:
+        return f"{namespace}:{key}"
+
+    @staticmethod
+    def get_ttl(namespace: str) -> int:
+        """Get the TTL in seconds of a namespace."""
+        return get_cache_ttl(namespace, CACHE_NAMESPACES.get(namespace, CACHE_NAMESPACES["functions"])["ttl"])
+
+    @staticmethod
+    def is_persisted(namespace: str) -> bool:
+        """Check whether a namespace is kept on disk."""
+        return CACHE_NAMESPACES.get(namespace, CACHE_NAMESPACES["functions"])["disk"]
+
+    @staticmethod
+    def is_compressed(namespace: str) -> bool:
+        """Check whether a namespace keeps its entries compressed."""
+        return CACHE_NAMESPACES.get(namespace, CACHE_NAMESPACES["functions"])["compress"]
+
+    @staticmethod
+    def serves_stale(namespace: str) -> bool:
+        """Check whether a namespace serves expired entries while they are refreshed in the background."""
+        return CACHE_NAMESPACES.get(namespace, CACHE_NAMESPACES["functions"])["stale_while_revalidate"]
+
+    def get(self, namespace: str, key: str, default: Any = None, record_stats: bool = True) -> Any:
+        """
+        Get a fresh cached value, looking in memory first and then on disk
+
+        Args:
+            namespace: Cache namespace (see CACHE_NAMESPACES)
+            key: Key within the namespace
+            default: Returned when the key is missing or expired
+            record_stats: Count the lookup in the hit/miss statistics
+
+        Returns:
+            The cached value or default
+        """
+        entry, tier = self._lookup(namespace, key)
+        with self._lock:
+            # Lookups that are not recorded update a throwaway dictionary
+            stats = self._namespace_stats(namespace) if record_stats else {counter: 0 for counter in STAT_COUNTERS}
+            fresh = entry is not None and entry.expires_at > time.time()
+            if fresh:
+                stats[f"{tier}_hits"] += 1
+            else:
+                if entry is not None:
+                    stats["expirations"] += 1
+                stats["misses"] += 1
+        return entry.get_value() if fresh else default
+
+    def get_entry_age(self, namespace: str, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Describe how old the cached value of a key is, without counting a lookup
+
+        Args:
+            namespace: Cache namespace (see CACHE_NAMESPACES)
+            key: Key within the namespace
+
+        Returns:
+            Dictionary with age_seconds, stale and refreshing, or None if nothing is cached
+        """
+        entry, _ = self._lookup(namespace, key)
+        if entry is None:
+            return None
+        now = time.time()
+        with self._lock:
+            refreshing = self._full_key(namespace, key) in self._refreshing
+        return {"age_seconds": now - entry.created_at, "stale": entry.expires_at <= now, "refreshing": refreshing}
+
+    def _lookup(self, namespace: str, key: str) -> Tuple[Optional[CacheEntry], Optional[str]]:
+        """
+        Find an entry that may still be served (fresh, or stale within its grace period)
+
+        Returns:
+            Tuple of (entry, tier it was found in: "memory" or "disk"), or (None, None)
+        """
+        full_key = self._full_key(namespace, key)
+        now = time.time()
+        with self._lock:
+            memory_entry = self._memory.get(full_key)
+            if memory_entry is not None:
+                if memory_entry.expires_at > now:
+                    self._memory.move_to_end(full_key)
+                    return memory_entry, "memory"
+                if memory_entry.stale_until <= now:
+                    self._remove_from_memory(full_key)
+                    memory_entry = None
+
+            # A stale memory entry may have been replaced on disk by another process (the cache warmer)
+            if self._db is None or not self.is_persisted(namespace):
+                return (memory_entry, "memory") if memory_entry is not None else (None, None)
+            row = self._db.execute(
+                "SELECT value, size, created_at, expires_at, stale_until, tags FROM cache_entries WHERE key = ?",
+                (full_key,)
+            ).fetchone()
+            if row is None or (memory_entry is not None and row[3] <= memory_entry.expires_at):
+                return (memory_entry, "memory") if memory_entry is not None else (None, None)
+            payload, size, created_at, expires_at, stale_until, tags = row
+            if stale_until <= now:
+                self._delete_from_disk(full_key)
+                return None, None
+            self._db.execute("UPDATE cache_entries SET last_access = ? WHERE key = ?", (now, full_key))
+
+        if self.is_compressed(namespace):
+            entry = CacheEntry(_MISSING, payload, namespace, size, created_at, expires_at, stale_until, json.loads(tags))
+        else:
+            entry = CacheEntry(decode(payload), None, namespace, size, created_at, expires_at, stale_until,
+                               json.loads(tags))
+        # Promote to memory so the next read skips the disk
+        with self._lock:
+            self._store_in_memory(full_key, entry)
+        return entry, "disk"
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None, tags: Optional[List[str]] = None) -> None:
+        """
+        Store a value in memory and, for persisted namespaces, on disk
+
+        Args:
+            namespace: Cache namespace (see CACHE_NAMESPACES)
+            key: Key within the namespace
+            value: Picklable value
+            ttl: Seconds until the entry expires (defaults to the namespace TTL, spread by the TTL jitter)
+            tags: Labels for selective invalidation (e.g. a JQL or a story key)
+        """
+        full_key = self._full_key(namespace, key)
+        if ttl is None:
+            ttl = self.get_ttl(namespace) * random.uniform(1 - self.ttl_jitter, 1 + self.ttl_jitter)
+        compressed = self.is_compressed(namespace)
+        payload, raw_size = encode(value, self.codec if compressed else "none")
+        now = time.time()
+        expires_at = now + ttl
+        stale_until = expires_at + self.stale_max_seconds if self.serves_stale(namespace) else expires_at
+        entry = CacheEntry(_MISSING if compressed else value, payload if compressed else None, namespace,
+                           len(payload), now, expires_at, stale_until, list(tags or []))
+
+        with self._lock:
+            stats = self._namespace_stats(namespace)
+            stats["raw_bytes_written"] += raw_size
+            stats["stored_bytes_written"] += len(payload)
+            self._store_in_memory(full_key, entry)
+            if self._db is not None and self.is_persisted(namespace) and entry.size <= self.disk_max_bytes:
+                self._delete_from_disk(full_key)
+                self._db.execute(
+                    "INSERT INTO cache_entries "
+                    "(key, namespace, value, size, created_at, expires_at, stale_until, last_access, tags) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (full_key, namespace, payload, entry.size, entry.created_at, entry.expires_at,
+                     entry.stale_until, now, json.dumps(entry.tags))
+                )
+                self._disk_bytes += entry.size
+                self._enforce_disk_limit()
+
+    def get_or_load(self, namespace: str, key: str, loader: Callable[[], Any],
+                    ttl: Optional[int] = None, tags: Optional[List[str]] = None) -> Any:
+        """
+        Get a cached value, or load and cache it on a miss.
+        Concurrent misses for the same key share a single loader call.
+        Exceptions raised by the loader are not cached.
+        In stale-while-revalidate namespaces an expired value is returned immediately
+        and reloaded in a background thread.
+
+        Args:
+            namespace: Cache namespace (see CACHE_NAMESPACES)
+            key: Key within the namespace
+            loader: Zero-argument callable producing the value
+            ttl: Seconds until the entry expires (defaults to the namespace TTL)
+            tags: Labels for selective invalidation
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        if namespace in getattr(_force_refresh, "namespaces", ()):
+            # Reload and replace the entry; it stays readable by other threads until then,
+            # and is kept if the reload comes back empty
+            return self._load(namespace, key, loader, ttl, tags, store_empty=False)
+
+        entry, tier = self._lookup(namespace, key)
+        with self._lock:
+            stats = self._namespace_stats(namespace)
+            if entry is not None and entry.expires_at > time.time():
+                stats[f"{tier}_hits"] += 1
+            elif entry is not None and entry.stale_until > entry.expires_at:
+                stats["expirations"] += 1
+                stats["stale_hits"] += 1
+                self._refresh_in_background(namespace, key, loader, ttl, tags)
+            else:
+                if entry is not None:
+                    stats["expirations"] += 1
+                stats["misses"] += 1
+                entry = None
+        if entry is not None:
+            return entry.get_value()
+
+        def load_and_store():
+            # Another caller may have stored the value while this one was waiting
+            cached = self.get(namespace, key, _MISSING, record_stats=False)
+            if cached is not _MISSING:
+                return cached
+            return self._load(namespace, key, loader, ttl, tags)
+
+        return single_flight.do(f"cache:{self._full_key(namespace, key)}", load_and_store)
+
+    def _load(self, namespace: str, key: str, loader: Callable[[], Any],
+              ttl: Optional[int], tags: Optional[List[str]], store_empty: bool = True) -> Any:
+        """Run a loader, time it and store its result (unless it is empty and store_empty is False)."""
+        start_time = time.perf_counter()
+        try:
+            loaded = loader()
+        except Exception:
+            self._record_load(namespace, time.perf_counter() - start_time, failed=True)
+            raise
+        self._record_load(namespace, time.perf_counter() - start_time)
+        if not loaded and not store_empty:
+            print(f"Reload of {namespace} returned no data; keeping the cached entry")
+            return loaded
+        self.set(namespace, key, loaded, ttl=ttl, tags=tags)
+        return loaded
+
+    def _refresh_in_background(self, namespace: str, key: str, loader: Callable[[], Any],
+                               ttl: Optional[int], tags: Optional[List[str]]) -> None:
+        """Reload an expired entry in a daemon thread; the stale value is served until it finishes."""
+        full_key = self._full_key(namespace, key)
+        if full_key in self._refreshing:
+            return
+        self._refreshing.add(full_key)
+
+        def refresh():
+            try:
+                single_flight.do(f"cache:{full_key}", lambda: self._load(namespace, key, loader, ttl, tags))
+                with self._lock:
+                    self._namespace_stats(namespace)["refreshes"] += 1
+                print(f"Refreshed stale cache entry {full_key} in the background")
+            except Exception as e:
+                with self._lock:
+                    self._namespace_stats(namespace)["refresh_errors"] += 1
+                print(f"Background refresh of {full_key} failed, serving stale data: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(full_key)
+
+        threading.Thread(target=refresh, name=f"cache-refresh-{namespace}", daemon=True).start()
+
+    def delete(self, namespace: str, key: str) -> None:
+        """Remove one entry from both tiers."""
+        full_key = self._full_key(namespace, key)
+        with self._lock:
+            self._remove_from_memory(full_key)
+            if self._db is not None:
+                self._delete_from_disk(full_key)
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """Remove every entry, or every entry of one namespace, from both tiers."""
+        with self._lock:
+            for full_key in [k for k, entry in self._memory.items() if namespace in (None, entry.namespace)]:
+                self._remove_from_memory(full_key)
+            if self._db is not None:
+                if namespace is None:
+                    self._db.execute("DELETE FROM cache_entries")
+                else:
+                    self._db.execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+                self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+
+    def invalidate(self, namespace: Optional[str] = None, tag: Optional[str] = None,
+                   older_than: Optional[float] = None) -> int:
+        """
+        Remove the entries matching all the given filters from both tiers
+
+        Args:
+            namespace: Only entries of this namespace (None for every namespace)
+            tag: Only entries carrying this tag (e.g. "jql:<query>", "project:3", "story:PROJ-1")
+            older_than: Only entries created more than this many seconds ago
+
+        Returns:
+            Number of distinct entries removed
+        """
+        created_before = time.time() - older_than if older_than is not None else None
+
+        def matches(entry_namespace: str, created_at: float, tags: List[str]) -> bool:
+            return (namespace in (None, entry_namespace)
+                    and (created_before is None or created_at <= created_before)
+                    and (tag is None or tag in tags))
+
+        removed: Dict[str, str] = {}
+        with self._lock:
+            for full_key, entry in list(self._memory.items()):
+                if matches(entry.namespace, entry.created_at, entry.tags):
+                    self._remove_from_memory(full_key)
+                    removed[full_key] = entry.namespace
+
+            if self._db is not None:
+                query = "SELECT key, namespace, created_at, tags FROM cache_entries WHERE 1 = 1"
+                params: List[Any] = []
+                if namespace is not None:
+                    query += " AND namespace = ?"
+                    params.append(namespace)
+                if created_before is not None:
+                    query += " AND created_at <= ?"
+                    params.append(created_before)
+                for full_key, entry_namespace, created_at, tags in self._db.execute(query, params).fetchall():
+                    if matches(entry_namespace, created_at, json.loads(tags)):
+                        self._delete_from_disk(full_key)
+                        removed[full_key] = entry_namespace
+
+            for entry_namespace in removed.values():
+                self._namespace_stats(entry_namespace)["invalidations"] += 1
+
+        print(f"Cache invalidation (namespace={namespace}, tag={tag}, older_than={older_than}): "
+              f"{len(removed)} entries removed")
+        return len(removed)
+
+    def get_tags(self, namespace: Optional[str] = None) -> Dict[str, int]:
+        """
+        Get the tags in use with the number of entries carrying each one
+
+        Args:
+            namespace: Only entries of this namespace (None for every namespace)
+
+        Returns:
+            Dictionary of tag -> entry count, over both tiers
+        """
+        keys_by_tag: Dict[str, set] = {}
+        with self._lock:
+            for full_key, entry in self._memory.items():
+                if namespace in (None, entry.namespace):
+                    for entry_tag in entry.tags:
+                        keys_by_tag.setdefault(entry_tag, set()).add(full_key)
+            if self._db is not None:
+                if namespace is None:
+                    rows = self._db.execute("SELECT key, tags FROM cache_entries").fetchall()
+                else:
+                    rows = self._db.execute("SELECT key, tags FROM cache_entries WHERE namespace = ?",
+                                            (namespace,)).fetchall()
+                for full_key, tags in rows:
+                    for entry_tag in json.loads(tags):
+                        keys_by_tag.setdefault(entry_tag, set()).add(full_key)
+        return {entry_tag: len(keys) for entry_tag, keys in sorted(keys_by_tag.items())}
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get hit, miss, eviction and load latency counters with the current size of both tiers, per namespace
+
+        Returns:
+            Dictionary of namespace -> counters (see STAT_COUNTERS), entry counts, bytes,
+            hit_rate, avg_load_seconds and compression_ratio (pickled bytes / stored bytes written)
+        """
+        usage = self.get_namespace_usage()
+        with self._lock:
+            counters = {namespace: dict(stats) for namespace, stats in self._stats.items()}
+        for namespace, stats in usage.items():
+            stats.update(counters.get(namespace, {counter: 0 for counter in STAT_COUNTERS}))
+            hits = stats["memory_hits"] + stats["disk_hits"] + stats["stale_hits"]
+            stats["hit_rate"] = hits / (hits + stats["misses"]) if hits + stats["misses"] else 0.0
+            stats["avg_load_seconds"] = stats["load_seconds"] / stats["loads"] if stats["loads"] else 0.0
+            stats["compression_ratio"] = (stats["raw_bytes_written"] / stats["stored_bytes_written"]
+                                          if stats["stored_bytes_written"] else 1.0)
+        return usage
+
+    def reset_stats(self) -> None:
+        """Reset the hit, miss, eviction and load counters."""
+        with self._lock:
+            self._stats.clear()
+
+    def get_namespace_usage(self) -> Dict[str, Dict[str, Any]]:
+        """Get entry counts and sizes of both tiers per namespace."""
+        usage = {
+            namespace: {"ttl": self.get_ttl(namespace), "persisted": self.is_persisted(namespace),
+                        "memory_entries": 0, "memory_bytes": 0, "disk_entries": 0, "disk_bytes": 0}
+            for namespace in CACHE_NAMESPACES
+        }
+        with self._lock:
+            for entry in self._memory.values():
+                stats = usage.setdefault(entry.namespace, {"ttl": self.get_ttl(entry.namespace), "persisted": False,
+                                                           "memory_entries": 0, "memory_bytes": 0,
+                                                           "disk_entries": 0, "disk_bytes": 0})
+                stats["memory_entries"] += 1
+                stats["memory_bytes"] += entry.size
+            if self._db is not None:
+                rows = self._db.execute(
+                    "SELECT namespace, COUNT(*), SUM(size) FROM cache_entries GROUP BY namespace"
+                ).fetchall()
+                for namespace, count, size in rows:
+                    if namespace in usage:
+                        usage[namespace]["disk_entries"] = count
+                        usage[namespace]["disk_bytes"] = size
+        return usage
+
+    def _namespace_stats(self, namespace: str) -> Dict[str, float]:
+        stats = self._stats.get(namespace)
+        if stats is None:
+            stats = self._stats[namespace] = {counter: 0 for counter in STAT_COUNTERS}
+        return stats
+
+    def _record_load(self, namespace: str, seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            stats = self._namespace_stats(namespace)
+            stats["loads"] += 1
+            stats["load_seconds"] += seconds
+            stats["max_load_seconds"] = max(stats["max_load_seconds"], seconds)
+            if failed:
+                stats["load_errors"] += 1
+
+    def _store_in_memory(self, full_key: str, entry: CacheEntry) -> None:
+        self._remove_from_memory(full_key)
+        if entry.size > self.memory_max_bytes:
+            return
+        self._memory[full_key] = entry
+        self._memory_bytes += entry.size
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.size
+            self._namespace_stats(evicted.namespace)["memory_evictions"] += 1
+
+    def _remove_from_memory(self, full_key: str) -> None:
+        entry = self._memory.pop(full_key, None)
+        if entry is not None:
+            self._memory_bytes -= entry.size
+
+    def _delete_from_disk(self, full_key: str) -> None:
+        row = self._db.execute("SELECT size FROM cache_entries WHERE key = ?", (full_key,)).fetchone()
+        if row is not None:
+            self._db.execute("DELETE FROM cache_entries WHERE key = ?", (full_key,))
+            self._disk_bytes -= row[0]
+
+    def _enforce_disk_limit(self) -> None:
+        if self._disk_bytes <= self.disk_max_bytes:
+            return
+        # Entries past their stale grace period go first, then the least recently used ones
+        self._db.execute("DELETE FROM cache_entries WHERE stale_until <= ?", (time.time(),))
+        self._disk_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM cache_entries").fetchone()[0]
+        while self._disk_bytes > self.disk_max_bytes:
+            rows = self._db.execute(
+                "SELECT key, namespace, size FROM cache_entries ORDER BY last_access LIMIT 32"
+            ).fetchall()
+            if not rows:
+                break
+            for full_key, namespace, size in rows:
+                if self._disk_bytes <= self.disk_max_bytes:
+                    break
+                self._db.execute("DELETE FROM cache_entries WHERE key = ?", (full_key,))
+                self._disk_bytes -= size
+                self._namespace_stats(namespace)["disk_evictions"] += 1
+
+
+@st.cache_resource
+def _get_tiered_cache() -> TieredCache:
+    """Create the process-wide tiered cache (shared by all sessions)."""
+    config = get_cache_config()
+    return TieredCache(
+        config['directory'],
+        memory_max_bytes=int(config['memory_max_mb'] * 1024 * 1024),
+        disk_max_bytes=int(config['disk_max_mb'] * 1024 * 1024),
+        stale_max_seconds=config['stale_max_seconds'],
+        ttl_jitter=config['ttl_jitter'],
+        compression=config['compression']
+    )
+
 
 class CacheManager:
     """
     Centralized cache manager for the AI QA Assistant application.
-    Provides caching for expensive operations like API calls and LLM responses.
+    Provides caching for expensive operations like API calls and LLM responses,
+    backed by a process-wide tiered (memory + disk) cache.
+    Connection objects are not serializable and stay cached by the Jira and TestRail clients.
     """
-    
+
     @staticmethod
     def _generate_cache_key(data: Any, prefix: str = "") -> str:
-        """Generate a unique cache key based on input data."""
-        if isinstance(data, (dict, list)):
-            data_str = json.dumps(data, sort_keys=True)
-        else:
-            data_str = str(data)
-        
-        # Create a hash of the data
-        hash_obj = hashlib.md5(data_str.encode())
-        cache_key = f"{prefix}_{hash_obj.hexdigest()}"
-        return cache_key
-    
+        """
+        Generate a unique cache key based on input data.
+        Corpora loaded through the cache (FingerprintedList) contribute their stored fingerprint,
+        so large Jira and TestRail lists in the key data are not re-serialized on every call.
+        """
+        return f"{prefix}_{fingerprint(data)}"
+
+    @staticmethod
+    def get_cache() -> TieredCache:
+        """Get the process-wide tiered cache."""
+        return _get_tiered_cache()
+
     @staticmethod
-    @st.cache_data(ttl=3600)  # Cache for 1 hour
-    def cache_jira_connection(base_url: str, email: str, api_token: str):
+    def get_or_load(namespace: str, key_data: Any, loader: Callable[[], Any],
+                    ttl: Optional[int] = None, tags: Optional[List[str]] = None) -> Any:
         """
-        Cache Jira connection with a 1-hour TTL.
-        This prevents repeated connection setup and authentication.
+        Get a cached value, or load and cache it on a miss
+
+        Args:
+            namespace: Cache namespace (see CACHE_NAMESPACES)
+            key_data: Data identifying the value (hashed into the cache key)
+            loader: Zero-argument callable producing the value
+            ttl: Seconds until the entry expires (defaults to the namespace TTL)
+            tags: Labels for selective invalidation
+
+        Returns:
+            The cached or freshly loaded value
         """
-        # This is a placeholder - the actual implementation is in the Jira client
-        return None
-    
+        key = CacheManager._generate_cache_key(key_data)
+        return _get_tiered_cache().get_or_load(namespace, key, loader, ttl=ttl, tags=tags)
+
+    @staticmethod
+    def _jira_key_data(jql_query: str, max_results: Optional[int]) -> Dict[str, Any]:
+        return {"jql": jql_query, "max_results": max_results}
+
     @staticmethod
-    @st.cache_data(ttl=3600)  # Cache for 1 hour
-    def cache_jira_stories(jql_query: str, project_key: str, max_results: Optional[int] = None) -> List[Dict]:
+    def cache_jira_stories(jql_query: str, max_results: Optional[int], loader: Callable[[], List[Dict]]) -> List[Dict]:
         """
         Cache Jira user stories with a 1-hour TTL.
         This prevents repeated API calls for the same query.
+        Once expired, the last stories are served while they are refreshed in the background.
         """
-        # This is a placeholder - the actual implementation will be in the Jira client
-        # The cache key is based on the JQL query and parameters
-        return []
-    
+        return CacheManager.get_or_load("jira_stories", CacheManager._jira_key_data(jql_query, max_results),
+                                        loader, tags=[CacheManager.jql_tag(jql_query)])
+
     @staticmethod
-    @st.cache_data(ttl=3600)  # Cache for 1 hour
-    def cache_jira_bugs(jql_query: str, project_key: str, max_results: Optional[int] = None) -> List[Dict]:
+    def cache_jira_bugs(jql_query: str, max_results: Optional[int], loader: Callable[[], List[Dict]]) -> List[Dict]:
         """
         Cache Jira bug tickets with a 1-hour TTL.
         This prevents repeated API calls for the same query.
+        Once expired, the last bug tickets are served while they are refreshed in the background.
         """
-        # This is a placeholder - the actual implementation will be in the Jira client
-        return []
-    
+        return CacheManager.get_or_load("jira_bugs", CacheManager._jira_key_data(jql_query, max_results),
+                                        loader, tags=[CacheManager.jql_tag(jql_query)])
+
     @staticmethod
-    @st.cache_data(ttl=3600)  # Cache for 1 hour
-    def cache_testrail_connection(testrail_url: str, testrail_username: str, testrail_password: str):
-        """
-        Cache TestRail connection with a 1-hour TTL.
-        This prevents repeated connection setup and authentication.
-        """
-        # This is a placeholder - the actual implementation is in the TestRail client
-        return None
-    
+    def _testrail_key_data(project_id: Optional[int], instance: Optional[str]) -> Dict[str, Any]:
+        # The instance (URL and user) keeps projects with the same id on different TestRail servers apart,
+        # in the cache and in the single-flight key derived from it
+        return {"project_id": project_id, "instance": instance}
+
     @staticmethod
-    @st.cache_data(ttl=1800)  # Cache for 30 minutes
-    def cache_testrail_cases(project_id: int, limit: int = 250, offset: int = 0) -> List[Dict]:
+    def cache_testrail_cases(project_id: Optional[int], loader: Callable[[], List[Dict]],
+                             instance: Optional[str] = None) -> List[Dict]:
         """
         Cache TestRail test cases with a 30-minute TTL.
         Test cases change less frequently than Jira issues.
+        Once expired, the last test cases are served while they are refreshed in the background.
         """
-        # This is a placeholder - the actual implementation will be in the TestRail client
-        return []
-    
+        return CacheManager.get_or_load("testrail_cases", CacheManager._testrail_key_data(project_id, instance),
+                                        loader, tags=[CacheManager.project_tag(project_id)])
+
     @staticmethod
-    @st.cache_data(ttl=3600)  # Cache for 1 hour
-    def cache_testrail_sections(project_id: int) -> List[Dict]:
+    def cache_testrail_sections(project_id: int, loader: Callable[[], List[Dict]],
+                                instance: Optional[str] = None) -> List[Dict]:
         """
         Cache TestRail sections with a 1-hour TTL.
         Sections change very infrequently.
         """
-        # This is a placeholder - the actual implementation will be in the TestRail client
-        return []
-    
+        return CacheManager.get_or_load("testrail_sections", CacheManager._testrail_key_data(project_id, instance),
+                                        loader, tags=[CacheManager.project_tag(project_id)])
+
+    @staticmethod
+    def cache_testrail_index(project_id: Optional[int], loader: Callable[[], List],
+                             instance: Optional[str] = None) -> List:
+        """
+        Cache the similarity index of a TestRail project's test cases with a 30-minute TTL.
+        Building it walks every case, so it is kept on disk next to the cases.
+        """
+        return CacheManager.get_or_load("testrail_index", CacheManager._testrail_key_data(project_id, instance),
+                                        loader, tags=[CacheManager.project_tag(project_id)])
+
     @staticmethod
-    @st.cache_data(ttl=300)  # Cache for 5 minutes
-    def cache_llm_response(prompt_hash: str, model_name: str, temperature: float) -> str:
+    def _llm_key_data(chain_name: str, model_name: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        return {"chain": chain_name, "model": model_name, "inputs": inputs}
+
+    @staticmethod
+    def cache_llm_response(chain_name: str, model_name: str, inputs: Dict[str, Any], loader: Callable[[], str]) -> str:
         """
         Cache LLM responses with a 5-minute TTL.
         This prevents repeated API calls for identical prompts.
         """
-        # This is a placeholder - the actual implementation will be in the LLM chains
-        return ""
-    
+        return CacheManager.get_or_load("llm_responses", CacheManager._llm_key_data(chain_name, model_name, inputs),
+                                        loader, tags=[CacheManager.chain_tag(chain_name)])
+
     @staticmethod
-    @st.cache_data(ttl=1800)  # Cache for 30 minutes
-    def cache_sanitized_data(original_text: str, sanitization_rules: Dict) -> str:
+    def get_llm_response(chain_name: str, model_name: str, inputs: Dict[str, Any]) -> Optional[str]:
+        """Get a cached LLM response (see cache_llm_response), or None; used by streamed calls."""
+        key = CacheManager._generate_cache_key(CacheManager._llm_key_data(chain_name, model_name, inputs))
+        return _get_tiered_cache().get("llm_responses", key)
+
+    @staticmethod
+    def store_llm_response(chain_name: str, model_name: str, inputs: Dict[str, Any], response: str) -> None:
+        """Cache the complete response of a streamed LLM call, as cache_llm_response does."""
+        key = CacheManager._generate_cache_key(CacheManager._llm_key_data(chain_name, model_name, inputs))
+        _get_tiered_cache().set("llm_responses", key, response, tags=[CacheManager.chain_tag(chain_name)])
+
+    @staticmethod
+    def cache_sanitized_data(original_text: str, rules_fingerprint: str, loader: Callable[[], str]) -> str:
         """
         Cache sanitized data with a 30-minute TTL.
         Sanitization results are deterministic for the same input and rules.
         """
-        # This is a placeholder - the actual implementation will be in the data sanitizer
-        return ""
-    
+        return CacheManager.get_or_load("sanitized_text", [rules_fingerprint, original_text], loader)
+
+    @staticmethod
+    def get_sanitized_batch(texts: List[str], rules_fingerprint: str) -> Dict[str, str]:
+        """
+        Look up the cached sanitized versions of many texts
+
+        Args:
+            texts: Original texts
+            rules_fingerprint: Fingerprint of the sanitization rules
+
+        Returns:
+            Dictionary of original text to sanitized text, for the texts that are cached
+        """
+        cache = _get_tiered_cache()
+        found = {}
+        for text in texts:
+            sanitized = cache.get("sanitized_text", CacheManager._generate_cache_key([rules_fingerprint, text]))
+            if sanitized is not None:
+                found[text] = sanitized
+        return found
+
+    @staticmethod
+    def cache_sanitized_batch(sanitized_texts: Dict[str, str], rules_fingerprint: str) -> None:
+        """Cache many sanitized texts (original text to sanitized text), as cache_sanitized_data does."""
+        cache = _get_tiered_cache()
+        for text, sanitized in sanitized_texts.items():
+            cache.set("sanitized_text", CacheManager._generate_cache_key([rules_fingerprint, text]), sanitized)
+
     @staticmethod
-    @st.cache_data(ttl=600)  # Cache for 10 minutes
-    def cache_similarity_analysis(generated_cases: List[Dict], existing_cases: List[Dict], 
-                                threshold: float, user_story_key: str = None) -> List[Dict]:
+    def get_adf_text_batch(versions: List[str]) -> Dict[str, str]:
+        """
+        Look up the cached text of many ADF descriptions
+
+        Args:
+            versions: Versions of the ADF payloads (issue key and update time, or payload hash)
+
+        Returns:
+            Dictionary of version to text, for the descriptions that are cached
+        """
+        cache = _get_tiered_cache()
+        found = {}
+        for version in versions:
+            text = cache.get("adf_text", version)
+            if text is not None:
+                found[version] = text
+        return found
+
+    @staticmethod
+    def cache_adf_text_batch(texts: Dict[str, str]) -> None:
+        """Cache the text of many ADF descriptions (payload version to text) for 1 day."""
+        cache = _get_tiered_cache()
+        for version, text in texts.items():
+            cache.set("adf_text", version, text)
+
+    @staticmethod
+    def cache_pseudonyms(originals: Dict[str, str]) -> None:
+        """Keep the encrypted original values of pseudonymization tokens (token to ciphertext) for 2 days."""
+        cache = _get_tiered_cache()
+        for token, original in originals.items():
+            cache.set("pseudonyms", token, original)
+
+    @staticmethod
+    def get_pseudonym(token: str) -> Optional[str]:
+        """Get the encrypted original value of a pseudonymization token, or None if it is not cached."""
+        return _get_tiered_cache().get("pseudonyms", token)
+
+    @staticmethod
+    def cache_similarity_analysis(generated_cases: List[Dict], existing_cases: List[Dict], threshold: float,
+                                  loader: Callable[[], List], user_story_key: str = None) -> List:
         """
         Cache similarity analysis results with a 10-minute TTL.
         This prevents recalculating similarity for the same test cases.
         """
-        # This is a placeholder - the actual implementation will be in the TestRail client
-        return []
-    
+        key_data = {"generated": generated_cases, "existing": existing_cases,
+                    "threshold": threshold, "user_story_key": user_story_key}
+        tags = [CacheManager.story_tag(user_story_key)] if user_story_key else None
+        return CacheManager.get_or_load("similarity", key_data, loader, tags=tags)
+
+    @staticmethod
+    @contextlib.contextmanager
+    def force_refresh(*namespaces: str):
+        """
+        Reload instead of reading the cache for the given namespaces, in the current thread only.
+        Used by the cache warmer to replace entries before they expire; readers keep getting
+        the previous value until the new one is stored. Empty reloads are not stored, so a
+        transient outage does not replace a good entry with an empty one.
+
+        Args:
+            namespaces: Cache namespaces to reload (see CACHE_NAMESPACES)
+        """
+        previous = getattr(_force_refresh, "namespaces", ())
+        _force_refresh.namespaces = tuple(previous) + namespaces
+        try:
+            yield
+        finally:
+            _force_refresh.namespaces = previous
+
+    @staticmethod
+    def get_data_age(namespace: str, key_data: Any) -> Optional[Dict[str, Any]]:
+        """
+        Get the age of a cached value
+
+        Args:
+            namespace: Cache namespace (see CACHE_NAMESPACES)
+            key_data: Data identifying the value, as passed to get_or_load
+
+        Returns:
+            Dictionary with age_seconds, stale and refreshing, or None if nothing is cached
+        """
+        return _get_tiered_cache().get_entry_age(namespace, CacheManager._generate_cache_key(key_data))
+
+    @staticmethod
+    def get_jira_data_age(namespace: str, jql_query: str, max_results: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Get the age of the cached stories ("jira_stories") or bugs ("jira_bugs") of a JQL query."""
+        return CacheManager.get_data_age(namespace, CacheManager._jira_key_data(jql_query, max_results))
+
+    @staticmethod
+    def get_testrail_data_age(project_id: Optional[int], instance: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Get the age of the cached test cases of a TestRail project (instance as in cache_testrail_cases)."""
+        return CacheManager.get_data_age("testrail_cases", CacheManager._testrail_key_data(project_id, instance))
+
+    @staticmethod
+    def format_data_age(age_info: Optional[Dict[str, Any]]) -> str:
+        """Format the result of get_data_age for display, e.g. "Data age: 12 min (refreshing in background)"."""
+        if not age_info:
+            return "Data age: not cached"
+        minutes = int(age_info["age_seconds"] // 60)
+        age = f"{minutes} min" if minutes < 120 else f"{minutes // 60} h {minutes % 60} min"
+        if age_info["refreshing"]:
+            return f"Data age: {age} (refreshing in background)"
+        if age_info["stale"]:
+            return f"Data age: {age} (stale, refreshes on next use)"
+        return f"Data age: {age}"
+
     @staticmethod
     def clear_all_caches():
         """Clear all cached data. Useful for debugging or when data becomes stale."""
+        _get_tiered_cache().clear()
         st.cache_data.clear()
         st.success("✅ All caches cleared successfully!")
-    
+
+    @staticmethod
+    def invalidate(namespace: Optional[str] = None, tag: Optional[str] = None,
+                   older_than_seconds: Optional[float] = None) -> int:
+        """
+        Invalidate cached entries by namespace, tag and/or age, leaving everything else cached
+
+        Args:
+            namespace: Only entries of this namespace (see CACHE_NAMESPACES)
+            tag: Only entries carrying this tag (see jql_tag, project_tag and story_tag)
+            older_than_seconds: Only entries created more than this many seconds ago
+
+        Returns:
+            Number of entries removed
+        """
+        return _get_tiered_cache().invalidate(namespace=namespace, tag=tag, older_than=older_than_seconds)
+
+    @staticmethod
+    def invalidate_jira_query(jql_query: str) -> int:
+        """Invalidate the cached stories and bugs of one JQL query."""
+        tag = CacheManager.jql_tag(jql_query)
+        return CacheManager.invalidate("jira_stories", tag) + CacheManager.invalidate("jira_bugs", tag)
+
+    @staticmethod
+    def invalidate_testrail_project(project_id: Optional[int]) -> int:
+        """Invalidate the cached test cases, sections and similarity index of one TestRail project."""
+        tag = CacheManager.project_tag(project_id)
+        return (CacheManager.invalidate("testrail_cases", tag) + CacheManager.invalidate("testrail_sections", tag)
+                + CacheManager.invalidate("testrail_index", tag))
+
+    @staticmethod
+    def invalidate_story(user_story_key: str) -> int:
+        """Invalidate the cached similarity results of one user story."""
+        return CacheManager.invalidate("similarity", CacheManager.story_tag(user_story_key))
+
+    @staticmethod
+    def get_cache_tags(namespace: Optional[str] = None) -> Dict[str, int]:
+        """Get the invalidation tags in use (tag -> entry count), optionally for one namespace."""
+        return _get_tiered_cache().get_tags(namespace)
+
+    @staticmethod
+    def jql_tag(jql_query: str) -> str:
+        """Invalidation tag of the entries cached for a JQL query."""
+        return f"jql:{jql_query}"
+
+    @staticmethod
+    def project_tag(project_id: Optional[int]) -> str:
+        """Invalidation tag of the entries cached for a TestRail project."""
+        return f"project:{project_id}"
+
+    @staticmethod
+    def chain_tag(chain_name: str) -> str:
+        """Invalidation tag of the LLM responses of a chain."""
+        return f"chain:{chain_name}"
+
+    @staticmethod
+    def story_tag(user_story_key: str) -> str:
+        """Invalidation tag of the entries cached for a user story."""
+        return f"story:{user_story_key}"
+
     @staticmethod
     def get_cache_info() -> Dict[str, Any]:
-        """Get information about cache usage and performance."""
-        # Note: Streamlit doesn't provide direct cache statistics
-        # This is a placeholder for future implementation
+        """Get cache statistics: overall hits, misses and hit rate, tier sizes and per-namespace counters."""
+        cache = _get_tiered_cache()
+        namespaces = cache.get_stats()
+        hits = sum(stats["memory_hits"] + stats["disk_hits"] + stats["stale_hits"] for stats in namespaces.values())
+        misses = sum(stats["misses"] for stats in namespaces.values())
         return {
             "cache_enabled": True,
-            "cache_ttl_default": "1 hour for API calls, 5 minutes for LLM responses",
-            "note": "Cache statistics not directly available in Streamlit"
+            "disk_enabled": cache._db is not None,
+            "compression": cache.codec,
+            "directory": cache.directory,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            "memory_bytes": cache._memory_bytes,
+            "memory_max_bytes": cache.memory_max_bytes,
+            "disk_bytes": cache._disk_bytes,
+            "disk_max_bytes": cache.disk_max_bytes,
+            "namespaces": namespaces,
         }
-    
+
     @staticmethod
-    def create_cached_function(func: Callable, ttl: int = 3600, **kwargs):
+    def reset_cache_stats():
+        """Reset the cache hit, miss, eviction and load counters."""
+        _get_tiered_cache().reset_stats()
+
+    @staticmethod
+    def get_cache_directory() -> Optional[str]:
+        """Get the directory of the on-disk cache store (None if the disk tier is unavailable)."""
+        cache = _get_tiered_cache()
+        return cache.directory if cache._db is not None else None
+
+    @staticmethod
+    def create_cached_function(func: Callable, ttl: int = 3600, namespace: str = "functions"):
         """
         Create a cached version of any function with specified TTL.
-        
+
         Args:
-            func: The function to cache
+            func: The function to cache (arguments must be JSON serializable or have a stable str)
             ttl: Time to live in seconds
-            **kwargs: Additional arguments to pass to st.cache_data
-        
+            namespace: Cache namespace the results are stored in
+
         Returns:
             Cached version of the function
         """
-        @st.cache_data(ttl=ttl, **kwargs)
         def cached_func(*args, **func_kwargs):
-            return func(*args, **func_kwargs)
-        
-        return cached_func 
\ No newline at end of file
+            key_data = [f"{func.__module__}.{func.__qualname__}", [str(arg) for arg in args],
+                        {name: str(value) for name, value in func_kwargs.items()}]
+            return CacheManager.get_or_load(namespace, key_data, lambda: func(*args, **func_kwargs), ttl=ttl)
+
+        return cached_func
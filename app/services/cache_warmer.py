@@ -0,0 +1,241 @@
+"""
+Cache pre-warming
+Loads the default Jira and TestRail corpora and the derived similarity index into the shared
+cache at container start and on a schedule, and reports readiness over HTTP.
+
+Run next to the Streamlit app (both use the on-disk cache store):
+    python -m services.cache_warmer          # warm up now and then every CACHE_WARMUP_INTERVAL_SECONDS
+    python -m services.cache_warmer --once   # warm up once and exit
+"""
+
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config import get_cache_config, get_cache_warmup_config, get_jira_project_key_us, get_jira_project_key_bug
+from services.cache_manager import CacheManager
+from jira_client import JiraClient
+from testrail_client import TestRailClient
+
+STATUS_FILENAME = "warmup_status.json"
+
+
+def get_status_path() -> str:
+    """Path of the file the warmer publishes its status to, inside the cache directory."""
+    return os.path.join(get_cache_config()['directory'], STATUS_FILENAME)
+
+
+def read_warmup_status() -> Optional[Dict[str, Any]]:
+    """Read the last status published by the warmer (None if it never ran)."""
+    try:
+        with open(get_status_path(), encoding="utf-8") as status_file:
+            return json.load(status_file)
+    except (OSError, ValueError):
+        return None
+
+
+class CacheWarmer:
+    """
+    Runs the warm-up jobs (default story and bug JQLs, TestRail project cases and their
+    similarity index) one after another, at start and then on a fixed interval.
+    A job that raises or loads no items is reported as failed and keeps the previously
+    cached entry. The process is ready once every job has succeeded at least once.
+    """
+
+    def __init__(self, interval_seconds: int, story_jql: Optional[str] = None, bug_jql: Optional[str] = None,
+                 testrail_project_ids: Optional[List[int]] = None):
+        self.interval_seconds = interval_seconds
+        self.story_jql = story_jql
+        self.bug_jql = bug_jql
+        self.testrail_project_ids = testrail_project_ids or []
+        self._jira_client = None
+        self._testrail_client = None
+        self._lock = threading.Lock()
+        # Jobs that have loaded their data at least once
+        self._succeeded_jobs = set()
+        self._status: Dict[str, Any] = {
+            "ready": False,
+            "running": False,
+            "runs": 0,
+            "last_started_at": None,
+            "last_finished_at": None,
+            "last_duration_seconds": None,
+            "next_run_at": None,
+            "jobs": {},
+        }
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get a copy of the current warm-up status."""
+        with self._lock:
+            return json.loads(json.dumps(self._status))
+
+    def _get_jobs(self) -> List[Tuple[str, str, Callable[[], int]]]:
+        """
+        Build the (name, namespace, job) list. Every job reloads the entries of its namespace
+        (instead of returning what is already cached) and returns the number of items loaded;
+        fetch errors are raised instead of being turned into empty results.
+        Jobs run in order, so the similarity index is built from the test cases just loaded.
+        """
+        jobs = []
+        if self.story_jql:
+            jobs.append(("jira_stories", "jira_stories",
+                         lambda: len(self._get_jira_client().get_user_stories(jql_query=self.story_jql, raise_errors=True))))
+        if self.bug_jql:
+            jobs.append(("jira_bugs", "jira_bugs",
+                         lambda: len(self._get_jira_client().get_bug_tickets(jql_query=self.bug_jql, raise_errors=True))))
+        for project_id in self.testrail_project_ids:
+            jobs.append((f"testrail_cases:{project_id}", "testrail_cases",
+                         lambda project_id=project_id: len(self._get_testrail_client().get_all_test_cases(project_id, raise_errors=True))))
+            jobs.append((f"testrail_index:{project_id}", "testrail_index",
+                         lambda project_id=project_id: len(self._get_testrail_client().get_prepared_cases(project_id, raise_errors=True))))
+        return jobs
+
+    def _get_jira_client(self) -> JiraClient:
+        if self._jira_client is None:
+            self._jira_client = JiraClient()
+        return self._jira_client
+
+    def _get_testrail_client(self) -> TestRailClient:
+        if self._testrail_client is None or self._testrail_client.client is None:
+            self._testrail_client = TestRailClient()
+        if self._testrail_client.client is None:
+            raise ConnectionError("TestRail connection failed")
+        return self._testrail_client
+
+    def run_once(self) -> Dict[str, Any]:
+        """
+        Run every warm-up job once, replacing the cached entries
+
+        Returns:
+            The warm-up status after the run
+        """
+        started_at = time.time()
+        with self._lock:
+            self._status["running"] = True
+            self._status["last_started_at"] = started_at
+        self._publish()
+
+        jobs = self._get_jobs()
+        for name, namespace, job in jobs:
+            job_start = time.perf_counter()
+            try:
+                with CacheManager.force_refresh(namespace):
+                    items = job()
+                if items:
+                    result = {"status": "ok", "items": items, "error": None}
+                else:
+                    result = {"status": "failed", "items": 0, "error": "no items loaded; previous entry kept"}
+            except Exception as e:
+                result = {"status": "failed", "items": 0, "error": str(e)}
+            result["seconds"] = round(time.perf_counter() - job_start, 2)
+            print(f"Cache warm-up {name}: {result['status']}, {result['items']} items in {result['seconds']}s")
+            with self._lock:
+                self._status["jobs"][name] = result
+                if result["status"] == "ok":
+                    self._succeeded_jobs.add(name)
+            self._publish()
+
+        finished_at = time.time()
+        with self._lock:
+            self._status["running"] = False
+            self._status["ready"] = all(name in self._succeeded_jobs for name, _, _ in jobs)
+            self._status["runs"] += 1
+            self._status["last_finished_at"] = finished_at
+            self._status["last_duration_seconds"] = round(finished_at - started_at, 2)
+        self._publish()
+        print(f"Cache warm-up finished in {finished_at - started_at:.1f}s")
+        return self.get_status()
+
+    def run_forever(self, stop_event: Optional[threading.Event] = None) -> None:
+        """Warm up now and then every interval_seconds until stop_event is set."""
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            self.run_once()
+            with self._lock:
+                self._status["next_run_at"] = time.time() + self.interval_seconds
+            self._publish()
+            stop_event.wait(self.interval_seconds)
+
+    def _publish(self) -> None:
+        """Write the status next to the cache store so the app can show it."""
+        status = self.get_status()
+        path = get_status_path()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as status_file:
+                json.dump(status, status_file)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Could not write cache warm-up status to {path}: {e}")
+
+
+def start_health_server(warmer: CacheWarmer, port: int) -> ThreadingHTTPServer:
+    """
+    Serve the warm-up status over HTTP in a daemon thread
+
+    Endpoints:
+        /health: always 200 with the status (the warmer process is alive)
+        /ready: 200 once every warm-up job has succeeded at least once, 503 before
+
+    Args:
+        warmer: The warmer whose status is reported
+        port: Port to listen on (all interfaces)
+
+    Returns:
+        The running server
+    """
+    class WarmupHealthHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            status = warmer.get_status()
+            if self.path.startswith("/health"):
+                code = 200
+            elif self.path.startswith("/ready"):
+                code = 200 if status["ready"] else 503
+            else:
+                code = 404
+            body = json.dumps(status).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Health checks poll every few seconds; keep them out of the logs
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), WarmupHealthHandler)
+    threading.Thread(target=server.serve_forever, name="cache-warmup-health", daemon=True).start()
+    print(f"Cache warm-up health endpoint listening on port {port} (/health, /ready)")
+    return server
+
+
+def create_cache_warmer() -> CacheWarmer:
+    """Create a warmer from the CACHE_WARMUP_* settings in .env."""
+    config = get_cache_warmup_config()
+    story_jql = config['story_jql']
+    bug_jql = config['bug_jql']
+    if not story_jql and get_jira_project_key_us():
+        story_jql = JiraClient.story_jql_for_project(get_jira_project_key_us())
+    if not bug_jql and get_jira_project_key_bug():
+        bug_jql = JiraClient.bug_jql_for_project(get_jira_project_key_bug())
+    return CacheWarmer(config['interval_seconds'], story_jql, bug_jql, config['testrail_project_ids'])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-warm the AI QA Assistant cache")
+    parser.add_argument("--once", action="store_true", help="warm up once and exit")
+    args = parser.parse_args()
+
+    warmer = create_cache_warmer()
+    if args.once:
+        warmer.run_once()
+    else:
+        health_port = get_cache_warmup_config()['health_port']
+        if health_port:
+            start_health_server(warmer, health_port)
+        warmer.run_forever()
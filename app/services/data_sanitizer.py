@@ -1,13 +1,38 @@
-import re
-import hashlib
-from typing import Dict, List, Any
+from itertools import repeat
+from typing import Dict, Iterable, Iterator, List, Any, Tuple
 import streamlit as st
+from config import get_sanitizer_config
+from services.cache_manager import CacheManager
+from services.fingerprint import fast_hash
+from services.sanitizer_engine import SanitizerEngine, sanitize_chunk, replace_matches
+from services.pseudonymizer import get_pseudonym_map, get_pseudonym_secret, pseudonymize_chunk, pseudonymize_matches
+from services.worker_pool import get_worker_pool, get_worker_count, split_by_size
+
+# Applied before every other pattern, so e-mail domains are not replaced as company names first
+EMAIL_PATTERN = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+
+# Texts shorter than this (keys, titles, labels) are not cached: the scan costs less than the lookup
+MIN_CACHED_CHARS = 256
+
+# Text past each window of a streamed sanitization scanned with it (see SanitizerEngine.iter_windows)
+STREAM_OVERLAP_CHARS = 4096
+
+# Whitespace allowed between the words of a rule (e.g. "client  :"). Bounded, so every match that must
+# be seen whole fits in the stream overlap and streamed text sanitizes as the whole text
+GAP = r'\s{0,32}'
+
+
+@st.cache_resource
+def get_data_sanitizer() -> "DataSanitizer":
+    """Get the process-wide sanitizer used on LLM chain inputs (see services.llm_chains)."""
+    return DataSanitizer()
 
 class DataSanitizer:
     """
     Sanitizes sensitive data before sending to external APIs.
     Replaces company names, client names, project names, and other sensitive information
-    with generic placeholders.
+    with generic placeholders, or with one restorable token per distinct value when
+    SANITIZER_PSEUDONYMIZE is enabled.
     """
     
     def __init__(self):
@@ -15,17 +40,17 @@ class DataSanitizer:
         self.sensitive_patterns = {
             # Company names and variations
             'company_names': [
-                r'\company\b', r'\bcomp\s*any\b', r'\bcompany\b',
+                r'\bcompany\b', r'\bcomp' + GAP + r'any\b', r'\bcompany\b',
                 r'\bCM\b', r'\bCompany\b', r'\bCompany\b'
             ],
             # Project codes and names
             'project_codes': [
                 r'\bCM-\d+\b', r'\bPROJ-\d+\b', r'\bTASK-\d+\b', r'\bINC-\d+\b',
-                r'\bproject\s*=\s*CM\b', r'\bproject\s*=\s*[A-Z]{2,}\b'
+                r'\bproject' + GAP + '=' + GAP + r'CM\b', r'\bproject' + GAP + '=' + GAP + r'[A-Z]{2,}\b'
             ],
             # Email addresses
             'emails': [
-                r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+                EMAIL_PATTERN
             ],
             # URLs and domains
             'urls': [
@@ -42,9 +67,9 @@ class DataSanitizer:
             ],
             # Client names (common patterns)
             'client_names': [
-                r'\bclient\s*:\s*[A-Za-z\s&]+',
-                r'\bcustomer\s*:\s*[A-Za-z\s&]+',
-                r'\buser\s*:\s*[A-Za-z\s&]+'
+                r'\bclient' + GAP + r':\s*[A-Za-z\s&]+',
+                r'\bcustomer' + GAP + r':\s*[A-Za-z\s&]+',
+                r'\buser' + GAP + r':\s*[A-Za-z\s&]+'
             ],
             # Internal system names
             'system_names': [
@@ -64,41 +89,150 @@ class DataSanitizer:
             'system_names': '[SYSTEM_NAME]'
         }
         
-        # Compile regex patterns for efficiency
-        self.compiled_patterns = {}
+        # Specific hardcoded values, replaced (case-sensitive, in order) after the patterns
+        self.custom_replacements = {
+            'rafael.fernandes@company.com': '[USER_EMAIL]',
+            'https://company.atlassian.net': '[JIRA_URL]',
+            'company': '[COMPANY_NAME]',
+            'ST-': '[PROJECT_CODE]-',
+            'INC-': '[PROJECT_CODE]-',
+            'TT': '[SYSTEM_NAME]',
+            'TS': '[SYSTEM_NAME]',
+        }
+        
+        # All rules in application order: e-mails first, then every category in turn
+        rules = [(EMAIL_PATTERN, self.replacements['emails'], 'emails')]
         for category, patterns in self.sensitive_patterns.items():
-            self.compiled_patterns[category] = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+            rules.extend((pattern, self.replacements[category], category) for pattern in patterns)
+        self.engine = SanitizerEngine(rules, self.custom_replacements, literal_label='custom_values')
+        
+        # Identifies the rule set in cache keys, so cached results are dropped when the rules change
+        self.rules_fingerprint = fast_hash(repr((self.sensitive_patterns, self.replacements, self.custom_replacements)))
+        
+        # With SANITIZER_PSEUDONYMIZE, each distinct value gets its own restorable token (see services.pseudonymizer)
+        self.pseudonymize = get_sanitizer_config()['pseudonymize']
+        if self.pseudonymize:
+            self.pseudonym_secret = get_pseudonym_secret()
+            self.rules_fingerprint = fast_hash(self.rules_fingerprint + self.pseudonym_secret.hex())
     
-    @st.cache_data(ttl=1800)  # Cache for 30 minutes
-    def _cached_sanitize_text(_self, text: str) -> str:
+    def _cached_sanitize_text(self, text: str) -> str:
         """
         Cached version of text sanitization.
         This prevents repeated processing of the same text within 30 minutes.
         """
+        if not text:
+            return ""
+        if len(text) < MIN_CACHED_CHARS:
+            return self._sanitize_uncached(text)
+        
+        return CacheManager.cache_sanitized_data(text, self.rules_fingerprint, lambda: self._sanitize_uncached(text))
+    
+    def _sanitize_uncached(self, text: str) -> str:
+        """Apply every sanitization rule to a text, in a single scan (see SanitizerEngine)."""
         if not text:
             return ""
         
         # Convert to string if it's not already
         if not isinstance(text, str):
             text = str(text)
+        
+        return self._sanitize_in_process([text])[0]
+
+    def sanitize_texts(self, texts: List[str]) -> List[str]:
+        """
+        Sanitizes many texts in one call.
+        Identical texts are sanitized once, short texts skip the cache, and large batches of
+        uncached text are split across worker processes (see SANITIZER_WORKERS).
+        
+        Args:
+            texts: The texts to sanitize
             
-        sanitized_text = text
+        Returns:
+            Sanitized texts, in the same order
+        """
+        texts = [text if isinstance(text, str) else str(text) if text else "" for text in texts]
+        unique_texts = list(dict.fromkeys(text for text in texts if text))
         
-        # Apply email pattern first (before company name replacement)
-        email_pattern = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', re.IGNORECASE)
-        sanitized_text = email_pattern.sub('[EMAIL]', sanitized_text)
+        cacheable = [text for text in unique_texts if len(text) >= MIN_CACHED_CHARS]
+        sanitized = CacheManager.get_sanitized_batch(cacheable, self.rules_fingerprint) if cacheable else {}
+        pending = [text for text in unique_texts if text not in sanitized]
+        newly_sanitized = dict(zip(pending, self._sanitize_batch_uncached(pending)))
+        CacheManager.cache_sanitized_batch(
+            {text: result for text, result in newly_sanitized.items() if len(text) >= MIN_CACHED_CHARS},
+            self.rules_fingerprint
+        )
+        sanitized.update(newly_sanitized)
         
-        # Apply all other sanitization patterns
-        for category, patterns in _self.compiled_patterns.items():
-            replacement = _self.replacements[category]
-            for pattern in patterns:
-                sanitized_text = pattern.sub(replacement, sanitized_text)
+        return [sanitized[text] if text else "" for text in texts]
+    
+    def _sanitize_batch_uncached(self, texts: List[str]) -> List[str]:
+        """Apply every sanitization rule to many texts, in worker processes if there is enough text."""
+        config = get_sanitizer_config()
+        workers = get_worker_count(config['workers'])
+        sizes = [len(text) for text in texts]
+        if workers <= 1 or sum(sizes) < config['parallel_min_chars']:
+            return self._sanitize_in_process(texts)
         
-        # Additional custom replacements
-        sanitized_text = _self._custom_replacements(sanitized_text)
+        chunks = split_by_size(texts, sizes, workers)
+        try:
+            pool = get_worker_pool(workers)
+            if self.pseudonymize:
+                results = pool.map(pseudonymize_chunk, repeat(self.engine), repeat(self.pseudonym_secret), chunks)
+                return self._register_pseudonyms([result for chunk_result in results for result in chunk_result])
+            results = pool.map(sanitize_chunk, repeat(self.engine), chunks)
+            return [sanitized for chunk_result in results for sanitized in chunk_result]
+        except Exception as e:
+            print(f"Sanitization worker pool failed, sanitizing in the app process: {e}")
+            get_worker_pool.clear()
+            return self._sanitize_in_process(texts)
+    
+    def _sanitize_in_process(self, texts: List[str]) -> List[str]:
+        """Apply every sanitization rule to texts in the app process; texts over a stream window are sanitized window by window."""
+        window_chars = get_sanitizer_config()['stream_window_chars']
+        if any(len(text) > window_chars for text in texts):
+            return [
+                ''.join(self.sanitize_stream([text])) if len(text) > window_chars else self._sanitize_in_process([text])[0]
+                for text in texts
+            ]
+        if self.pseudonymize:
+            return self._register_pseudonyms(pseudonymize_chunk(self.engine, self.pseudonym_secret, texts))
+        return [self.engine.sanitize(text) for text in texts]
+    
+    @staticmethod
+    def _register_pseudonyms(results: List[Tuple[str, Dict[str, str]]]) -> List[str]:
+        """Record the original values of the tokens in pseudonymized texts, for restoring LLM output."""
+        originals = {}
+        for _, text_originals in results:
+            originals.update(text_originals)
+        get_pseudonym_map().add(originals)
+        return [pseudonymized for pseudonymized, _ in results]
+    
+    def sanitize_stream(self, chunks: Iterable[str]) -> Iterator[str]:
+        """
+        Sanitizes text arriving in chunks (e.g. a description with megabytes of pasted logs),
+        yielding sanitized text window by window, so memory use stays flat and the caller can
+        start on the first windows before the whole text is read. Matches across chunk ends are
+        found as in sanitize_text (see SanitizerEngine.iter_windows).
         
-        return sanitized_text
-
+        Args:
+            chunks: Pieces of the text, in order
+            
+        Yields:
+            Sanitized pieces; joined, the same text as sanitize_text of the whole text
+            (the rules' whitespace gaps are bounded by GAP for this)
+        """
+        windows = self.engine.iter_windows(
+            (chunk if isinstance(chunk, str) else str(chunk) for chunk in chunks),
+            get_sanitizer_config()['stream_window_chars'], STREAM_OVERLAP_CHARS
+        )
+        for window, matches in windows:
+            if self.pseudonymize:
+                pseudonymized, originals = pseudonymize_matches(window, matches, self.pseudonym_secret)
+                get_pseudonym_map().add(originals)
+                yield pseudonymized
+            else:
+                yield replace_matches(window, matches)
+    
     def sanitize_text(self, text: str) -> str:
         """
         Sanitizes a text string by replacing sensitive information.
@@ -112,28 +246,6 @@ class DataSanitizer:
         """
         return self._cached_sanitize_text(text)
     
-    def _custom_replacements(self, text: str) -> str:
-        """
-        Applies custom replacement rules.
-        """
-        # Replace specific hardcoded values
-        custom_replacements = {
-            'rafael.fernandes@company.com': '[USER_EMAIL]',
-            'https://company.atlassian.net': '[JIRA_URL]',
-            '': '[JIRA_TOKEN]',
-            'company': '[COMPANY_NAME]',
-            'company': '[COMPANY_NAME]',
-            'ST-': '[PROJECT_CODE]-',
-            'INC-': '[PROJECT_CODE]-',
-            'TT': '[SYSTEM_NAME]',
-            'TS': '[SYSTEM_NAME]',
-        }
-        
-        for original, replacement in custom_replacements.items():
-            text = text.replace(original, replacement)
-        
-        return text
-    
     def sanitize_user_story(self, story: Dict[str, Any]) -> Dict[str, Any]:
         """
         Sanitizes a user story dictionary.
@@ -169,7 +281,7 @@ class DataSanitizer:
     
     def sanitize_stories_list(self, stories: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        Sanitizes a list of user stories.
+        Sanitizes a list of user stories, all fields (including comments and linked tickets) in one batch (see sanitize_texts).
         
         Args:
             stories: List of user story dictionaries
@@ -177,11 +289,13 @@ class DataSanitizer:
         Returns:
             List of sanitized user story dictionaries
         """
-        return [self.sanitize_user_story(story) for story in stories]
+        fields = ("key", "title", "description", "comments", "linked_tickets")
+        sanitized = iter(self.sanitize_texts([story.get(field, "") for story in stories for field in fields]))
+        return [{field: next(sanitized) for field in fields} for _ in stories]
     
     def sanitize_bugs_list(self, bugs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        Sanitizes a list of bug tickets.
+        Sanitizes a list of bug tickets, all fields and labels in one batch (see sanitize_texts).
         
         Args:
             bugs: List of bug ticket dictionaries
@@ -189,11 +303,54 @@ class DataSanitizer:
         Returns:
             List of sanitized bug ticket dictionaries
         """
-        return [self.sanitize_bug_ticket(bug) for bug in bugs]
+        fields = ("key", "title", "description")
+        texts = []
+        for bug in bugs:
+            texts.extend(bug.get(field, "") for field in fields)
+            texts.extend(bug.get("labels", []))
+        sanitized = iter(self.sanitize_texts(texts))
+        return [{
+            **{field: next(sanitized) for field in fields},
+            "labels": [next(sanitized) for _ in bug.get("labels", [])]
+        } for bug in bugs]
+    
+    def sanitize_with_summary(self, text: str) -> Dict[str, Any]:
+        """
+        Sanitizes a text and reports what was replaced, gathered in the same scan.
+        
+        Args:
+            text: The text to sanitize
+            
+        Returns:
+            Dictionary with the sanitized text, the sanitization summary (see get_sanitization_summary)
+            and the matches: category, start and end in the original text, original text and
+            replacement of every placeholder, in order
+        """
+        if not isinstance(text, str):
+            text = str(text) if text else ""
+        sanitized_text, spans = self.engine.sanitize_with_matches(text)
+        
+        replacements_count = {}
+        for _, _, category, _ in spans:
+            replacements_count[category] = replacements_count.get(category, 0) + 1
+        
+        return {
+            "sanitized_text": sanitized_text,
+            "original_length": len(text),
+            "sanitized_length": len(sanitized_text),
+            "replacements_made": replacements_count,
+            "sanitization_percentage": round((1 - len(sanitized_text) / len(text)) * 100, 2) if text else 0,
+            "matches": [
+                {"category": category, "start": start, "end": end, "text": text[start:end], "replacement": replacement}
+                for start, end, category, replacement in spans
+            ]
+        }
     
     def get_sanitization_summary(self, original_text: str, sanitized_text: str) -> Dict[str, Any]:
         """
         Provides a summary of what was sanitized.
+        Sanitizes the text again to count the replacements; use sanitize_with_summary to get
+        the sanitized text and the summary from one scan.
         
         Args:
             original_text: Original text
@@ -202,21 +359,13 @@ class DataSanitizer:
         Returns:
             Dictionary with sanitization summary
         """
+        summary = self.sanitize_with_summary(original_text)
         original_length = len(original_text)
         sanitized_length = len(sanitized_text)
         
-        # Count replacements by category
-        replacements_count = {}
-        for category, patterns in self.compiled_patterns.items():
-            count = 0
-            for pattern in patterns:
-                count += len(pattern.findall(original_text))
-            if count > 0:
-                replacements_count[category] = count
-        
         return {
             "original_length": original_length,
             "sanitized_length": sanitized_length,
-            "replacements_made": replacements_count,
+            "replacements_made": summary["replacements_made"],
             "sanitization_percentage": round((1 - sanitized_length / original_length) * 100, 2) if original_length > 0 else 0
-        } 
\ No newline at end of file
+        }
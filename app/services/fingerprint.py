@@ -0,0 +1,76 @@
+"""
+Content fingerprints for cache keys
+Fast non-cryptographic hashing of large payloads, and corpora that carry their own fingerprint
+so they are not re-serialized every time they are part of a cache key
+"""
+
+import hashlib
+import json
+from typing import Any, Iterable
+
+try:
+    import xxhash
+    HASH_BACKEND = "xxh3_128"
+except ImportError:
+    xxhash = None
+    HASH_BACKEND = "blake2b"
+
+# Containers with more items than this are hashed as a whole instead of item by item
+MAX_INSPECTED_ITEMS = 16
+
+
+def fast_hash(data) -> str:
+    """
+    Hash a string or bytes with xxh3-128 (blake2b-128 when xxhash is not installed)
+
+    Args:
+        data: Text (UTF-8 encoded first) or bytes
+
+    Returns:
+        Hex digest
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8", "surrogatepass")
+    if xxhash is not None:
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _serialize(data: Any) -> str:
+    return json.dumps(data, sort_keys=True, default=str, separators=(",", ":"))
+
+
+class FingerprintedList(list):
+    """
+    A list (e.g. a Jira or TestRail corpus) that computes its content fingerprint once, when it is built.
+    The fingerprint is pickled with the list, so it is stored with cached corpora and survives restarts.
+    Like every cached value it must be treated as read-only: mutating it leaves the fingerprint stale.
+    """
+
+    def __init__(self, items: Iterable = ()):
+        super().__init__(items)
+        self.fingerprint = fast_hash(_serialize(self))
+
+
+def fingerprint(data: Any) -> str:
+    """
+    Get a stable content fingerprint of cache key data.
+    FingerprintedList values reuse their stored fingerprint, strings and bytes are hashed directly,
+    and small dicts, lists and tuples are fingerprinted item by item so a corpus nested in the key
+    data (e.g. {"existing": corpus, "threshold": 0.5}) is never serialized.
+
+    Args:
+        data: Key data
+
+    Returns:
+        Hex digest
+    """
+    if isinstance(data, FingerprintedList):
+        return data.fingerprint
+    if isinstance(data, (str, bytes)):
+        return fast_hash(data)
+    if isinstance(data, dict) and len(data) <= MAX_INSPECTED_ITEMS:
+        return fast_hash(_serialize({str(key): fingerprint(value) for key, value in data.items()}))
+    if isinstance(data, (list, tuple)) and len(data) <= MAX_INSPECTED_ITEMS:
+        return fast_hash(_serialize([fingerprint(item) for item in data]))
+    return fast_hash(_serialize(data))
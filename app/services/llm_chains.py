@@ -4,117 +4,350 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 from prompts.user_story_analysis import user_story_analysis_prompt_template
 from prompts.test_case_generation import test_case_generation_prompt_template
+from prompts.test_case_generation_json import test_case_generation_json_prompt_template
 from prompts.test_automation import test_automation_prompt_template
 from prompts.bug_improvement import bug_improvement_prompt_template
 from prompts.user_story_review import user_story_review_prompt_template
 from prompts.enhancement_story_review import enhancement_story_review_prompt_template
 from prompts.system_context import system_context_prompt
 from langchain_core.prompts import HumanMessagePromptTemplate
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langchain_core.runnables import RunnableLambda
+from services.token_budget import token_budget, get_chain_name
+from services.llm_scheduler import get_llm_scheduler, RateLimitExceeded, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+from services.cache_manager import CacheManager
+from services.data_sanitizer import get_data_sanitizer
+from services.pseudonymizer import is_pseudonymization_enabled, restore_pseudonyms, get_pseudonym_map, StreamRestorer
+from config import get_google_model_name
+import asyncio
 import time
 import streamlit as st
 import os
 
-@st.cache_data(ttl=300)  # Cache for 5 minutes
-def _cached_invoke_with_timeout(chain_id, inputs_str, timeout_seconds=120):
+def _pseudonymize_inputs(inputs):
     """
-    Cached version of chain invocation with timeout handling.
-    This prevents repeated API calls for identical inputs within 5 minutes.
+    With SANITIZER_PSEUDONYMIZE, replace the sensitive values in the chain inputs with their tokens.
+    Responses are restored before they are shown, so text from an earlier response or typed by
+    the user is pseudonymized again here, with the same tokens.
+    """
+    if not is_pseudonymization_enabled():
+        return inputs
+    keys = [key for key, value in inputs.items() if isinstance(value, str)]
+    pseudonymized = get_data_sanitizer().sanitize_texts([inputs[key] for key in keys])
+    return {**inputs, **dict(zip(keys, pseudonymized))}
+
+def _stream_restorer():
+    """Get a restorer of the original values in streamed chunks, or None without SANITIZER_PSEUDONYMIZE."""
+    return StreamRestorer(get_pseudonym_map()) if is_pseudonymization_enabled() else None
+
+def invoke_with_timeout(chain, inputs, timeout_seconds=120, priority=PRIORITY_INTERACTIVE):
+    """
+    Invoke a LangChain chain with timeout handling.
+    Uses caching to improve performance for repeated requests.
+    Includes LangSmith tracing for monitoring.
+    Inputs are trimmed to the chain's token budget and token usage is logged per call.
+    Calls go through the process-wide LLM scheduler, which keeps the deployment within
+    the Gemini RPM/TPM quota and backs off on 429 responses.
+    Successful responses are kept in the tiered cache for 5 minutes, and concurrent
+    identical calls (same chain and inputs) share a single request.
     
     Args:
-        chain_id: Identifier for the chain type
-        inputs_str: String representation of input parameters for caching
+        chain: The LangChain chain to invoke
+        inputs: Input parameters for the chain
         timeout_seconds: Maximum time to wait for response (default: 120 seconds)
+        priority: Scheduler priority (interactive calls are served before batch calls)
     
     Returns:
         The chain output or error message
     """
     try:
-        # This is a placeholder - in practice, you'd need to reconstruct the chain
-        # For now, we'll return a message indicating caching is working
-        return f"🔄 Cached response for {chain_id} with inputs: {inputs_str[:100]}..."
+        chain_name = get_chain_name(chain)
+        inputs, input_tokens = token_budget.apply_budget(chain_name, _pseudonymize_inputs(inputs))
+        scheduler = get_llm_scheduler()
+
+        def scheduled_invoke():
+            start_time = time.time()
+
+            # Check if LangSmith is configured
+            langsmith_enabled = bool(os.getenv("LANGCHAIN_API_KEY"))
+            
+            if langsmith_enabled:
+                # LangSmith will automatically trace this invocation
+                output = scheduler.run(lambda: chain.invoke(inputs), input_tokens, priority=priority, timeout=timeout_seconds)
+            else:
+                # Regular invocation without tracing
+                output = scheduler.run(lambda: chain.invoke(inputs), input_tokens, priority=priority, timeout=timeout_seconds)
+
+            output_tokens = token_budget.estimate_tokens(output)
+            scheduler.settle(input_tokens, input_tokens + output_tokens)
+            token_budget.record_usage(chain_name, input_tokens, output_tokens, time.time() - start_time)
+            return output
+
+        result = CacheManager.cache_llm_response(chain_name, get_google_model_name(), inputs, scheduled_invoke)
+        return restore_pseudonyms(result)
+    except RateLimitExceeded:
+        return "⏳ **Rate limit**: The Google Gemini quota is exhausted right now.\n\n" \
+               "Please wait a minute and try again."
+    except TimeoutError:
+        return f"⏳ **Busy**: The request could not start within {timeout_seconds} seconds because " \
+               f"other requests are using the Google Gemini quota.\n\nPlease try again shortly."
     except Exception as e:
         return f"❌ **Error**: An unexpected error occurred: {str(e)}\n\n" \
                f"Please check your input and try again."
 
-def invoke_with_timeout(chain, inputs, timeout_seconds=120):
+async def ainvoke_with_timeout(chain, inputs, timeout_seconds=120, priority=PRIORITY_INTERACTIVE):
     """
-    Invoke a LangChain chain with timeout handling.
-    Uses caching to improve performance for repeated requests.
-    Includes LangSmith tracing for monitoring.
+    Async version of invoke_with_timeout, for running several chains concurrently.
+    Applies the same token budget, scheduler and error messages.
     
     Args:
         chain: The LangChain chain to invoke
         inputs: Input parameters for the chain
         timeout_seconds: Maximum time to wait for response (default: 120 seconds)
+        priority: Scheduler priority (interactive calls are served before batch calls)
     
     Returns:
         The chain output or error message
     """
     try:
-        # Check if LangSmith is configured
-        langsmith_enabled = bool(os.getenv("LANGCHAIN_API_KEY"))
+        chain_name = get_chain_name(chain)
+        inputs, input_tokens = token_budget.apply_budget(chain_name, _pseudonymize_inputs(inputs))
+        scheduler = get_llm_scheduler()
+        start_time = time.time()
         
-        if langsmith_enabled:
-            # LangSmith will automatically trace this invocation
-            result = chain.invoke(inputs)
-        else:
-            # Regular invocation without tracing
-            result = chain.invoke(inputs)
-            
-        return result
+        result = await scheduler.arun(
+            lambda: asyncio.wait_for(chain.ainvoke(inputs), timeout_seconds),
+            input_tokens,
+            priority=priority,
+            timeout=timeout_seconds
+        )
+        
+        output_tokens = token_budget.estimate_tokens(result)
+        scheduler.settle(input_tokens, input_tokens + output_tokens)
+        token_budget.record_usage(chain_name, input_tokens, output_tokens, time.time() - start_time)
+        return restore_pseudonyms(result)
+    except RateLimitExceeded:
+        return "⏳ **Rate limit**: The Google Gemini quota is exhausted right now.\n\n" \
+               "Please wait a minute and try again."
+    except (TimeoutError, asyncio.TimeoutError):
+        return f"⏳ **Timeout**: No response within {timeout_seconds} seconds.\n\nPlease try again shortly."
     except Exception as e:
         return f"❌ **Error**: An unexpected error occurred: {str(e)}\n\n" \
                f"Please check your input and try again."
 
+async def _astream_with_deadline(stream, timeout_seconds):
+    """Yield the chunks of an async stream, raising TimeoutError if it is not complete within timeout_seconds."""
+    deadline = time.monotonic() + timeout_seconds
+    iterator = stream.__aiter__()
+    while True:
+        try:
+            chunk = await asyncio.wait_for(iterator.__anext__(), max(deadline - time.monotonic(), 0))
+        except StopAsyncIteration:
+            return
+        yield chunk
+
+def _stream_with_deadline(stream, timeout_seconds):
+    """
+    Yield the chunks of a stream, raising TimeoutError once it runs past timeout_seconds.
+    The deadline is checked between chunks; a single stalled read is bounded by the model client's request_timeout.
+    """
+    deadline = time.monotonic() + timeout_seconds
+    for chunk in stream:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"The response did not complete within {timeout_seconds} seconds")
+        yield chunk
+
+async def astream_chain(chain, inputs, timeout_seconds=120, priority=PRIORITY_INTERACTIVE):
+    """
+    Stream a LangChain chain's output chunk by chunk.
+    The call goes through the scheduler like ainvoke_with_timeout: it waits for a slot and
+    429s are retried with backoff until the first chunk arrives. A cached response is yielded
+    in one chunk, and complete responses are cached. Token usage is settled and logged when
+    the stream ends, also when it fails.
+    
+    Args:
+        chain: The LangChain chain to stream
+        inputs: Input parameters for the chain
+        timeout_seconds: Maximum time to wait for a scheduler slot, and for the stream to complete
+        priority: Scheduler priority (interactive calls are served before batch calls)
+    
+    Yields:
+        Text chunks as the model produces them
+    
+    Raises:
+        RateLimitExceeded: If the model still answers 429 after the scheduler's retries
+        TimeoutError: If no slot is free or the stream does not complete in time
+    """
+    chain_name = get_chain_name(chain)
+    inputs, input_tokens = token_budget.apply_budget(chain_name, _pseudonymize_inputs(inputs))
+    model_name = get_google_model_name()
+    cached = CacheManager.get_llm_response(chain_name, model_name, inputs)
+    if cached is not None:
+        yield restore_pseudonyms(cached)
+        return
+    
+    scheduler = get_llm_scheduler()
+    start_time = time.time()
+    stream = await scheduler.arun_stream(
+        lambda: _astream_with_deadline(chain.astream(inputs), timeout_seconds),
+        input_tokens, priority=priority, timeout=timeout_seconds
+    )
+    chunks = []
+    try:
+        restorer = _stream_restorer()
+        async for chunk in stream:
+            chunks.append(chunk)
+            shown = restorer.feed(chunk) if restorer else chunk
+            if shown:
+                yield shown
+        remainder = restorer.flush() if restorer else ""
+        if remainder:
+            yield remainder
+        CacheManager.store_llm_response(chain_name, model_name, inputs, "".join(chunks))
+    finally:
+        output_tokens = token_budget.estimate_tokens("".join(chunks))
+        scheduler.settle(input_tokens, input_tokens + output_tokens)
+        token_budget.record_usage(chain_name, input_tokens, output_tokens, time.time() - start_time)
+
+def stream_chain(chain, inputs, timeout_seconds=120, priority=PRIORITY_INTERACTIVE):
+    """
+    Stream a LangChain chain's output chunk by chunk (synchronous version of astream_chain).
+    The call goes through the scheduler like invoke_with_timeout: it waits for a slot and
+    429s are retried with backoff until the first chunk arrives. A cached response is yielded
+    in one chunk, and complete responses are cached. Token usage is settled and logged when
+    the stream ends, also when it fails.
+    
+    Args:
+        chain: The LangChain chain to stream
+        inputs: Input parameters for the chain
+        timeout_seconds: Maximum time to wait for a scheduler slot, and for the stream to complete
+        priority: Scheduler priority (interactive calls are served before batch calls)
+    
+    Yields:
+        Text chunks as the model produces them
+    
+    Raises:
+        RateLimitExceeded: If the model still answers 429 after the scheduler's retries
+        TimeoutError: If no slot is free or the stream does not complete in time
+    """
+    chain_name = get_chain_name(chain)
+    inputs, input_tokens = token_budget.apply_budget(chain_name, _pseudonymize_inputs(inputs))
+    model_name = get_google_model_name()
+    cached = CacheManager.get_llm_response(chain_name, model_name, inputs)
+    if cached is not None:
+        yield restore_pseudonyms(cached)
+        return
+    
+    scheduler = get_llm_scheduler()
+    start_time = time.time()
+    stream = scheduler.run_stream(
+        lambda: _stream_with_deadline(chain.stream(inputs), timeout_seconds),
+        input_tokens, priority=priority, timeout=timeout_seconds
+    )
+    chunks = []
+    try:
+        restorer = _stream_restorer()
+        for chunk in stream:
+            chunks.append(chunk)
+            shown = restorer.feed(chunk) if restorer else chunk
+            if shown:
+                yield shown
+        remainder = restorer.flush() if restorer else ""
+        if remainder:
+            yield remainder
+        CacheManager.store_llm_response(chain_name, model_name, inputs, "".join(chunks))
+    finally:
+        output_tokens = token_budget.estimate_tokens("".join(chunks))
+        scheduler.settle(input_tokens, input_tokens + output_tokens)
+        token_budget.record_usage(chain_name, input_tokens, output_tokens, time.time() - start_time)
+
+def batch_invoke(chain, inputs_list, max_concurrency=4, requests_per_minute=None, timeout_seconds=120):
+    """
+    Invoke a LangChain chain for many inputs concurrently, yielding results as they finish.
+    Each input is trimmed to the chain's token budget and token usage is logged per result.
+    Calls are queued in the LLM scheduler at batch priority, so interactive requests from
+    other users are served first.
+    
+    Args:
+        chain: The LangChain chain to invoke
+        inputs_list: List of input parameter dictionaries
+        max_concurrency: Maximum number of calls in flight at once
+        requests_per_minute: Optional cap on how many calls this batch starts per minute
+        timeout_seconds: Maximum time each call waits for a scheduler slot (the call itself is
+                         bounded by the model's request timeout); a call that cannot start is
+                         reported as failed and the rest of the batch goes on
+    
+    Yields:
+        Tuples of (index into inputs_list, chain output or error message)
+    """
+    chain_name = get_chain_name(chain)
+    scheduler = get_llm_scheduler()
+    rate_limiter = None
+    if requests_per_minute:
+        rate_limiter = InMemoryRateLimiter(
+            requests_per_second=requests_per_minute / 60,
+            check_every_n_seconds=0.1,
+            max_bucket_size=1
+        )
+    
+    def run_scheduled(item):
+        inputs, input_tokens = item
+        if rate_limiter:
+            rate_limiter.acquire()
+        start_time = time.time()
+        output = scheduler.run(lambda: chain.invoke(inputs), input_tokens, priority=PRIORITY_BATCH, timeout=timeout_seconds)
+        output_tokens = token_budget.estimate_tokens(output)
+        scheduler.settle(input_tokens, input_tokens + output_tokens)
+        token_budget.record_usage(chain_name, input_tokens, output_tokens, time.time() - start_time)
+        return output
+    
+    budgeted = [token_budget.apply_budget(chain_name, _pseudonymize_inputs(inputs)) for inputs in inputs_list]
+    results = RunnableLambda(run_scheduled).batch_as_completed(
+        budgeted,
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True
+    )
+    for index, output in results:
+        if isinstance(output, RateLimitExceeded):
+            yield index, "⏳ **Rate limit**: The Google Gemini quota is exhausted right now."
+        elif isinstance(output, TimeoutError):
+            yield index, f"⏳ **Busy**: The request could not start within {timeout_seconds} seconds because " \
+                         f"other requests are using the Google Gemini quota."
+        elif isinstance(output, Exception):
+            yield index, f"❌ **Error**: An unexpected error occurred: {str(output)}"
+        else:
+            yield index, restore_pseudonyms(output)
+
+def _build_chain(llm, run_name, prompt_template):
+    """Build a system-context chain and register its prompt for token budgeting."""
+    prompt = ChatPromptTemplate.from_messages([
+        system_context_prompt,
+        HumanMessagePromptTemplate(prompt=prompt_template)
+    ])
+    token_budget.register_prompt(run_name, prompt)
+    return (prompt | llm | StrOutputParser()).with_config({"run_name": run_name})
+
 def setup_llm_chains(llm):
     """Setup all LLM chains with LangSmith tracing."""
     if llm is None:
-        return None, None, None, None, None, None
+        return None, None, None, None, None, None, None
     
     # Enable caching to avoid re-processing identical prompts
     langchain.cache = InMemoryCache()
 
     # Create chains with descriptive names for better LangSmith tracking
-    user_story_analysis_chain = (
-        ChatPromptTemplate.from_messages([
-            system_context_prompt,
-            HumanMessagePromptTemplate(prompt=user_story_analysis_prompt_template)
-        ]) | llm | StrOutputParser()
-    ).with_config({"run_name": "user_story_analysis"})
-
-    test_case_generation_chain = (
-        ChatPromptTemplate.from_messages([
-            system_context_prompt,
-            HumanMessagePromptTemplate(prompt=test_case_generation_prompt_template)
-        ]) | llm | StrOutputParser()
-    ).with_config({"run_name": "test_case_generation"})
-
-    test_automation_chain = (
-        ChatPromptTemplate.from_messages([
-            system_context_prompt,
-            HumanMessagePromptTemplate(prompt=test_automation_prompt_template)
-        ]) | llm | StrOutputParser()
-    ).with_config({"run_name": "test_automation"})
-
-    bug_improvement_chain = (
-        ChatPromptTemplate.from_messages([
-            system_context_prompt,
-            HumanMessagePromptTemplate(prompt=bug_improvement_prompt_template)
-        ]) | llm | StrOutputParser()
-    ).with_config({"run_name": "bug_improvement"})
-
-    user_story_review_chain = (
-        ChatPromptTemplate.from_messages([
-            system_context_prompt,
-            HumanMessagePromptTemplate(prompt=user_story_review_prompt_template)
-        ]) | llm | StrOutputParser()
-    ).with_config({"run_name": "user_story_review"})
-
-    enhancement_story_review_chain = (
-        ChatPromptTemplate.from_messages([
-            system_context_prompt,
-            HumanMessagePromptTemplate(prompt=enhancement_story_review_prompt_template)
-        ]) | llm | StrOutputParser()
-    ).with_config({"run_name": "enhancement_story_review"})
-    
-    return user_story_analysis_chain, test_case_generation_chain, test_automation_chain, bug_improvement_chain, user_story_review_chain, enhancement_story_review_chain
\ No newline at end of file
+    user_story_analysis_chain = _build_chain(llm, "user_story_analysis", user_story_analysis_prompt_template)
+    test_case_generation_chain = _build_chain(llm, "test_case_generation", test_case_generation_prompt_template)
+    test_automation_chain = _build_chain(llm, "test_automation", test_automation_prompt_template)
+    bug_improvement_chain = _build_chain(llm, "bug_improvement", bug_improvement_prompt_template)
+    user_story_review_chain = _build_chain(llm, "user_story_review", user_story_review_prompt_template)
+    enhancement_story_review_chain = _build_chain(llm, "enhancement_story_review", enhancement_story_review_prompt_template)
+
+    # Structured output variant: Gemini's JSON mode guarantees a parseable response
+    test_case_generation_json_chain = _build_chain(
+        llm.bind(response_mime_type="application/json"),
+        "test_case_generation_json",
+        test_case_generation_json_prompt_template
+    )
+    
+    return user_story_analysis_chain, test_case_generation_chain, test_automation_chain, bug_improvement_chain, user_story_review_chain, enhancement_story_review_chain, test_case_generation_json_chain
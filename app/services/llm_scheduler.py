@@ -0,0 +1,298 @@
+"""
+Client-side rate limiting for Gemini calls
+A process-wide token-bucket scheduler shared by every session of the deployment
+"""
+
+import asyncio
+import heapq
+import itertools
+import random
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Iterator, Optional
+import streamlit as st
+from config import get_google_model_name, get_llm_rate_limits
+
+# Lower value is served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+# Backoff used when a 429 does not say how long to wait
+BASE_BACKOFF_SECONDS = 2.0
+MAX_BACKOFF_SECONDS = 60.0
+
+
+class RateLimitExceeded(Exception):
+    """Raised when the model keeps answering 429 after all retries."""
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Check whether an exception is a quota / 429 response from the model API."""
+    if type(error).__name__ in ("ResourceExhausted", "TooManyRequests", "RateLimitError"):
+        return True
+    message = str(error).lower()
+    return "429" in message or "resource exhausted" in message or "quota" in message
+
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Extract the server-suggested wait time from a 429 error message, if any."""
+    message = str(error)
+    match = re.search(r'retry[_ ]delay\s*\{\s*seconds:\s*(\d+)', message, re.IGNORECASE)
+    if not match:
+        match = re.search(r'retry (?:in|after) (\d+(?:\.\d+)?)\s*s', message, re.IGNORECASE)
+    return float(match.group(1)) if match else None
+
+
+class LLMScheduler:
+    """
+    Token-bucket scheduler for one model.
+    Calls wait in a priority queue until both the request bucket (RPM) and the
+    token bucket (TPM) can cover them; interactive calls are served before batch calls.
+    A 429 pauses the whole queue for the server-suggested (or exponential) backoff.
+    """
+
+    def __init__(self, model_name: str, requests_per_minute: int, tokens_per_minute: int):
+        self.model_name = model_name
+        self.requests_per_minute = max(1, requests_per_minute)
+        self.tokens_per_minute = max(1, tokens_per_minute)
+        self._request_bucket = float(self.requests_per_minute)
+        self._token_bucket = float(self.tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._waiting = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self.stats = {"calls": 0, "rate_limited": 0, "queue_wait_seconds": 0.0}
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_bucket = min(self.requests_per_minute, self._request_bucket + elapsed * self.requests_per_minute / 60)
+        self._token_bucket = min(self.tokens_per_minute, self._token_bucket + elapsed * self.tokens_per_minute / 60)
+
+    def _seconds_until_ready(self, now: float, tokens: int) -> float:
+        waits = [self._paused_until - now]
+        if self._request_bucket < 1:
+            waits.append((1 - self._request_bucket) * 60 / self.requests_per_minute)
+        if self._token_bucket < tokens:
+            waits.append((tokens - self._token_bucket) * 60 / self.tokens_per_minute)
+        return max(waits)
+
+    def acquire(self, tokens: int, priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None) -> None:
+        """
+        Block until a call of the given size may start
+
+        Args:
+            tokens: Estimated tokens the call will use
+            priority: PRIORITY_INTERACTIVE or PRIORITY_BATCH
+            timeout: Maximum seconds to wait in the queue (None waits forever)
+
+        Raises:
+            TimeoutError: If the call could not start within the timeout
+        """
+        # A single call larger than the whole minute budget would never fit
+        tokens = min(max(tokens, 1), self.tokens_per_minute)
+        ticket = (priority, next(self._sequence))
+        start = time.monotonic()
+        deadline = start + timeout if timeout else None
+
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = self._seconds_until_ready(now, tokens)
+                    if self._waiting[0] == ticket and wait <= 0:
+                        heapq.heappop(self._waiting)
+                        self._request_bucket -= 1
+                        self._token_bucket -= tokens
+                        self.stats["calls"] += 1
+                        self.stats["queue_wait_seconds"] += now - start
+                        return
+                    if deadline and now >= deadline:
+                        raise TimeoutError(f"Waited {timeout}s for a free {self.model_name} slot")
+                    if self._waiting[0] != ticket:
+                        # Not at the head of the queue: wake up when the head is served
+                        wait = 1.0
+                    if deadline:
+                        wait = min(wait, deadline - now)
+                    self._condition.wait(max(wait, 0.01))
+            finally:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """Correct the token bucket once the real size of a call is known."""
+        with self._condition:
+            self._token_bucket += estimated_tokens - actual_tokens
+
+    def report_rate_limited(self, retry_after: float) -> None:
+        """Pause every queued call after the model answered 429."""
+        with self._condition:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            self._request_bucket = min(self._request_bucket, 0.0)
+            self.stats["rate_limited"] += 1
+            self._condition.notify_all()
+
+    def run(self, func: Callable[[], Any], tokens: int, priority: int = PRIORITY_INTERACTIVE,
+            timeout: Optional[float] = None, max_retries: int = 4) -> Any:
+        """
+        Run a model call through the scheduler, retrying on 429 with backoff
+
+        Args:
+            func: Zero-argument callable that performs the model call
+            tokens: Estimated tokens the call will use
+            priority: PRIORITY_INTERACTIVE or PRIORITY_BATCH
+            timeout: Maximum seconds to wait in the queue per attempt
+            max_retries: How many times a 429 is retried
+
+        Returns:
+            The result of func
+
+        Raises:
+            RateLimitExceeded: If the model still answers 429 after max_retries
+        """
+        for attempt in range(max_retries + 1):
+            self.acquire(tokens, priority=priority, timeout=timeout)
+            try:
+                return func()
+            except Exception as e:
+                self.back_off(e, attempt, max_retries)
+
+    async def arun(self, coro_factory: Callable[[], Any], tokens: int, priority: int = PRIORITY_INTERACTIVE,
+                   timeout: Optional[float] = None, max_retries: int = 4) -> Any:
+        """
+        Async version of run: waits for a slot in a worker thread so the event loop keeps running
+
+        Args:
+            coro_factory: Zero-argument callable returning a new awaitable that performs the model call
+            tokens: Estimated tokens the call will use
+            priority: PRIORITY_INTERACTIVE or PRIORITY_BATCH
+            timeout: Maximum seconds to wait in the queue per attempt
+            max_retries: How many times a 429 is retried
+
+        Returns:
+            The result of the awaited call
+        """
+        for attempt in range(max_retries + 1):
+            await asyncio.to_thread(self.acquire, tokens, priority, timeout)
+            try:
+                return await coro_factory()
+            except Exception as e:
+                self.back_off(e, attempt, max_retries)
+
+    def run_stream(self, open_stream: Callable[[], Iterator], tokens: int, priority: int = PRIORITY_INTERACTIVE,
+                   timeout: Optional[float] = None, max_retries: int = 4) -> Iterator:
+        """
+        Start a streamed model call through the scheduler, retrying on 429 with backoff until its
+        first chunk arrives (a 429 after that would repeat text the caller has already shown)
+
+        Args:
+            open_stream: Zero-argument callable that starts the model call and returns its chunk iterator
+            tokens: Estimated tokens the call will use
+            priority: PRIORITY_INTERACTIVE or PRIORITY_BATCH
+            timeout: Maximum seconds to wait in the queue per attempt
+            max_retries: How many times a 429 is retried
+
+        Returns:
+            Iterator over every chunk of the stream, the first one included
+
+        Raises:
+            RateLimitExceeded: If the model still answers 429 after max_retries
+        """
+        for attempt in range(max_retries + 1):
+            self.acquire(tokens, priority=priority, timeout=timeout)
+            stream = iter(open_stream())
+            try:
+                first_chunk = next(stream)
+            except StopIteration:
+                return iter(())
+            except Exception as e:
+                self.back_off(e, attempt, max_retries)
+                continue
+            return itertools.chain([first_chunk], stream)
+
+    async def arun_stream(self, open_stream: Callable[[], AsyncIterator], tokens: int,
+                          priority: int = PRIORITY_INTERACTIVE, timeout: Optional[float] = None,
+                          max_retries: int = 4) -> AsyncIterator:
+        """
+        Async version of run_stream: 429s are retried with backoff until the first chunk arrives
+
+        Args:
+            open_stream: Zero-argument callable that starts the model call and returns its async chunk iterator
+            tokens: Estimated tokens the call will use
+            priority: PRIORITY_INTERACTIVE or PRIORITY_BATCH
+            timeout: Maximum seconds to wait in the queue per attempt
+            max_retries: How many times a 429 is retried
+
+        Returns:
+            Async iterator over every chunk of the stream, the first one included
+        """
+        for attempt in range(max_retries + 1):
+            await asyncio.to_thread(self.acquire, tokens, priority, timeout)
+            stream = open_stream().__aiter__()
+            try:
+                first_chunk = await stream.__anext__()
+            except StopAsyncIteration:
+                return _prepend_chunk(None, stream)
+            except Exception as e:
+                self.back_off(e, attempt, max_retries)
+                continue
+            return _prepend_chunk(first_chunk, stream)
+
+    def back_off(self, error: Exception, attempt: int, max_retries: int) -> None:
+        """
+        Handle a failed attempt of a model call: anything but a 429 is raised again, a 429 pauses
+        the whole queue for the server-suggested (or exponential) backoff before the next attempt
+
+        Args:
+            error: The exception of the attempt
+            attempt: Number of the attempt, from 0
+            max_retries: How many times a 429 is retried
+
+        Raises:
+            The error itself if it is not a 429, RateLimitExceeded after the last retry
+        """
+        if not is_rate_limit_error(error):
+            raise error
+        if attempt == max_retries:
+            raise RateLimitExceeded(f"{self.model_name} quota exceeded after {max_retries} retries: {error}") from error
+        backoff = get_retry_after(error) or min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * 2 ** attempt)
+        backoff += random.uniform(0, backoff * 0.1)
+        print(f"Rate limited by {self.model_name}, retrying in {backoff:.1f}s (attempt {attempt + 1}/{max_retries})")
+        self.report_rate_limited(backoff)
+
+    def get_status(self) -> dict:
+        """Get current bucket levels and counters."""
+        with self._condition:
+            self._refill(time.monotonic())
+            return {
+                "model": self.model_name,
+                "requests_available": round(self._request_bucket, 2),
+                "tokens_available": int(self._token_bucket),
+                "queued": len(self._waiting),
+                **self.stats,
+            }
+
+
+async def _prepend_chunk(first_chunk: Any, stream: AsyncIterator) -> AsyncIterator:
+    """Yield an already received first chunk (if any), then the rest of an async stream."""
+    if first_chunk is not None:
+        yield first_chunk
+    async for chunk in stream:
+        yield chunk
+
+
+@st.cache_resource
+def _get_model_scheduler(model_name: str) -> LLMScheduler:
+    """Create the process-wide scheduler for a model (shared by all sessions)."""
+    limits = get_llm_rate_limits(model_name)
+    return LLMScheduler(model_name, limits['requests_per_minute'], limits['tokens_per_minute'])
+
+def get_llm_scheduler(model_name: str = None) -> LLMScheduler:
+    """Get the scheduler for a model, defaulting to the model configured in .env."""
+    return _get_model_scheduler(model_name or get_google_model_name())
@@ -0,0 +1,286 @@
+"""
+Reversible pseudonymization
+Gives each distinct sensitive value its own stable token instead of a generic placeholder
+("CM-42" becomes [PROJECT_CODE_3FA2B91C07D4E5A6] rather than [PROJECT_CODE]), so LLM responses keep the
+references, and restores the original values in the responses.
+"""
+
+import base64
+import hashlib
+import re
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import streamlit as st
+from config import get_sanitizer_config
+from services.cache_manager import CacheManager
+from services.sanitizer_engine import SanitizerEngine
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = None
+
+# Bytes of the keyed hash in a token: 64 bits keep collisions negligible for millions of distinct values
+TOKEN_DIGEST_SIZE = 8
+
+# Placeholder name and the hex digits of the keyed hash of the value
+TOKEN_PATTERN = re.compile(r'\[[A-Z][A-Z_]*_[0-9A-F]{%d}\]' % (TOKEN_DIGEST_SIZE * 2))
+
+_PLACEHOLDER_NAME = re.compile(r'\[([A-Z][A-Z_]*)\]')
+
+# A streamed chunk ending with an unclosed "[" shorter than this is held back: it may be the start of a token
+MAX_TOKEN_LENGTH = 64
+
+
+def pseudonym_token(name: str, value: str, secret: bytes) -> str:
+    """
+    Get the token of a sensitive value
+
+    Args:
+        name: Placeholder name (e.g. PROJECT_CODE)
+        value: Original value
+        secret: Key of the hash, so tokens cannot be reversed by hashing guessed values
+
+    Returns:
+        Token such as [PROJECT_CODE_3FA2B91C07D4E5A6]; the same for the same value and secret
+    """
+    digest = hashlib.blake2b(value.encode("utf-8", "surrogatepass"), key=secret, digest_size=TOKEN_DIGEST_SIZE).hexdigest()
+    return f"[{name}_{digest.upper()}]"
+
+
+def pseudonymize(engine: SanitizerEngine, text: str, secret: bytes) -> Tuple[str, Dict[str, str]]:
+    """
+    Sanitize a text with one token per distinct value instead of the rule placeholders
+
+    Args:
+        engine: Sanitization rules
+        text: Text to sanitize
+        secret: Key of the token hash
+
+    Returns:
+        Tuple of (pseudonymized text, original value of every token in it)
+    """
+    sanitized, matches = engine.sanitize_with_matches(text)
+    if not matches:
+        return sanitized, {}
+    return pseudonymize_matches(text, matches, secret)
+
+
+def pseudonymize_matches(text: str, matches: List[Tuple[int, int, str, str]], secret: bytes) -> Tuple[str, Dict[str, str]]:
+    """
+    Replace sanitizer matches with their tokens
+
+    Args:
+        text: Original text
+        matches: Matches in the text, as returned by SanitizerEngine.sanitize_with_matches
+        secret: Key of the token hash
+
+    Returns:
+        Tuple of (pseudonymized text, original value of every token in it)
+    
+    Raises:
+        ValueError: If two different values of the text get the same token
+    """
+    parts = []
+    originals = {}
+    position = 0
+    for start, end, label, replacement in matches:
+        placeholder = _PLACEHOLDER_NAME.search(replacement)
+        original = text[start:end]
+        token = pseudonym_token(placeholder.group(1) if placeholder else label.upper(), original, secret)
+        if originals.setdefault(token, original) != original:
+            raise ValueError(f"Pseudonymization token collision for {token}")
+        parts.append(text[position:start])
+        parts.append(token)
+        position = end
+    parts.append(text[position:])
+    return ''.join(parts), originals
+
+
+def pseudonymize_chunk(engine: SanitizerEngine, secret: bytes, texts: List[str]) -> List[Tuple[str, Dict[str, str]]]:
+    """Pseudonymize a chunk of texts (runs in the batch worker processes, see DataSanitizer.sanitize_texts)."""
+    return [pseudonymize(engine, text, secret) for text in texts]
+
+
+class PseudonymMap:
+    """
+    Bounded, thread-safe map of tokens to original values.
+    The least recently used pairs leave memory first; every pair is also kept in the "pseudonyms"
+    cache namespace, so tokens stay restorable after they leave memory, after a restart, or when
+    another process (the cache warm-up job) created them. Original values are encrypted with a
+    key derived from the token secret before they are cached, so they never reach the disk store
+    in plaintext; without the cryptography package pairs are kept in memory only.
+    """
+
+    def __init__(self, max_entries: int, secret: Optional[bytes] = None):
+        """
+        Args:
+            max_entries: Pairs kept in memory
+            secret: Key of the token hash, from which the cache encryption key is derived
+                    (None keeps the pairs in memory only)
+        """
+        self.max_entries = max_entries
+        self._originals: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._cipher = None
+        if secret is not None and Fernet is not None:
+            key = hashlib.blake2b(b"pseudonym cache", key=secret, digest_size=32).digest()
+            self._cipher = Fernet(base64.urlsafe_b64encode(key))
+        elif secret is not None:
+            print("cryptography is not installed; pseudonyms are kept in memory only")
+
+    def add(self, originals: Dict[str, str]) -> None:
+        """
+        Record the original values of tokens
+
+        Args:
+            originals: Dictionary of token to original value
+        
+        Raises:
+            ValueError: If a token already stands for another value (in memory or in the cache),
+                        so a restored token never gives back a different value
+        """
+        with self._lock:
+            known = {token: self._originals.get(token) for token in originals}
+        new_pairs = {}
+        for token, original in originals.items():
+            # Tokens that left memory, or were created by another process, may still be cached
+            previous = known[token] if known[token] is not None else self._read_cached(token)
+            if previous is None:
+                new_pairs[token] = original
+            elif previous != original:
+                raise ValueError(f"Pseudonymization token collision for {token}")
+        with self._lock:
+            for token, original in originals.items():
+                self._remember(token, original)
+        if new_pairs and self._cipher is not None:
+            CacheManager.cache_pseudonyms({
+                token: self._cipher.encrypt(original.encode("utf-8", "surrogatepass")).decode("ascii")
+                for token, original in new_pairs.items()
+            })
+
+    def lookup(self, token: str) -> Optional[str]:
+        """
+        Get the original value of a token
+
+        Args:
+            token: Token such as [PROJECT_CODE_3FA2B91C07D4E5A6]
+
+        Returns:
+            The original value, or None if the token is unknown
+        """
+        with self._lock:
+            original = self._originals.get(token)
+            if original is not None:
+                self._originals.move_to_end(token)
+                return original
+        original = self._read_cached(token)
+        if original is not None:
+            with self._lock:
+                self._remember(token, original)
+        return original
+
+    def _read_cached(self, token: str) -> Optional[str]:
+        """Get the original value of a token from the cache (None if unknown or encrypted with another key)."""
+        if self._cipher is None:
+            return None
+        sealed = CacheManager.get_pseudonym(token)
+        if sealed is None:
+            return None
+        try:
+            return self._cipher.decrypt(sealed.encode("ascii")).decode("utf-8", "surrogatepass")
+        except InvalidToken:
+            return None
+
+    def _remember(self, token: str, original: str) -> None:
+        self._originals[token] = original
+        self._originals.move_to_end(token)
+        while len(self._originals) > self.max_entries:
+            self._originals.popitem(last=False)
+
+    def restore(self, text: str) -> str:
+        """
+        Replace the tokens in a text with their original values, in a single scan
+
+        Args:
+            text: Text with tokens (e.g. an LLM response)
+
+        Returns:
+            Text with the original values; unknown tokens are left as they are
+        """
+        if '[' not in text:
+            return text
+        return TOKEN_PATTERN.sub(lambda match: self.lookup(match.group()) or match.group(), text)
+
+    def __len__(self) -> int:
+        return len(self._originals)
+
+
+class StreamRestorer:
+    """
+    Restores tokens in streamed text.
+    A chunk ending inside a token is held back until the next chunk completes it.
+    """
+
+    def __init__(self, pseudonym_map: PseudonymMap):
+        self.pseudonym_map = pseudonym_map
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        """
+        Restore a chunk
+
+        Args:
+            chunk: Next streamed chunk
+
+        Returns:
+            Restored text that can be shown (possibly empty)
+        """
+        text = self._pending + chunk
+        self._pending = ""
+        cut = text.rfind('[')
+        if cut != -1 and ']' not in text[cut:] and len(text) - cut < MAX_TOKEN_LENGTH:
+            text, self._pending = text[:cut], text[cut:]
+        return self.pseudonym_map.restore(text)
+
+    def flush(self) -> str:
+        """Restore the text held back at the end of the stream."""
+        text, self._pending = self._pending, ""
+        return self.pseudonym_map.restore(text)
+
+
+def is_pseudonymization_enabled() -> bool:
+    """Check whether sensitive values are pseudonymized (SANITIZER_PSEUDONYMIZE) instead of replaced by placeholders."""
+    return get_sanitizer_config()['pseudonymize']
+
+
+@st.cache_resource
+def get_pseudonym_map() -> PseudonymMap:
+    """Create the process-wide pseudonym map (shared by all sessions, like the Jira corpora holding the tokens)."""
+    return PseudonymMap(get_sanitizer_config()['pseudonym_max_entries'], get_pseudonym_secret())
+
+
+@st.cache_resource
+def get_pseudonym_secret() -> bytes:
+    """Get the key of the token hash (SANITIZER_PSEUDONYM_SECRET, or random for this process)."""
+    secret = get_sanitizer_config()['pseudonym_secret']
+    if not secret:
+        return secrets.token_bytes(32)
+    return hashlib.blake2b(secret.encode("utf-8"), digest_size=32).digest()
+
+
+def restore_pseudonyms(output):
+    """
+    Restore the original values in an LLM response when pseudonymization is enabled
+
+    Args:
+        output: Chain output
+
+    Returns:
+        The output with the original values (non-text outputs are returned as they are)
+    """
+    if not isinstance(output, str) or not is_pseudonymization_enabled():
+        return output
+    return get_pseudonym_map().restore(output)
@@ -0,0 +1,185 @@
+"""
+Analysis -> Design -> Automation pipeline
+Runs the three QA chains for one story with as much overlap as the data dependencies allow
+"""
+
+import asyncio
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from services.llm_chains import ainvoke_with_timeout, astream_chain
+from testrail_client import extract_test_case_info
+
+AUTOMATION_FRAMEWORKS = [
+    "Selenium + JDI Light + TestNG + Gradle",
+    "OpenAPI + OkHttp + JUnit + Gradle",
+    "k6 + TypeScript",
+    "Playwright + TypeScript"
+]
+
+# Heading of the risks section of the analysis output: task 3 of the user story analysis prompt
+# ("Impact & Risk Assessment", e.g. "### 3. Impact & Risk Assessment"), or an explicit "Quality Risks:"
+QUALITY_RISKS_HEADING = re.compile(
+    r'^[#>*_\s]*(?:\d+[.)]\s*)?[*_]*(?:Impact\s*(?:&|and)\s*Risk Assessment|Quality Risks)\b[^\n]{0,40}$',
+    re.IGNORECASE | re.MULTILINE
+)
+# Headings that follow the risks section (task 4 and later)
+QUALITY_RISKS_END_HEADING = re.compile(
+    r'^[#>*_\s]*(?:\d+[.)]\s*)?[*_]*(?:Focus Areas|Suggested Areas for Focus|Open Questions)\b[^\n]{0,40}$',
+    re.IGNORECASE | re.MULTILINE
+)
+
+
+def _find_quality_risks(analysis_output: str) -> Optional[Tuple[int, Optional[int]]]:
+    """Find the start and end (None while the next heading is missing) of the risks section body."""
+    heading = QUALITY_RISKS_HEADING.search(analysis_output)
+    if heading is None:
+        return None
+    end_heading = QUALITY_RISKS_END_HEADING.search(analysis_output, heading.end())
+    return heading.end(), end_heading.start() if end_heading else None
+
+
+def extract_quality_risks(analysis_output: str) -> str:
+    """
+    Extract the Quality Risks (Impact & Risk Assessment) section from a test analysis output
+
+    Args:
+        analysis_output: Full (or partial) output of the user story analysis chain
+
+    Returns:
+        The quality risks text (the whole output if the model left out the risks heading)
+    """
+    section = _find_quality_risks(analysis_output)
+    if section is None:
+        print("Test analysis output has no Impact & Risk Assessment heading; using the whole analysis as quality risks")
+        return analysis_output.strip()
+    start, end = section
+    return analysis_output[start:end].strip()
+
+
+def quality_risks_ready(partial_output: str) -> bool:
+    """Check whether a streamed analysis output already contains the complete Quality Risks section."""
+    section = _find_quality_risks(partial_output)
+    return section is not None and section[1] is not None
+
+
+def is_automation_candidate(case: Dict) -> bool:
+    """Check whether a generated test case is marked for automation."""
+    return case.get('automation', '').lower() in ['yes', 'true', 'y', '1']
+
+
+def format_test_cases_for_automation(automation_cases: List[Dict], framework_pref: str, additional_context: str) -> str:
+    """Format test cases for automation input."""
+    formatted_output = f"Framework: {framework_pref}\n"
+    if additional_context:
+        formatted_output += f"Additional Context: {additional_context}\n"
+    formatted_output += "\nTest Cases:\n"
+
+    for i, case in enumerate(automation_cases, 1):
+        formatted_output += f"\n--- Test Case {i} ---\n"
+        formatted_output += f"Title: {case.get('title', 'N/A')}\n"
+        formatted_output += f"Priority: {case.get('priority', 'N/A')}\n"
+        formatted_output += f"Tags: {case.get('tags', 'N/A')}\n"
+
+        # Preconditions
+        preconditions = case.get('preconditions', '')
+        if preconditions:
+            formatted_output += f"Preconditions: {preconditions}\n"
+
+        # Steps
+        steps = case.get('steps', [])
+        if steps:
+            formatted_output += "Steps:\n"
+            for j, step in enumerate(steps, 1):
+                if isinstance(step, dict):
+                    # Parsed test cases use content/expected; older callers used action/expected_result
+                    formatted_output += f"  {j}. Action: {step.get('action', step.get('content', 'N/A'))}\n"
+                    expected = step.get('expected_result') or step.get('expected')
+                    if expected:
+                        formatted_output += f"     Expected: {expected}\n"
+                else:
+                    formatted_output += f"  {j}. {step}\n"
+
+        formatted_output += "\n"
+
+    return formatted_output
+
+
+async def run_story_pipeline(analysis_chain, generation_chain, automation_chain,
+                             analysis_inputs: Dict[str, Any], framework_pref: str,
+                             additional_context: str = "", max_concurrency: int = 4,
+                             on_event: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+    """
+    Run test analysis, test case generation and automation prompt generation for one story.
+    Test case generation starts as soon as the streamed analysis contains its Quality Risks
+    section, and one automation prompt per automation candidate is generated concurrently.
+
+    Args:
+        analysis_chain: The user story analysis chain
+        generation_chain: The test case generation chain
+        automation_chain: The test automation chain
+        analysis_inputs: Inputs of the user story analysis chain
+        framework_pref: Automation framework for the generated prompts
+        additional_context: Optional automation context
+        max_concurrency: Maximum automation calls in flight at once
+        on_event: Optional callback(event_name, payload) for progress updates; events are
+                  analysis_chunk, risks_ready, analysis_done, test_cases_done and automation_done
+
+    Returns:
+        Dictionary with analysis_output, quality_risks, test_cases_output, test_cases and automation_outputs
+    """
+    def notify(event: str, payload: Any = None):
+        if on_event:
+            on_event(event, payload)
+
+    async def generate_test_cases(quality_risks: str) -> str:
+        return await ainvoke_with_timeout(generation_chain, {
+            "new_story_title": analysis_inputs["new_story_title"],
+            "new_story_description": analysis_inputs["new_story_description"],
+            "quality_risks": quality_risks
+        })
+
+    analysis_output = ""
+    quality_risks = None
+    generation_task = None
+    async for chunk in astream_chain(analysis_chain, analysis_inputs):
+        analysis_output += chunk
+        notify("analysis_chunk", analysis_output)
+        if generation_task is None and quality_risks_ready(analysis_output):
+            quality_risks = extract_quality_risks(analysis_output)
+            generation_task = asyncio.create_task(generate_test_cases(quality_risks))
+            notify("risks_ready", quality_risks)
+    notify("analysis_done", analysis_output)
+
+    if generation_task is None:
+        # The risks section never closed while streaming: use the complete analysis
+        quality_risks = extract_quality_risks(analysis_output)
+        generation_task = asyncio.create_task(generate_test_cases(quality_risks))
+        notify("risks_ready", quality_risks)
+
+    test_cases_output = await generation_task
+    test_cases = extract_test_case_info(test_cases_output)
+    notify("test_cases_done", test_cases)
+
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def automate(case: Dict) -> Dict[str, str]:
+        async with semaphore:
+            output = await ainvoke_with_timeout(automation_chain, {
+                "test_cases": format_test_cases_for_automation([case], framework_pref, additional_context),
+                "testing_framework": framework_pref,
+                "additional_context": additional_context
+            })
+        return {"title": case.get('title', 'N/A'), "output": output}
+
+    automation_outputs = await asyncio.gather(*[
+        automate(case) for case in test_cases if is_automation_candidate(case)
+    ])
+    notify("automation_done", automation_outputs)
+
+    return {
+        "analysis_output": analysis_output,
+        "quality_risks": quality_risks,
+        "test_cases_output": test_cases_output,
+        "test_cases": test_cases,
+        "automation_outputs": list(automation_outputs),
+    }
@@ -0,0 +1,453 @@
+"""
+Single-pass sanitization engine
+Applies an ordered list of regex rules (each with its replacement placeholder) in one scan of the
+text, with the same result as running the rules one after another, followed by fixed-string
+replacements.
+"""
+
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Matches one regex token to lower-case: escapes are kept as they are, so \S or \B keep their meaning
+_PATTERN_TOKEN = re.compile(r'\\.|[A-Z]', re.DOTALL)
+
+# The only characters that match an ASCII letter case-insensitively but do not lower-case to it
+_CASE_FOLDING_EXCEPTIONS = ('\u0130', '\u0131', '\u017f')
+
+
+def _lower_pattern(pattern: str) -> str:
+    return _PATTERN_TOKEN.sub(lambda token: token.group() if token.group().startswith('\\') else token.group().lower(), pattern)
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+
+class SanitizerEngine:
+    """
+    Replaces the matches of ordered (pattern, replacement, label) rules and then fixed strings.
+
+    Rules are merged into one alternation with an empty named group at the end of each rule to
+    tell which one matched (a group at the start would stop the regex engine from dispatching on
+    the first literal character of each rule). Rules starting with \\b come first and share a
+    single \\b test; when one of them matches, the other rules that take precedence over it are
+    tried at the same position. With IGNORECASE, text is scanned lower-cased with a case-sensitive
+    copy of the alternation, which is about twice as fast.
+
+    Running the rules one after another (the reference behaviour, see sanitize_sequential) differs
+    from a single scan when a rule matches inside the match of a later rule (e.g. "CM" inside
+    "client: Acme CM team"), or when a placeholder creates a word boundary next to the text
+    around it. The scan detects both: a match that contains earlier-rule matches is kept only if
+    the rule still matches the same text with those replaced (e.g. a Jira URL containing
+    "company"), otherwise the text goes through the sequential path.
+    """
+
+    def __init__(self, rules: Sequence[Tuple[str, str, str]], literals: Optional[Dict[str, str]] = None,
+                 flags: int = re.IGNORECASE, literal_label: str = "custom"):
+        """
+        Args:
+            rules: (pattern, replacement, label) triples, in the order they apply; the label
+                names the kind of data in the matches reported by sanitize_with_matches
+            literals: Fixed strings and their replacements, applied in order after the rules
+            flags: Regex flags of every rule
+            literal_label: Label of the fixed-string replacements
+        """
+        self.literals = dict(literals or {})
+        self.literal_label = literal_label
+        self._sequential_rules = [(re.compile(pattern, flags), replacement, label) for pattern, replacement, label in rules]
+
+        # Repeated patterns never match again once their first occurrence has been applied
+        unique_rules: List[Tuple[str, str, str]] = []
+        for rule in rules:
+            if rule[0] not in [seen[0] for seen in unique_rules]:
+                unique_rules.append(tuple(rule))
+        patterns = [pattern for pattern, _, _ in unique_rules]
+        self._rules = [re.compile(pattern, flags) for pattern in patterns]
+        self._replacements = [replacement for _, replacement, _ in unique_rules]
+        self._labels = [label for _, _, label in unique_rules]
+        self._word_rules = {index for index, pattern in enumerate(patterns) if self._starts_with_boundary(pattern)}
+        self._other_rules = [index for index in range(len(patterns)) if index not in self._word_rules]
+
+        self._scanner = re.compile(self._build_alternation(patterns), flags)
+        self._lowered_scanner = None
+        if flags & re.IGNORECASE:
+            lowered = [_lower_pattern(pattern) for pattern in patterns]
+            self._lowered_rules = [re.compile(pattern, flags & ~re.IGNORECASE) for pattern in lowered]
+            self._lowered_scanner = re.compile(self._build_alternation(lowered), flags & ~re.IGNORECASE)
+
+        # The scan assumes a placeholder is never matched by a rule (true for "[EMAIL]"-style placeholders)
+        self.single_pass = not any(rule.search(replacement) for rule in self._rules for replacement in self._replacements)
+
+    @staticmethod
+    def _starts_with_boundary(pattern: str) -> bool:
+        return pattern.startswith(r'\b') and '|' not in pattern
+
+    def _build_alternation(self, patterns: List[str]) -> str:
+        word_branches = [f"(?:{patterns[index][2:]})(?P<r{index}>)" for index in sorted(self._word_rules)]
+        branches = [r'\b(?:' + '|'.join(word_branches) + ')'] if word_branches else []
+        branches += [f"(?:{patterns[index]})(?P<r{index}>)" for index in self._other_rules]
+        return '|'.join(branches)
+
+    def _resolve(self, match: re.Match, rules: List[re.Pattern]) -> Tuple[int, int, int]:
+        """
+        Get the rule that takes precedence at the position of a scanner match
+
+        Args:
+            match: Scanner match
+            rules: Compiled rules for the scanned text (lower-cased or not)
+
+        Returns:
+            Tuple of (start, end, rule index)
+        """
+        start = match.start()
+        rule_index = int(match.lastgroup[1:])
+        if rule_index in self._word_rules:
+            for other_index in self._other_rules:
+                if other_index > rule_index:
+                    break
+                other_match = rules[other_index].match(match.string, start)
+                if other_match:
+                    return start, other_match.end(), other_index
+        return start, match.end(), rule_index
+
+    def sanitize(self, text: str) -> str:
+        """
+        Apply the rules and fixed-string replacements to a text
+
+        Args:
+            text: Text to sanitize
+
+        Returns:
+            Sanitized text (the same as sanitize_sequential)
+        """
+        sanitized = self.scan(text)
+        if sanitized is None:
+            return self.sanitize_sequential(text)
+        return sanitized
+
+    def scan(self, text: str) -> Optional[str]:
+        """
+        Sanitize a text in a single scan
+
+        Args:
+            text: Text to sanitize
+
+        Returns:
+            Sanitized text, or None when the rules interact in this text and only
+            sanitize_sequential gives the reference result
+        """
+        matches = self._scan_matches(text)
+        if matches is None:
+            return None
+        parts = []
+        position = 0
+        for start, end, rule_index in matches:
+            parts.append(text[position:start])
+            parts.append(self._replacements[rule_index])
+            position = end
+        parts.append(text[position:])
+        return self._replace_literals(''.join(parts))
+
+    def _scan_matches(self, text: str) -> Optional[List[Tuple[int, int, int]]]:
+        """
+        Find the rule matches to replace in a single scan
+
+        Args:
+            text: Text to sanitize
+
+        Returns:
+            (start, end, rule index) of every match, in order, or None when the text needs the sequential path
+        """
+        if not self.single_pass:
+            return None
+        if self._lowered_scanner is not None and not any(char in text for char in _CASE_FOLDING_EXCEPTIONS):
+            scanner, rules, scanned = self._lowered_scanner, self._lowered_rules, text.lower()
+        else:
+            scanner, rules, scanned = self._scanner, self._rules, text
+
+        matches = []
+        match = scanner.search(scanned)
+        while match:
+            start, end, rule_index = self._resolve(match, rules)
+
+            # Matches of any rule starting inside this one; the first one after it is the next match
+            inner = []
+            following = scanner.search(scanned, start + 1)
+            while following and following.start() < end:
+                inner.append(self._resolve(following, rules))
+                following = scanner.search(scanned, following.start() + 1)
+            if inner and not self._absorbs(text, start, end, rule_index, inner):
+                return None
+
+            if (start > 0 and _is_word_char(text[start - 1]) and _is_word_char(text[start])) or \
+                    (end < len(text) and _is_word_char(text[end - 1]) and _is_word_char(text[end])):
+                return None
+
+            matches.append((start, end, rule_index))
+            match = following
+        return matches
+
+    def _absorbs(self, text: str, start: int, end: int, rule_index: int, inner: List[Tuple[int, int, int]]) -> bool:
+        """
+        Check that a match is unchanged when the earlier rules matching inside it are applied first
+
+        Args:
+            text: Original text
+            start: Start of the match
+            end: End of the match
+            rule_index: Rule that matched
+            inner: (start, end, rule index) of the matches starting inside it
+
+        Returns:
+            True if the whole match is replaced either way
+        """
+        pieces = []
+        previous_end = start
+        for inner_start, inner_end, inner_index in inner:
+            if inner_index >= rule_index:
+                # Rules from this one on run after this match is replaced, so they cannot match inside it
+                continue
+            if inner_start < previous_end or inner_end > end:
+                return False
+            pieces.append(text[previous_end:inner_start])
+            pieces.append(self._replacements[inner_index])
+            previous_end = inner_end
+        if not pieces:
+            return True
+        pieces.append(text[previous_end:end])
+        replaced = ''.join(pieces)
+        rematch = self._rules[rule_index].match(text[:start] + replaced + text[end:], start)
+        return rematch is not None and rematch.end() == start + len(replaced)
+
+    def sanitize_sequential(self, text: str) -> str:
+        """
+        Apply the rules one after another, each to the output of the previous one (reference behaviour)
+
+        Args:
+            text: Text to sanitize
+
+        Returns:
+            Sanitized text
+        """
+        for rule, replacement, _ in self._sequential_rules:
+            text = rule.sub(replacement, text)
+        return self._replace_literals(text)
+
+    def sanitize_with_matches(self, text: str) -> Tuple[str, List[Tuple[int, int, str, str]]]:
+        """
+        Sanitize a text and report what was replaced, from the same scan
+
+        Args:
+            text: Text to sanitize
+
+        Returns:
+            Tuple of (sanitized text, matches), where matches are the (start, end, label, replacement)
+            of every placeholder in the sanitized text, with start and end in the original text and
+            in order. Replacing text[start:end] with each replacement gives the sanitized text; when
+            a replacement was partly replaced again (e.g. "company" inside a Jira URL), the match
+            covers both and has the label of the outer one.
+        """
+        matches = self._scan_matches(text)
+        if matches is not None:
+            sanitized, spans = _apply_matches(text, [], [
+                (start, end, self._labels[rule_index], self._replacements[rule_index])
+                for start, end, rule_index in matches
+            ])
+        else:
+            sanitized, spans = text, []
+            for rule, replacement, label in self._sequential_rules:
+                sanitized, spans = _apply_matches(sanitized, spans, [
+                    (match.start(), match.end(), label, replacement) for match in rule.finditer(sanitized)
+                ])
+        for original, replacement in self.literals.items():
+            sanitized, spans = _apply_matches(sanitized, spans, [
+                (start, start + len(original), self.literal_label, replacement)
+                for start in _find_all(sanitized, original)
+            ])
+        return sanitized, [(span[2], span[3], span[4], span[5]) for span in spans]
+
+    def sanitize_stream(self, chunks: Iterable[str], window_chars: int = 65536,
+                        overlap_chars: int = 4096) -> Iterator[str]:
+        """
+        Sanitize text arriving in chunks, yielding the sanitized text window by window
+
+        Args:
+            chunks: Pieces of the text, in order
+            window_chars: Text sanitized and yielded at a time (about)
+            overlap_chars: Text past each window scanned with it, so matches crossing the window end are found
+
+        Yields:
+            Sanitized pieces; joined, the same text as sanitize() of the whole text
+            under the condition given in iter_windows
+        """
+        for window, matches in self.iter_windows(chunks, window_chars, overlap_chars):
+            yield replace_matches(window, matches)
+
+    def iter_windows(self, chunks: Iterable[str], window_chars: int = 65536,
+                     overlap_chars: int = 4096) -> Iterator[Tuple[str, List[Tuple[int, int, str, str]]]]:
+        """
+        Split streamed text into windows that sanitize as they do in the whole text
+
+        Each window and the overlap after it are scanned together. The window is then cut back to
+        whitespace outside every match, so no match or word boundary crosses the cut, and the rest
+        is scanned again with the next window. Only the current window is kept in memory; a stretch
+        with no whitespace (e.g. an encoded blob) is kept until whitespace follows it.
+
+        The windows sanitize as the whole text when every match is shorter than overlap_chars, or
+        runs on to the end of the scanned text (an open-ended run such as a URL, which is moved to
+        the next window whole). A longer match whose start alone does not match (e.g. an unbounded
+        r'client\s*:' with a long whitespace gap) can be missed, so bound such gaps in the rules.
+
+        Args:
+            chunks: Pieces of the text, in order
+            window_chars: Text per window (about)
+            overlap_chars: Text past each window scanned with it
+
+        Yields:
+            Tuples of (original window text, matches in it as returned by sanitize_with_matches)
+        """
+        buffer = ""
+        position = 0
+        scan_chars = window_chars + overlap_chars
+        for chunk in chunks:
+            buffer = buffer[position:] + chunk
+            position = 0
+            while len(buffer) - position >= scan_chars:
+                scanned = buffer[position:position + scan_chars]
+                _, matches = self.sanitize_with_matches(scanned)
+                cut = _safe_cut(scanned, matches, len(scanned) - overlap_chars)
+                if not cut:
+                    # No whitespace outside a match: scan a longer stretch once more text arrives
+                    scan_chars += window_chars
+                    break
+                yield scanned[:cut], [match for match in matches if match[1] <= cut]
+                position += cut
+                scan_chars = window_chars + overlap_chars
+        rest = buffer[position:]
+        if rest:
+            yield rest, self.sanitize_with_matches(rest)[1]
+
+    def _replace_literals(self, text: str) -> str:
+        # str.replace scans at C speed; chained in order because the order matters ("TST-" with ST- and TS)
+        for original, replacement in self.literals.items():
+            text = text.replace(original, replacement)
+        return text
+
+
+def _find_all(text: str, literal: str) -> List[int]:
+    """Get the starts of the occurrences of a string that str.replace replaces (left to right, not overlapping)."""
+    starts = []
+    start = text.find(literal)
+    while start != -1:
+        starts.append(start)
+        start = text.find(literal, start + len(literal))
+    return starts
+
+
+def _safe_cut(text: str, matches: List[Tuple[int, int, str, str]], cut: int) -> int:
+    """
+    Move a cut back until it follows whitespace and is outside every match
+
+    Args:
+        text: Scanned text
+        matches: (start, end, label, replacement) of the matches in it, in order
+        cut: Preferred cut position
+
+    Returns:
+        The cut position, or 0 if there is none
+    """
+    while cut > 0:
+        crossing = [start for start, end, _, _ in matches if start < cut < end]
+        if crossing:
+            cut = crossing[0]
+        elif text[cut - 1].isspace():
+            return cut
+        else:
+            cut = max(text.rfind(space, 0, cut) for space in ' \n\t\r') + 1
+    return 0
+
+
+def replace_matches(text: str, matches: List[Tuple[int, int, str, str]]) -> str:
+    """
+    Replace matches in a text
+
+    Args:
+        text: Original text
+        matches: (start, end, label, replacement) of the matches, in order (see SanitizerEngine.sanitize_with_matches)
+
+    Returns:
+        Text with every match replaced
+    """
+    parts = []
+    position = 0
+    for start, end, _, replacement in matches:
+        parts.append(text[position:start])
+        parts.append(replacement)
+        position = end
+    parts.append(text[position:])
+    return ''.join(parts)
+
+
+def _apply_matches(text: str, spans: List[Tuple[int, int, int, int, str, str]],
+                   matches: List[Tuple[int, int, str, str]]) -> Tuple[str, List[Tuple[int, int, int, int, str, str]]]:
+    """
+    Replace matches in a partly sanitized text and keep track of where every placeholder comes from
+
+    Args:
+        text: Text after the previous replacements
+        spans: (start, end, original start, original end, label, replacement) of the placeholders
+            already in the text, in order
+        matches: (start, end, label, replacement) of the non-overlapping matches to replace in the text, in order
+
+    Returns:
+        Tuple of (new text, spans of the placeholders in it); a match overlapping earlier
+        placeholders takes them over, with the text between them
+    """
+    parts = []
+    new_spans = []
+    position = 0
+    index = 0
+    shift = 0  # Position in the text minus position in the original text, before spans[index]
+    growth = 0  # Position in the new text minus position in the text, after the last match
+    for start, end, label, replacement in matches:
+        while index < len(spans) and spans[index][1] <= start:
+            span_start, span_end, original_start, original_end, span_label, span_replacement = spans[index]
+            new_spans.append((span_start + growth, span_end + growth, original_start, original_end,
+                              span_label, span_replacement))
+            shift += (span_end - span_start) - (original_end - original_start)
+            index += 1
+
+        # A match can start or end inside a placeholder; the part outside the match is kept with it
+        head = tail = ''
+        original_start = start - shift
+        if index < len(spans) and spans[index][0] < start:
+            head = text[spans[index][0]:start]
+            original_start = spans[index][2]
+        original_end = end - shift
+        while index < len(spans) and spans[index][0] < end:
+            span_start, span_end, _, span_original_end, _, _ = spans[index]
+            shift += (span_end - span_start) - (span_original_end - spans[index][2])
+            original_end = end - shift
+            if span_end > end:
+                tail = text[end:span_end]
+                original_end = span_original_end
+            index += 1
+
+        parts.append(text[position:start - len(head)])
+        placeholder = head + replacement + tail
+        new_start = start - len(head) + growth
+        new_spans.append((new_start, new_start + len(placeholder), original_start, original_end, label, placeholder))
+        parts.append(placeholder)
+        position = end + len(tail)
+        growth += len(replacement) - (end - start)
+
+    for span_start, span_end, original_start, original_end, span_label, span_replacement in spans[index:]:
+        new_spans.append((span_start + growth, span_end + growth, original_start, original_end,
+                          span_label, span_replacement))
+    parts.append(text[position:])
+    return ''.join(parts), new_spans
+
+
+def sanitize_chunk(engine: SanitizerEngine, texts: List[str]) -> List[str]:
+    """Sanitize a chunk of texts (runs in the batch worker processes, see DataSanitizer.sanitize_texts)."""
+    return [engine.sanitize(text) for text in texts]
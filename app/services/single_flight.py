@@ -0,0 +1,66 @@
+"""
+Single-flight request coalescing
+Concurrent identical requests share one in-flight call instead of each hitting the upstream API
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key.
+    The first caller (the leader) runs the function; callers arriving while it is
+    still running wait for the same result (or exception) instead of calling again.
+    Nothing is cached once the call finishes; that is left to the cache layers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self.stats = {"calls": 0, "coalesced": 0}
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        """
+        Run func once for all concurrent callers with the same key
+
+        Args:
+            key: Identifies identical requests (e.g. a hash of the chain name and inputs)
+            func: Zero-argument callable performing the request
+
+        Returns:
+            The result of func, shared by all callers that were waiting on it
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._in_flight[key] = future
+                self.stats["calls"] += 1
+            else:
+                self.stats["coalesced"] += 1
+
+        if not is_leader:
+            return future.result()
+
+        try:
+            result = func()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def in_flight_count(self) -> int:
+        """Get the number of requests currently in flight."""
+        with self._lock:
+            return len(self._in_flight)
+
+
+# Process-wide instance shared by all sessions
+single_flight = SingleFlight()
@@ -0,0 +1,292 @@
+"""
+Token budgeting for LLM chains
+Measures rendered prompt sizes, trims oversized inputs and logs token usage per call
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from config import get_token_budget_config, get_chain_token_budget
+from services.adf_parser import ADFParser, SECTION_TYPES
+
+# Default prompt budgets (input tokens) per chain run_name; override with LLM_TOKEN_BUDGET_<CHAIN>
+DEFAULT_CHAIN_BUDGETS = {
+    "user_story_analysis": 32000,
+    "test_case_generation": 16000,
+    "test_case_generation_json": 16000,
+    "test_automation": 24000,
+    "bug_improvement": 12000,
+    "user_story_review": 12000,
+    "enhancement_story_review": 12000,
+}
+
+# Inputs that may be shortened when a prompt is over budget, in the order they are trimmed
+TRUNCATABLE_FIELDS = {
+    "user_story_analysis": ["context_user_stories", "new_story_comments", "new_story_description"],
+    "test_case_generation": ["quality_risks", "new_story_description"],
+    "test_case_generation_json": ["quality_risks", "new_story_description"],
+    "test_automation": ["test_cases", "additional_context"],
+    "bug_improvement": ["bug_description"],
+    "user_story_review": ["user_story_description"],
+    "enhancement_story_review": ["user_story_description"],
+}
+
+TRUNCATION_POLICIES = ("truncate", "head_tail", "summarize", "none")
+
+# Story descriptions cut to their most relevant sections when over the description budget, before the
+# prompt is measured. Bug descriptions are left whole: the improved bug must keep its logs and tables
+DESCRIPTION_FIELDS = {
+    "user_story_analysis": ["new_story_description"],
+    "test_case_generation": ["new_story_description"],
+    "test_case_generation_json": ["new_story_description"],
+    "user_story_review": ["user_story_description"],
+    "enhancement_story_review": ["user_story_description"],
+}
+
+# Never shrink a field below this many tokens, so the model still sees some of it
+MIN_FIELD_TOKENS = 200
+
+# Lines kept per blank-line separated block by the summarize policy (Key and Title of a context story)
+SUMMARY_LINES_PER_BLOCK = 2
+
+
+class TokenBudget:
+    """
+    Keeps the rendered prompt of every chain within a configurable token budget.
+    Token counts are estimated from character length, which avoids a network round trip
+    to the model's count_tokens endpoint on every call.
+    """
+
+    def __init__(self):
+        config = get_token_budget_config()
+        self.policy = config['policy'] if config['policy'] in TRUNCATION_POLICIES else "head_tail"
+        self.chars_per_token = config['chars_per_token'] or 4.0
+        self.description_budget = config['description_budget']
+        self.prompts = {}
+        self.usage = {}
+        self._lock = threading.Lock()
+
+    def estimate_tokens(self, text: Any) -> int:
+        """
+        Estimate the number of tokens in a text
+
+        Args:
+            text: Text (or any object, converted with str)
+
+        Returns:
+            Estimated token count
+        """
+        if not text:
+            return 0
+        if not isinstance(text, str):
+            text = str(text)
+        return int(len(text) / self.chars_per_token) + 1
+
+    def register_prompt(self, chain_name: str, prompt) -> None:
+        """Register the prompt template of a chain so its rendered size can be measured."""
+        self.prompts[chain_name] = prompt
+
+    def get_budget(self, chain_name: str) -> int:
+        """Get the prompt token budget for a chain."""
+        return get_chain_token_budget(chain_name, DEFAULT_CHAIN_BUDGETS.get(chain_name))
+
+    def measure_prompt(self, chain_name: str, inputs: Dict[str, Any]) -> int:
+        """
+        Measure the rendered prompt of a chain for the given inputs
+
+        Args:
+            chain_name: The chain run_name
+            inputs: Input parameters for the chain
+
+        Returns:
+            Estimated prompt tokens (system context, template and inputs)
+        """
+        prompt = self.prompts.get(chain_name)
+        if prompt is not None:
+            try:
+                messages = prompt.format_messages(**inputs)
+                return sum(self.estimate_tokens(message.content) for message in messages)
+            except Exception:
+                # Missing or unexpected inputs: fall back to measuring the inputs alone
+                pass
+        return sum(self.estimate_tokens(value) for value in inputs.values())
+
+    def apply_budget(self, chain_name: str, inputs: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+        """
+        Trim the truncatable inputs of a chain until its rendered prompt fits the budget
+
+        Args:
+            chain_name: The chain run_name
+            inputs: Input parameters for the chain
+
+        Returns:
+            Tuple of (inputs to send, estimated prompt tokens)
+        """
+        inputs = self._select_description_sections(chain_name, inputs)
+        prompt_tokens = self.measure_prompt(chain_name, inputs)
+        budget = self.get_budget(chain_name)
+        if prompt_tokens <= budget or self.policy == "none":
+            return inputs, prompt_tokens
+
+        trimmed = dict(inputs)
+        excess = prompt_tokens - budget
+        for field in TRUNCATABLE_FIELDS.get(chain_name, []):
+            if excess <= 0:
+                break
+            value = trimmed.get(field)
+            if not isinstance(value, str):
+                continue
+            field_tokens = self.estimate_tokens(value)
+            target_tokens = max(MIN_FIELD_TOKENS, field_tokens - excess)
+            if target_tokens >= field_tokens:
+                continue
+            trimmed[field] = self.shrink_text(value, target_tokens)
+            excess -= field_tokens - self.estimate_tokens(trimmed[field])
+
+        new_prompt_tokens = self.measure_prompt(chain_name, trimmed)
+        print(f"Token budget: {chain_name} prompt {prompt_tokens} -> {new_prompt_tokens} tokens "
+              f"(budget {budget}, policy {self.policy})")
+        return trimmed, new_prompt_tokens
+
+    def _select_description_sections(self, chain_name: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Cut the story descriptions of a chain's inputs that are over the description budget to their most relevant sections."""
+        if not self.description_budget:
+            return inputs
+        selected = inputs
+        for field in DESCRIPTION_FIELDS.get(chain_name, []):
+            value = inputs.get(field)
+            if not isinstance(value, str) or self.estimate_tokens(value) <= self.description_budget:
+                continue
+            if selected is inputs:
+                selected = dict(inputs)
+            selected[field] = self.select_sections(value, self.description_budget)
+            print(f"Token budget: {chain_name} {field} {self.estimate_tokens(value)} -> "
+                  f"{self.estimate_tokens(selected[field])} tokens (sections)")
+        return selected
+
+    def select_sections(self, text: str, target_tokens: int) -> str:
+        """
+        Keep the most relevant sections of a description within roughly the target number of tokens
+
+        Sections are kept by relevance (acceptance criteria, headings, text, lists, tables, then code
+        blocks and pasted logs) and in document order within a type. The first section that does not
+        fit is shortened into the remaining budget if that leaves it at least MIN_FIELD_TOKENS.
+
+        Args:
+            text: Plain text of a description (see ADFParser.split_sections)
+            target_tokens: Desired size in tokens
+
+        Returns:
+            The kept sections in document order, with a marker where sections were omitted
+        """
+        max_chars = int(target_tokens * self.chars_per_token)
+        if len(text) <= max_chars:
+            return text
+
+        sections = ADFParser.split_sections(text)
+        kept: Dict[int, str] = {}
+        remaining = max_chars
+        order = sorted(range(len(sections)), key=lambda index: (SECTION_TYPES.index(sections[index]['type']), index))
+        for index in order:
+            section = sections[index]
+            if section['size'] + 1 <= remaining:
+                kept[index] = section['text']
+                remaining -= section['size'] + 1
+            elif remaining >= MIN_FIELD_TOKENS * self.chars_per_token:
+                kept[index] = self.shrink_text(section['text'], int(remaining / self.chars_per_token))
+                remaining = 0
+
+        # Runs of omitted sections become one marker naming what was left out
+        parts: List[str] = []
+        omitted: List[Dict[str, Any]] = []
+        for index, section in enumerate(sections + [None]):
+            if section is not None and index not in kept:
+                omitted.append(section)
+                continue
+            if omitted:
+                types = ", ".join(dict.fromkeys(omitted_section['type'] for omitted_section in omitted))
+                tokens = sum(self.estimate_tokens(omitted_section['text']) for omitted_section in omitted)
+                parts.append(f"...[{len(omitted)} sections omitted ({types}), {tokens} tokens]...")
+                omitted = []
+            if section is not None:
+                parts.append(kept[index])
+        return "\n".join(parts)
+
+    def shrink_text(self, text: str, target_tokens: int, policy: Optional[str] = None) -> str:
+        """
+        Shrink a text to roughly the target number of tokens
+
+        Args:
+            text: The text to shrink
+            target_tokens: Desired size in tokens
+            policy: truncate (keep the start), head_tail (keep start and end) or
+                    summarize (keep the first lines of every block); defaults to the configured policy
+
+        Returns:
+            Shortened text with a marker showing how much was removed
+        """
+        policy = policy or self.policy
+        max_chars = int(target_tokens * self.chars_per_token)
+        if len(text) <= max_chars:
+            return text
+
+        removed_tokens = self.estimate_tokens(text) - target_tokens
+        marker = f"\n...[{removed_tokens} tokens omitted]...\n"
+
+        if policy == "summarize":
+            summary = self._summarize_blocks(text)
+            if len(summary) <= max_chars:
+                return summary
+            text = summary
+
+        if policy == "head_tail":
+            head_chars = max_chars * 2 // 3
+            tail_chars = max_chars - head_chars
+            return text[:head_chars] + marker + text[-tail_chars:]
+
+        return text[:max_chars] + marker
+
+    @staticmethod
+    def _summarize_blocks(text: str) -> str:
+        """Keep only the first lines of every blank-line separated block (e.g. key and title of each story)."""
+        summarized: List[str] = []
+        for block in text.split("\n\n"):
+            lines = block.strip().split("\n")[:SUMMARY_LINES_PER_BLOCK]
+            if lines and lines[0]:
+                summarized.append("\n".join(lines))
+        return "\n\n".join(summarized)
+
+    def record_usage(self, chain_name: str, input_tokens: int, output_tokens: int, elapsed_seconds: float) -> None:
+        """
+        Log and accumulate token usage for a chain call
+
+        Args:
+            chain_name: The chain run_name
+            input_tokens: Estimated prompt tokens sent
+            output_tokens: Estimated tokens received
+            elapsed_seconds: Call duration
+        """
+        print(f"LLM call {chain_name}: input={input_tokens} tokens, output={output_tokens} tokens, "
+              f"{elapsed_seconds:.1f}s")
+        with self._lock:
+            stats = self.usage.setdefault(chain_name, {
+                "calls": 0, "input_tokens": 0, "output_tokens": 0, "seconds": 0.0
+            })
+            stats["calls"] += 1
+            stats["input_tokens"] += input_tokens
+            stats["output_tokens"] += output_tokens
+            stats["seconds"] += elapsed_seconds
+
+    def get_usage_summary(self) -> Dict[str, Dict[str, Any]]:
+        """Get accumulated token usage per chain."""
+        with self._lock:
+            return {name: dict(stats) for name, stats in self.usage.items()}
+
+
+# Process-wide instance shared by all chains
+token_budget = TokenBudget()
+
+
+def get_chain_name(chain) -> str:
+    """Get the run_name a chain was configured with in setup_llm_chains."""
+    config = getattr(chain, 'config', None) or {}
+    return config.get('run_name', 'unknown_chain')
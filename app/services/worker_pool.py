@@ -0,0 +1,51 @@
+"""
+Worker processes for CPU-bound batch jobs
+Sanitizing and converting large Jira batches run in a process-wide pool, in chunks of about the
+same size so one long description does not hold up a worker.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Sequence, TypeVar
+import streamlit as st
+
+# Batches are split into about this many chunks per worker, to even out the load
+CHUNKS_PER_WORKER = 4
+
+T = TypeVar("T")
+
+
+@st.cache_resource
+def get_worker_pool(workers: int) -> ProcessPoolExecutor:
+    """Create the process-wide pool of batch workers (shared by all sessions)."""
+    return ProcessPoolExecutor(max_workers=workers)
+
+
+def get_worker_count(configured: int) -> int:
+    """Get the number of worker processes for a setting where 0 means one per CPU."""
+    return configured or os.cpu_count() or 1
+
+
+def split_by_size(items: Sequence[T], sizes: Sequence[int], workers: int) -> List[List[T]]:
+    """
+    Split a batch into chunks of about the same total size, keeping the order
+
+    Args:
+        items: Items of the batch
+        sizes: Size of each item (e.g. characters of text)
+        workers: Worker processes the chunks are spread over
+
+    Returns:
+        Chunks of consecutive items
+    """
+    chunk_size = sum(sizes) / (workers * CHUNKS_PER_WORKER)
+    chunks, chunk, size = [], [], 0
+    for item, item_size in zip(items, sizes):
+        chunk.append(item)
+        size += item_size
+        if size >= chunk_size:
+            chunks.append(chunk)
+            chunk, size = [], 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
@@ -4,6 +4,8 @@ from typing import List, Dict, Optional, Tuple
 import re
 import requests
 import json
+from services.cache_manager import CacheManager, loading_spinner
+from services.fingerprint import FingerprintedList
 
 # Try to import TestRailAPI, with fallback handling
 try:
@@ -24,6 +26,8 @@ except AttributeError as e:
 class TestRailClient:
     def __init__(self):
         self.client = None
+        self.url = None
+        self.username = None
         self._connect()
     
     @st.cache_data(ttl=3600, show_spinner="Connecting to TestRail...") # Cache connection for 1 hour
@@ -76,6 +80,9 @@ class TestRailClient:
             st.warning("⚠️ TestRail credentials not found in environment variables. Please add TESTRAIL_URL, TESTRAIL_USERNAME, and TESTRAIL_PASSWORD to your .env file.")
             return
         
+        self.url = testrail_url
+        self.username = testrail_username
+        
         # Use cached connection
         result = self._cached_connect(testrail_url, testrail_username, testrail_password)
         self.client, status, message = result
@@ -118,22 +125,44 @@ class TestRailClient:
             st.error("• Try updating the testrail-api package: `pip install --upgrade testrail-api`")
             st.error("• Verify your TestRail instance is accessible from this environment")
     
-    @st.cache_data(ttl=1800, show_spinner="Fetching test cases from TestRail...")  # Cache for 30 minutes
-    def _cached_get_all_test_cases(_self, project_id: int = None) -> List[Dict]:
-        """Cached version of test cases retrieval. Cache for 30 minutes."""
-        if not _self.client:
+    @property
+    def instance(self) -> str:
+        """TestRail server and user the cached data comes from."""
+        return f"{self.username}@{self.url}"
+
+    def _cached_get_all_test_cases(self, project_id: int = None, raise_errors: bool = False) -> List[Dict]:
+        """
+        Cached version of test cases retrieval. Kept in the tiered cache for 30 minutes.
+        Concurrent cache misses for the same project share one paginated fetch;
+        failed fetches are not cached, and return [] unless raise_errors is set.
+        """
+        if not self.client:
+            if raise_errors:
+                raise ConnectionError("TestRail connection failed")
             return []
         
         try:
-            if project_id:
-                all_cases = []
-                offset = 0
-                limit = 250  # TestRail default page size
-                
+            return CacheManager.cache_testrail_cases(
+                project_id, lambda: self._fetch_all_test_cases(project_id), self.instance
+            )
+        except Exception as e:
+            if raise_errors:
+                raise
+            st.error(f"❌ Error retrieving test cases from TestRail: {str(e)}")
+            return []
+
+    def _fetch_all_test_cases(self, project_id: int = None) -> List[Dict]:
+        """Retrieve all test cases of a project (or of every project) page by page."""
+        if project_id:
+            all_cases = []
+            offset = 0
+            limit = 250  # TestRail default page size
+            
+            with loading_spinner("Fetching test cases from TestRail..."):
                 while True:
                     # Get cases with pagination parameters
-                    response = _self.client.cases.get_cases(project_id, limit=limit, offset=offset)
-                    cases = _self._parse_testrail_response(response)
+                    response = self.client.cases.get_cases(project_id, limit=limit, offset=offset)
+                    cases = self._parse_testrail_response(response)
                     
                     if not cases:
                         break
@@ -145,27 +174,50 @@ class TestRailClient:
                         break
                     
                     offset += limit
-                
-                st.info(f"🔍 Retrieved {len(all_cases)} test cases from TestRail project {project_id} across all pages")
-                return all_cases
-            else:
-                # Get all projects first, then get cases from each
-                projects = _self.client.projects.get_projects()
-                all_cases = []
-                
-                for project in projects:
-                    project_cases = _self._cached_get_all_test_cases(project["id"])
-                    all_cases.extend(project_cases)
-                
-                return all_cases
             
+            print(f"Retrieved {len(all_cases)} test cases from TestRail project {project_id} across all pages")
+            return FingerprintedList(all_cases)
+        else:
+            # Get all projects first, then get cases from each
+            projects = self.client.projects.get_projects()
+            all_cases = []
+            
+            for project in projects:
+                # A failed project fails the whole fetch, so a partial list is never cached
+                project_cases = self._cached_get_all_test_cases(project["id"], raise_errors=True)
+                all_cases.extend(project_cases)
+            
+            return FingerprintedList(all_cases)
+
+    def get_all_test_cases(self, project_id: int = None, raise_errors: bool = False) -> List[Dict]:
+        """
+        Retrieve all test cases from TestRail with pagination support.
+        On failure [] is returned, or the error is raised if raise_errors is set (e.g. by the cache warmer).
+        """
+        return self._cached_get_all_test_cases(project_id, raise_errors)
+
+    def get_prepared_cases(self, project_id: int = None, raise_errors: bool = False) -> List[Tuple[Dict, str, str]]:
+        """
+        Get the similarity index of a project's test cases (see prepare_existing_cases).
+        The index is cached next to the test cases, so it is built once per refresh;
+        it is not built (or cached) when the test cases cannot be fetched.
+        On failure [] is returned, or the error is raised if raise_errors is set.
+        """
+        if not self.client:
+            if raise_errors:
+                raise ConnectionError("TestRail connection failed")
+            return []
+        
+        try:
+            return CacheManager.cache_testrail_index(
+                project_id, lambda: prepare_existing_cases(self.get_all_test_cases(project_id, raise_errors=True)),
+                self.instance
+            )
         except Exception as e:
-            st.error(f"❌ Error retrieving test cases from TestRail: {str(e)}")
+            if raise_errors:
+                raise
+            st.error(f"❌ Error preparing TestRail test cases for matching: {str(e)}")
             return []
-
-    def get_all_test_cases(self, project_id: int = None) -> List[Dict]:
-        """Retrieve all test cases from TestRail with pagination support."""
-        return self._cached_get_all_test_cases(project_id)
     
     def _parse_testrail_response(self, response) -> List[Dict]:
         """Parse TestRail API response to extract test cases."""
@@ -269,15 +321,15 @@ class TestRailClient:
             st.error(f"❌ Error updating test case {case_id}: {str(e)}")
             return None
     
-    @st.cache_data(ttl=3600, show_spinner="Fetching sections from TestRail...")  # Cache for 1 hour
-    def _cached_get_sections(_self, project_id: int) -> List[Dict]:
-        """Cached version of sections retrieval. Cache for 1 hour."""
-        if not _self.client:
+    def _cached_get_sections(self, project_id: int) -> List[Dict]:
+        """Cached version of sections retrieval. Kept in the tiered cache for 1 hour."""
+        if not self.client:
             return []
         
         try:
-            sections = _self.client.sections.get_sections(project_id)
-            return sections
+            return CacheManager.cache_testrail_sections(
+                project_id, lambda: self.client.sections.get_sections(project_id), self.instance
+            )
         except Exception as e:
             st.error(f"❌ Error retrieving sections: {str(e)}")
             return []
@@ -302,252 +354,545 @@ class TestRailClient:
             st.error(f"❌ Error creating section: {str(e)}")
             return None
 
-def extract_test_case_info(text: str) -> List[Dict]:
-    """Extract test case information from AI-generated text."""
+# Allowed values of the structured test case schema (prompts/test_case_generation_json.py)
+TEST_CASE_PRIORITIES = ('Critical', 'High', 'Medium', 'Low')
+
+def _as_text(value, separator: str = ', ') -> str:
+    """Convert a schema field that may be a string, list or scalar to text."""
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return separator.join(str(item).strip() for item in value if str(item).strip())
+    return str(value).strip()
+
+def _validate_structured_test_case(item) -> Optional[Dict]:
+    """
+    Validate one test case object from the structured JSON output and convert it to the
+    dictionary format produced by extract_test_case_info. Returns None if the item is invalid.
+    """
+    if not isinstance(item, dict):
+        return None
+    
+    title = _as_text(item.get('title'))
+    raw_steps = item.get('steps')
+    if not title or not isinstance(raw_steps, list):
+        return None
+    
+    steps = []
+    for step in raw_steps:
+        if isinstance(step, dict):
+            content = _as_text(step.get('action', step.get('content')))
+            expected = _as_text(step.get('expected', step.get('expected_result')))
+        else:
+            content, expected = _as_text(step), ''
+        if content:
+            steps.append({'content': content, 'expected': expected})
+    
+    priority = _as_text(item.get('priority')).capitalize()
+    if priority not in TEST_CASE_PRIORITIES:
+        priority = 'Medium'
+    
+    automation = item.get('automation', 'No')
+    if isinstance(automation, bool):
+        automation = 'Yes' if automation else 'No'
+    
+    return {
+        'title': title,
+        'steps': steps if steps else [{'content': 'Test case steps not found', 'expected': ''}],
+        'preconditions': _as_text(item.get('preconditions'), separator='\n'),
+        'expected_results': '',
+        'automation': _as_text(automation) or 'No',
+        'priority': priority,
+        'tags': _as_text(item.get('tags')),
+        'scenario_id': _as_text(item.get('scenario_id'))
+    }
+
+def parse_structured_test_cases(text: str) -> Optional[List[Dict]]:
+    """
+    Parse the JSON output of the structured test case generation chain in a single pass.
+    
+    Args:
+        text: Model output, a JSON object with a test_cases list (markdown fences are tolerated)
+    
+    Returns:
+        List of test case dictionaries in the extract_test_case_info format,
+        or None if the output is not valid JSON or has no valid test case
+    """
+    if not text:
+        return None
+    
+    # Tolerate ```json fences or stray text around the JSON document
+    start = text.find('{')
+    end = text.rfind('}')
+    if start == -1 or end < start:
+        return None
+    
+    try:
+        document = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+    
+    raw_cases = document.get('test_cases') if isinstance(document, dict) else None
+    if not isinstance(raw_cases, list):
+        return None
+    
     test_cases = []
-    format_detected = "None"
+    for item in raw_cases:
+        test_case = _validate_structured_test_case(item)
+        if test_case:
+            test_cases.append(test_case)
     
-    # First, try to extract from the new plain text TC-### format
-    tc_pattern = r'TC-\d+\s*-\s*(.+?)(?=\n|$)'
-    tc_matches = list(re.finditer(tc_pattern, text, re.IGNORECASE | re.DOTALL))
+    skipped = len(raw_cases) - len(test_cases)
+    if skipped:
+        print(f"Skipped {skipped} structured test cases that did not match the schema")
     
-    if tc_matches:
-        format_detected = "Plain text TC-### format"
-        st.info(f"🔍 Detected {len(tc_matches)} test cases in plain text format")
+    return test_cases or None
+
+def format_structured_test_cases(text: str) -> str:
+    """
+    Render the JSON output of the structured test case generation chain as markdown for display.
+    Falls back to the raw text when it is not valid JSON.
+    """
+    start = text.find('{')
+    end = text.rfind('}')
+    try:
+        document = json.loads(text[start:end + 1]) if start != -1 and end > start else None
+    except json.JSONDecodeError:
+        document = None
+    if not isinstance(document, dict):
+        return text
+    
+    lines = []
+    traceability = document.get('traceability') or []
+    if traceability:
+        lines += ["TRACEABILITY MATRIX", "", "| Requirement/AC | Scenario ID(s) |", "|----------------|----------------|"]
+        for row in traceability:
+            if isinstance(row, dict):
+                lines.append(f"| {_as_text(row.get('requirement'))} | {_as_text(row.get('scenario_ids'))} |")
+        lines.append("")
+    
+    lines += ["DETAILED TEST CASES", ""]
+    for index, item in enumerate(document.get('test_cases') or [], 1):
+        test_case = _validate_structured_test_case(item)
+        if not test_case:
+            continue
+        case_id = _as_text(item.get('id')) or f"TC-{index:03d}"
+        lines.append(f"## {case_id} - {test_case['title']}")
+        lines.append(f"- Scenario ID: {test_case['scenario_id']}")
+        lines.append(f"- Priority: {test_case['priority']}")
+        lines.append(f"- Automation: {test_case['automation']}")
+        lines.append(f"- Tags: {test_case['tags']}")
+        lines += ["", "- Preconditions:", test_case['preconditions'], "", "- Test Steps:"]
+        for step_number, step in enumerate(test_case['steps'], 1):
+            lines.append(f"{step_number}. {step['content']}")
+            if step['expected']:
+                lines.append(f"   - Expected: {step['expected']}")
+        lines.append("")
+    
+    for heading, key in (("EDGE CASES", 'edge_cases'), ("MISSING INFORMATION", 'missing_information')):
+        items = document.get(key) or []
+        if items:
+            lines += [heading, ""]
+            lines += [f"{number}. {_as_text(entry)}" for number, entry in enumerate(items, 1)]
+            lines.append("")
+    
+    return "\n".join(lines)
+
+# Precompiled patterns of the generated test case formats, shared by every parse.
+# Plain text format: "TC-001 - Title" headers with "- Priority: High" style fields
+_PLAIN_HEADER = re.compile(r'TC-\d+[ \t]*-[ \t]*(\S.*)', re.IGNORECASE)
+_PLAIN_REFERENCE = re.compile(r'TC-\d+', re.IGNORECASE)
+_PLAIN_FIELD = re.compile(r'(Scenario ID|Priority|Automation|Tags):', re.IGNORECASE)
+_PLAIN_PRECONDITIONS = re.compile(r'Preconditions:\s*$', re.IGNORECASE)
+_PLAIN_STEPS = re.compile(r'Test Steps:\s*$', re.IGNORECASE)
+# Markdown format: "### TC-001 – Title" headers, "**Priority:** High" fields and table sections
+_MARKDOWN_HEADER = re.compile(r'###[ \t]*TC-\d+[ \t]*–[ \t]*(\S.*)', re.IGNORECASE)
+_MARKDOWN_REFERENCE = re.compile(r'###[ \t]*TC-\d+', re.IGNORECASE)
+_MARKDOWN_FIELD = re.compile(r'\*\*(Scenario ID|Priority|Automation|Tags):\*\*', re.IGNORECASE)
+_MARKDOWN_PRECONDITIONS = re.compile(r'Preconditions\s*\|\s*$', re.IGNORECASE)
+_MARKDOWN_STEPS = re.compile(r'Test Steps\s*\|\s*$', re.IGNORECASE)
+_TABLE_STEP_ROW = re.compile(r'\s*\|?\s*(\d+)\s*\|\s*(.+?)\s*\|\s*(.+?)\s*\|\s*(.+?)\s*\|\s*(.+?)\s*\|')
+# Lines that close a section: a "Label:" (or "Label |") line, a heading or a top-level output section
+_LABEL_LINE = re.compile(r'\w+:')
+_TABLE_LABEL_LINE = re.compile(r'\w+\s*\|')
+# Top-level sections of the generation output; the test case before them is complete
+_OUTPUT_SECTION = re.compile(r'\s*(?:EDGE CASES|TAG GLOSSARY|TRACEABILITY MATRIX|TEST SCENARIOS|DETAILED TEST CASES|MISSING INFORMATION)\b')
+_SECTION_BREAK = re.compile(r'\s*(?:#{1,6}(?:\s|$)|={3,}\s*$|(?:EDGE CASES|TAG GLOSSARY|TRACEABILITY MATRIX|TEST SCENARIOS|DETAILED TEST CASES|MISSING INFORMATION)\b)')
+_NUMBERED_STEP = re.compile(r'\s*(\d+)\.\s*(.*)')
+_EXPECTED_LINE = re.compile(r'\s*-\s*Expected:\s*(.*)', re.IGNORECASE)
+
+_FIELD_KEYS = {'scenario id': 'scenario_id', 'priority': 'priority', 'automation': 'automation', 'tags': 'tags'}
+_FIELD_DEFAULTS = {'scenario_id': '', 'priority': 'Medium', 'automation': 'No', 'tags': ''}
+
+
+class _TestCaseStateMachine:
+    """
+    Line-oriented parser for one generated test case format (plain text or markdown).
+    Lines are fed one at a time; a test case is returned as soon as the next header
+    (or a reference to another test case) closes its block.
+    """
+    
+    def __init__(self, markdown: bool = False):
+        self.markdown = markdown
+        self._header = _MARKDOWN_HEADER if markdown else _PLAIN_HEADER
+        self._reference = _MARKDOWN_REFERENCE if markdown else _PLAIN_REFERENCE
+        self._field = _MARKDOWN_FIELD if markdown else _PLAIN_FIELD
+        self._preconditions_heading = _MARKDOWN_PRECONDITIONS if markdown else _PLAIN_PRECONDITIONS
+        self._steps_heading = _MARKDOWN_STEPS if markdown else _PLAIN_STEPS
+        self._section_end = _TABLE_LABEL_LINE if markdown else _LABEL_LINE
+        self._title = None
+    
+    def _start_case(self, title: str) -> None:
+        self._title = title
+        self._fields = {}
+        self._pending_fields = []
+        self._section = None
+        self._preconditions = None
+        self._steps = []
+        self._steps_seen = False
+        self._fallback_steps = []
+        self._fallback_closed = False
+    
+    def feed_line(self, line: str) -> Optional[Dict]:
+        """
+        Consume one line of generated output
         
-        for match in tc_matches:
-            title = match.group(1).strip()
-            
-            # Look for the content that follows this TC section
-            start_pos = match.end()
-            # Find the next section or end of text
-            next_section = re.search(r'TC-\d+', text[start_pos:], re.IGNORECASE)
-            if next_section:
-                end_pos = start_pos + next_section.start()
+        Returns:
+            The previous test case if this line closed its block, otherwise None
+        """
+        reference = self._reference.search(line)
+        if not reference:
+            if self._title is None:
+                return None
+            if _OUTPUT_SECTION.match(line):
+                return self.close()
+            self._process_line(line)
+            return None
+        
+        # A block ends at any reference to a test case; only a full header starts a new one
+        finished = None
+        if self._title is not None:
+            self._process_line(line[:reference.start()])
+            finished = self._build_case()
+        header = self._header.search(line, reference.start())
+        if header:
+            self._start_case(header.group(1).strip())
+        else:
+            self._title = None
+        return finished
+    
+    def close(self) -> Optional[Dict]:
+        """Finish parsing and return the last open test case, if any."""
+        finished = self._build_case() if self._title is not None else None
+        self._title = None
+        return finished
+    
+    def _collect_fields(self, line: str) -> None:
+        # A label with nothing after it takes its value from the next non-blank line
+        if self._pending_fields:
+            value = line.strip()
+            if value:
+                for key in self._pending_fields:
+                    self._fields[key] = value
+                self._pending_fields = []
+        
+        if ':' not in line or len(self._fields) + len(self._pending_fields) == len(_FIELD_KEYS):
+            return
+        for match in self._field.finditer(line):
+            key = _FIELD_KEYS[match.group(1).lower()]
+            if key in self._fields or key in self._pending_fields:
+                continue
+            value = line[match.end():].strip()
+            if value:
+                self._fields[key] = value
             else:
-                end_pos = len(text)
-            
-            tc_content = text[start_pos:end_pos]
-            
-            # Extract information from the plain text format
-            steps = []
-            preconditions = ''
-            expected_results = ''
-            automation = 'No'  # Default value
-            priority = 'Medium'  # Default value
-            tags = ''  # Default value
-            scenario_id = ''  # Default value
-            
-            # Extract Scenario ID
-            scenario_match = re.search(r'Scenario ID:\s*([^\n]+)', tc_content, re.IGNORECASE)
-            if scenario_match:
-                scenario_id = scenario_match.group(1).strip()
-            
-            # Extract Priority
-            priority_match = re.search(r'Priority:\s*([^\n]+)', tc_content, re.IGNORECASE)
-            if priority_match:
-                priority = priority_match.group(1).strip()
-            
-            # Extract Automation status
-            automation_match = re.search(r'Automation:\s*([^\n]+)', tc_content, re.IGNORECASE)
-            if automation_match:
-                automation = automation_match.group(1).strip()
-            
-            # Extract Tags
-            tags_match = re.search(r'Tags:\s*([^\n]+)', tc_content, re.IGNORECASE)
-            if tags_match:
-                tags = tags_match.group(1).strip()
-            
-            # Extract preconditions
-            precond_match = re.search(r'Preconditions:\s*\n(.*?)(?=\n\w+:|$)', tc_content, re.IGNORECASE | re.DOTALL)
-            if precond_match:
-                preconditions = precond_match.group(1).strip()
-            
-            # Extract test steps with expected results
-            steps_match = re.search(r'Test Steps:\s*\n(.*?)(?=\n\w+:|$)', tc_content, re.IGNORECASE | re.DOTALL)
-            if steps_match:
-                steps_text = steps_match.group(1)
-                
-                # Parse numbered steps with expected results in the format:
-                # 1. [Action/Step]
-                #    - Expected: [Expected result]
-                step_pattern = r'(\d+)\.\s*(.+?)(?=\n\s*-\s*Expected:|\n\d+\.|\n\w+:|$)'
-                expected_pattern = r'-\s*Expected:\s*(.+?)(?=\n\d+\.|\n\w+:|$)'
-                
-                step_matches = list(re.finditer(step_pattern, steps_text, re.DOTALL))
-                expected_matches = list(re.finditer(expected_pattern, steps_text, re.DOTALL))
-                
-                for i, step_match in enumerate(step_matches):
-                    step_content = step_match.group(2).strip()
-                    expected = ''
-                    
-                    # Find corresponding expected result
-                    if i < len(expected_matches):
-                        expected = expected_matches[i].group(1).strip()
-                    
-                    steps.append({
-                        'content': step_content,
-                        'expected': expected
-                    })
-            
-            # If no structured steps found, try alternative patterns
-            if not steps:
-                # Look for simple numbered steps (without expected results)
-                simple_step_pattern = r'(\d+)\.\s*(.+?)(?=\n\d+\.|\n\w+:|$)'
-                simple_matches = re.findall(simple_step_pattern, tc_content, re.DOTALL)
-                for step_num, step_content in simple_matches:
-                    steps.append({'content': step_content.strip(), 'expected': ''})
-                
-                # Also try to find any remaining numbered steps in the entire content
-                if not steps:
-                    remaining_step_pattern = r'(\d+)\.\s*(.+?)(?=\n\d+\.|\n\w+:|$)'
-                    remaining_matches = re.findall(remaining_step_pattern, tc_content, re.DOTALL)
-                    for step_num, step_content in remaining_matches:
-                        steps.append({'content': step_content.strip(), 'expected': ''})
-            
-            # Create test case structure with all extracted fields
-            test_case = {
-                'title': title,
-                'steps': steps if steps else [{'content': 'Test case steps not found', 'expected': ''}],
-                'preconditions': preconditions,
-                'expected_results': expected_results,
-                'automation': automation,
-                'priority': priority,
-                'tags': tags,
-                'scenario_id': scenario_id
-            }
-            
-            test_cases.append(test_case)
+                self._pending_fields.append(key)
     
-    # If no plain text format found, try the markdown format
-    if not test_cases:
-        # Look for markdown format
-        tc_pattern = r'###\s*TC-\d+\s*–\s*(.+?)(?=\n|$)'
-        tc_matches = list(re.finditer(tc_pattern, text, re.IGNORECASE | re.DOTALL))
+    def _process_line(self, line: str) -> None:
+        self._collect_fields(line)
         
-        if tc_matches:
-            format_detected = "Markdown format"
-            st.info(f"🔍 Detected {len(tc_matches)} test cases in markdown format")
-            
-            for match in tc_matches:
-                title = match.group(1).strip()
-                
-                # Look for the content that follows this TC section
-                start_pos = match.end()
-                # Find the next section or end of text
-                next_section = re.search(r'###\s*TC-\d+', text[start_pos:], re.IGNORECASE)
-                if next_section:
-                    end_pos = start_pos + next_section.start()
-                else:
-                    end_pos = len(text)
-                
-                tc_content = text[start_pos:end_pos]
-                
-                # Extract information from markdown format
-                steps = []
-                preconditions = ''
-                expected_results = ''
-                automation = 'No'  # Default value
-                priority = 'Medium'  # Default value
-                tags = ''  # Default value
-                scenario_id = ''  # Default value
-                
-                # Extract Scenario ID
-                scenario_match = re.search(r'\*\*Scenario ID:\*\*\s*([^\n]+)', tc_content, re.IGNORECASE)
-                if scenario_match:
-                    scenario_id = scenario_match.group(1).strip()
-                
-                # Extract Priority
-                priority_match = re.search(r'\*\*Priority:\*\*\s*([^\n]+)', tc_content, re.IGNORECASE)
-                if priority_match:
-                    priority = priority_match.group(1).strip()
-                
-                # Extract Automation status
-                automation_match = re.search(r'\*\*Automation:\*\*\s*([^\n]+)', tc_content, re.IGNORECASE)
-                if automation_match:
-                    automation = automation_match.group(1).strip()
-                
-                # Extract Tags
-                tags_match = re.search(r'\*\*Tags:\*\*\s*([^\n]+)', tc_content, re.IGNORECASE)
-                if tags_match:
-                    tags = tags_match.group(1).strip()
-                
-                # Extract preconditions from markdown table
-                precond_match = re.search(r'Preconditions\s*\|\s*\n(.*?)(?=\n\w+\s*\|)', tc_content, re.IGNORECASE | re.DOTALL)
-                if precond_match:
-                    preconditions = precond_match.group(1).strip()
-                
-                # Extract test steps from markdown table
-                steps_match = re.search(r'Test Steps\s*\|\s*\n(.*?)(?=\n\w+\s*\|)', tc_content, re.IGNORECASE | re.DOTALL)
-                if steps_match:
-                    steps_text = steps_match.group(1)
-                    # Parse table rows
-                    row_pattern = r'(\d+)\s*\|\s*(.+?)\s*\|\s*(.+?)\s*\|\s*(.+?)\s*\|\s*(.+?)\s*\|'
-                    row_matches = re.findall(row_pattern, steps_text, re.DOTALL)
-                    
-                    for row in row_matches:
-                        step_num, action, expected, actual, status = row
-                        steps.append({
-                            'content': action.strip(),
-                            'expected': expected.strip()
-                        })
-                
-                # Create test case structure with all extracted fields
-                test_case = {
-                    'title': title,
-                    'steps': steps if steps else [{'content': 'Test case steps not found', 'expected': ''}],
-                    'preconditions': preconditions,
-                    'expected_results': expected_results,
-                    'automation': automation,
-                    'priority': priority,
-                    'tags': tags,
-                    'scenario_id': scenario_id
-                }
-                
-                test_cases.append(test_case)
+        if self._section == 'preconditions':
+            if not self._steps_seen and self._steps_heading.search(line):
+                self._section = 'steps'
+                self._steps_seen = True
+            elif self._section_end.match(line) or _SECTION_BREAK.match(line):
+                self._section = None
+            else:
+                self._preconditions.append(line)
+            return
+        
+        if self._section == 'steps':
+            if self.markdown:
+                row = _TABLE_STEP_ROW.match(line)
+                if row:
+                    self._steps.append({'content': [row.group(2)], 'expected': [row.group(3)]})
+                elif self._section_end.match(line) or _SECTION_BREAK.match(line):
+                    self._section = None
+            elif self._section_end.match(line) or _SECTION_BREAK.match(line):
+                self._section = None
+            else:
+                self._add_step_line(line, self._steps)
+            return
+        
+        if self._preconditions is None and self._preconditions_heading.search(line):
+            self._section = 'preconditions'
+            self._preconditions = []
+        elif not self._steps_seen and self._steps_heading.search(line):
+            self._section = 'steps'
+            self._steps_seen = True
+        elif not self.markdown and not self._fallback_closed:
+            # Numbered lines outside a Test Steps section are used when the section is missing
+            if _SECTION_BREAK.match(line):
+                self._fallback_closed = True
+            else:
+                self._add_step_line(line, self._fallback_steps)
+    
+    @staticmethod
+    def _add_step_line(line: str, steps: List[Dict]) -> None:
+        numbered = _NUMBERED_STEP.match(line)
+        if numbered:
+            steps.append({'content': [numbered.group(2)], 'expected': None})
+            return
+        if not steps:
+            return
+        current = steps[-1]
+        if current['expected'] is None:
+            expected = _EXPECTED_LINE.match(line)
+            if expected:
+                current['expected'] = [expected.group(1)]
+                return
+            current['content'].append(line)
+        else:
+            current['expected'].append(line)
     
-    # If still no test cases found, try legacy format
-    if not test_cases:
-        format_detected = "Legacy format"
-        st.info("🔍 Trying legacy format extraction")
+    def _build_case(self) -> Dict:
+        steps = [
+            {
+                'content': '\n'.join(step['content']).strip(),
+                'expected': '\n'.join(step['expected']).strip() if step['expected'] else ''
+            }
+            for step in (self._steps or self._fallback_steps)
+        ]
+        test_case = {
+            'title': self._title,
+            'steps': steps if steps else [{'content': 'Test case steps not found', 'expected': ''}],
+            'preconditions': '\n'.join(self._preconditions).strip() if self._preconditions else '',
+            'expected_results': ''
+        }
+        for key in ('automation', 'priority', 'tags', 'scenario_id'):
+            test_case[key] = self._fields.get(key, _FIELD_DEFAULTS[key])
+        return test_case
+
+
+def _extract_legacy_format_test_cases(lines: List[str]) -> List[Dict]:
+    """Extract test cases from the oldest "TC-... - Title" format with up to five numbered steps."""
+    test_cases = []
+    current_case = None
+    
+    for line in lines:
+        line = line.strip()
+        if line.startswith('TC-') and '-' in line:
+            if current_case:
+                test_cases.append(current_case)
+            current_case = {
+                'title': line.split('-', 1)[1].strip(),
+                'steps': [],
+                'preconditions': '',
+                'expected_results': '',
+                'automation': 'No',
+                'priority': 'Medium',
+                'tags': '',
+                'scenario_id': ''
+            }
+        elif current_case and line.startswith(('1.', '2.', '3.', '4.', '5.')):
+            current_case['steps'].append({'content': line.split('.', 1)[1].strip(), 'expected': ''})
+    
+    if current_case:
+        test_cases.append(current_case)
+    return test_cases
+
+class IncrementalTestCaseParser:
+    """
+    Parses the test case generation output while it streams.
+    Each test case is returned as soon as its block is closed by the next header or by the
+    section that follows the test cases, so it can be used before generation finishes.
+    The format is decided by the first test case header in the stream.
+    """
+    
+    def __init__(self):
+        self._buffer = ''
+        self._chunks = []
+        self._parser = None
+        self.test_cases = []
+    
+    def feed(self, chunk: str) -> List[Dict]:
+        """
+        Consume one streamed chunk
         
-        # Simple extraction for legacy format
-        lines = text.split('\n')
-        current_case = None
+        Args:
+            chunk: Next piece of the generated text
         
+        Returns:
+            Test cases completed by this chunk (usually none or one)
+        """
+        self._chunks.append(chunk)
+        lines = (self._buffer + chunk).split('\n')
+        # The last line may still be incomplete
+        self._buffer = lines.pop()
+        completed = []
         for line in lines:
-            line = line.strip()
-            if line.startswith('TC-') and '-' in line:
-                if current_case:
-                    test_cases.append(current_case)
-                
-                # Extract title
-                title = line.split('-', 1)[1].strip()
-                current_case = {
-                    'title': title,
-                    'steps': [],
-                    'preconditions': '',
-                    'expected_results': '',
-                    'automation': 'No',
-                    'priority': 'Medium',
-                    'tags': '',
-                    'scenario_id': ''
-                }
-            elif current_case and line.startswith(('1.', '2.', '3.', '4.', '5.')):
-                step_content = line.split('.', 1)[1].strip()
-                current_case['steps'].append({'content': step_content, 'expected': ''})
+            test_case = self._feed_line(line)
+            if test_case:
+                completed.append(test_case)
+        self.test_cases.extend(completed)
+        return completed
+    
+    def close(self) -> List[Dict]:
+        """
+        Finish parsing once the stream has ended
         
-        if current_case:
-            test_cases.append(current_case)
+        Returns:
+            The remaining test cases (the last one, or all of them for the legacy format)
+        """
+        completed = []
+        if self._buffer:
+            test_case = self._feed_line(self._buffer)
+            if test_case:
+                completed.append(test_case)
+            self._buffer = ''
+        if self._parser:
+            test_case = self._parser.close()
+            if test_case:
+                completed.append(test_case)
+        elif not self.test_cases:
+            # No TC-### header was streamed: the legacy format can only be parsed as a whole
+            completed = _extract_legacy_format_test_cases(''.join(self._chunks).split('\n'))
+        self.test_cases.extend(completed)
+        return completed
     
-    st.info(f"🔍 Extracted {len(test_cases)} test cases using {format_detected}")
+    def _feed_line(self, line: str) -> Optional[Dict]:
+        if self._parser is None:
+            if _PLAIN_HEADER.search(line):
+                self._parser = _TestCaseStateMachine(markdown=False)
+            elif _MARKDOWN_HEADER.search(line):
+                self._parser = _TestCaseStateMachine(markdown=True)
+            else:
+                return None
+        return self._parser.feed_line(line)
+
+def extract_test_case_info(text: str) -> List[Dict]:
+    """
+    Extract test case information from AI-generated text in a single pass over its lines.
     
-    # Debug: Show automation status for first few cases
-    for i, case in enumerate(test_cases[:3]):
-        st.info(f"🔍 Case {i+1}: Automation = '{case.get('automation', 'N/A')}', Priority = '{case.get('priority', 'N/A')}'")
+    Supports the plain text "TC-### - Title" format, the markdown "### TC-### – Title"
+    table format and the legacy format, tried in that order.
     
+    Args:
+        text: Output of the test case generation chain
+    
+    Returns:
+        List of test case dictionaries (title, steps, preconditions, expected_results,
+        automation, priority, tags, scenario_id)
+    """
+    lines = text.split('\n')
+    if _PLAIN_HEADER.search(text):
+        parser = _TestCaseStateMachine(markdown=False)
+        format_detected = "Plain text TC-### format"
+    elif _MARKDOWN_HEADER.search(text):
+        parser = _TestCaseStateMachine(markdown=True)
+        format_detected = "Markdown format"
+    else:
+        test_cases = _extract_legacy_format_test_cases(lines)
+        print(f"Extracted {len(test_cases)} test cases using Legacy format")
+        return test_cases
+    
+    test_cases = []
+    for line in lines:
+        test_case = parser.feed_line(line)
+        if test_case:
+            test_cases.append(test_case)
+    test_case = parser.close()
+    if test_case:
+        test_cases.append(test_case)
+    
+    print(f"Extracted {len(test_cases)} test cases using {format_detected}")
     return test_cases
 
+def _get_existing_case_text(existing_case) -> Tuple[str, str]:
+    """Get the lowercased title and step text of an existing TestRail case for similarity scoring."""
+    # Handle both dictionary and string cases
+    if not isinstance(existing_case, dict):
+        # If existing_case is a string, use it as title
+        return str(existing_case).lower(), ''
+    
+    existing_title = existing_case.get('title', '').lower()
+    existing_steps = ''
+    
+    # Extract steps from existing case with null checks
+    custom_steps = existing_case.get('custom_steps_separated')
+    if custom_steps and isinstance(custom_steps, list):
+        for step in custom_steps:
+            if isinstance(step, dict):
+                step_content = step.get('content', '')
+                if step_content:
+                    existing_steps += ' ' + step_content.lower()
+            elif isinstance(step, str):
+                existing_steps += ' ' + step.lower()
+    
+    # Also check for other step-related fields
+    if not existing_steps:
+        # Try alternative step fields
+        for field in ['steps', 'test_steps', 'actions']:
+            steps_data = existing_case.get(field)
+            if steps_data:
+                if isinstance(steps_data, list):
+                    for step in steps_data:
+                        if isinstance(step, dict):
+                            step_content = step.get('content', step.get('action', ''))
+                            if step_content:
+                                existing_steps += ' ' + step_content.lower()
+                        elif isinstance(step, str):
+                            existing_steps += ' ' + step.lower()
+                elif isinstance(steps_data, str):
+                    existing_steps += ' ' + steps_data.lower()
+                break
+    
+    return existing_title, existing_steps
+
+def prepare_existing_cases(existing_cases: List[Dict]) -> List[Tuple[Dict, str, str]]:
+    """Extract the title and step text of every existing case once, for repeated find_similar_for_case calls."""
+    return [(case, *_get_existing_case_text(case)) for case in existing_cases]
+
+def find_similar_for_case(gen_case: Dict, prepared_cases: List[Tuple[Dict, str, str]],
+                          similarity_threshold: float = 0.5, max_results: int = 5) -> List[Tuple[Dict, Dict, float]]:
+    """
+    Find existing test cases similar to a single generated case, without UI output.
+    Used to match test cases one by one while they are still being generated.
+    
+    Args:
+        gen_case: Generated test case dictionary
+        prepared_cases: Output of prepare_existing_cases
+        similarity_threshold: Minimum combined similarity score
+        max_results: Maximum matches to return
+    
+    Returns:
+        List of (generated case, existing case, similarity) sorted by similarity
+    """
+    gen_title = gen_case['title'].lower()
+    gen_steps = ' '.join([step['content'] for step in gen_case['steps']]).lower()
+    
+    matches = []
+    for existing_case, existing_title, existing_steps in prepared_cases:
+        title_similarity = _calculate_similarity(gen_title, existing_title)
+        if title_similarity < 0.1:
+            continue
+        combined_similarity = (title_similarity * 0.6) + (_calculate_similarity(gen_steps, existing_steps) * 0.4)
+        if combined_similarity >= similarity_threshold:
+            matches.append((gen_case, existing_case, combined_similarity))
+    
+    matches.sort(key=lambda x: x[2], reverse=True)
+    return matches[:max_results]
+
 def find_similar_test_cases(generated_cases: List[Dict], existing_cases: List[Dict], 
                           similarity_threshold: float = 0.7, user_story_key: str = None,
                           cm_modules: str = None, cm_product_area: str = None) -> List[Tuple[Dict, Dict, float]]:
@@ -619,43 +964,7 @@ def find_similar_test_cases(generated_cases: List[Dict], existing_cases: List[Di
         
         for j, existing_case in enumerate(remaining_cases):
             try:
-                # Handle both dictionary and string cases
-                if isinstance(existing_case, dict):
-                    existing_title = existing_case.get('title', '').lower()
-                    existing_steps = ''
-                    
-                    # Extract steps from existing case with null checks
-                    custom_steps = existing_case.get('custom_steps_separated')
-                    if custom_steps and isinstance(custom_steps, list):
-                        for step in custom_steps:
-                            if isinstance(step, dict):
-                                step_content = step.get('content', '')
-                                if step_content:
-                                    existing_steps += ' ' + step_content.lower()
-                            elif isinstance(step, str):
-                                existing_steps += ' ' + step.lower()
-                    
-                    # Also check for other step-related fields
-                    if not existing_steps:
-                        # Try alternative step fields
-                        for field in ['steps', 'test_steps', 'actions']:
-                            steps_data = existing_case.get(field)
-                            if steps_data:
-                                if isinstance(steps_data, list):
-                                    for step in steps_data:
-                                        if isinstance(step, dict):
-                                            step_content = step.get('content', step.get('action', ''))
-                                            if step_content:
-                                                existing_steps += ' ' + step_content.lower()
-                                        elif isinstance(step, str):
-                                            existing_steps += ' ' + step.lower()
-                                elif isinstance(steps_data, str):
-                                    existing_steps += ' ' + steps_data.lower()
-                                break
-                else:
-                    # If existing_case is a string, use it as title
-                    existing_title = str(existing_case).lower()
-                    existing_steps = ''
+                existing_title, existing_steps = _get_existing_case_text(existing_case)
                 
                 # Calculate similarity scores
                 title_similarity = _calculate_similarity(gen_title, existing_title)
@@ -4,11 +4,12 @@ from jira_client import JiraClient
 from testrail_client import TestRailClient
 from config import setup_llm, get_jira_project_key_us, get_jira_project_key_bug, validate_testrail_config
 from services.llm_chains import setup_llm_chains
+from services.cache_manager import CacheManager
 import os # For os.getenv if needed globally or for checks
 
 # --- Global Initialization (once per app run) ---
 llm = setup_llm()
-user_story_analysis_chain, test_case_generation_chain, test_automation_chain, bug_improvement_chain, user_story_review_chain, enhancement_story_review_chain = setup_llm_chains(llm)
+user_story_analysis_chain, test_case_generation_chain, test_automation_chain, bug_improvement_chain, user_story_review_chain, enhancement_story_review_chain, test_case_generation_json_chain = setup_llm_chains(llm)
 
 jira_client = None
 try:
@@ -59,6 +60,8 @@ if 'user_story_review_chain' not in st.session_state:
     st.session_state['user_story_review_chain'] = user_story_review_chain
 if 'enhancement_story_review_chain' not in st.session_state:
     st.session_state['enhancement_story_review_chain'] = enhancement_story_review_chain
+if 'test_case_generation_json_chain' not in st.session_state:
+    st.session_state['test_case_generation_json_chain'] = test_case_generation_json_chain
 
 # --- Streamlit UI ---
 st.set_page_config(
@@ -95,11 +98,14 @@ if testrail_client is None or testrail_missing_vars:
 if jira_client and jira_project_key_us:
     st.subheader("📋 Global Jira Stories Management")
     
+    story_jql_query = JiraClient.story_jql_for_project(jira_project_key_us)
+
     col1, col2, col3 = st.columns(3)
     with col1:
         # Show current status
         if 'existing_stories' in st.session_state and st.session_state['existing_stories']:
             st.success(f"✅ {len(st.session_state['existing_stories'])} user stories loaded and ready for use across all pages")
+            st.caption(f"🕒 {CacheManager.format_data_age(CacheManager.get_jira_data_age('jira_stories', story_jql_query))}")
             
             # Show a few sample stories
             with st.expander("📄 Sample Stories (click to view all)"):
@@ -113,9 +119,7 @@ if jira_client and jira_project_key_us:
     with col2:
         if st.button("🔄 Fetch User Stories from Jira", key="global_fetch_stories", type="primary"):
             with st.spinner("Retrieving Jira user stories..."):
-                existing_stories = jira_client.get_user_stories(
-                    jql_query=f"project = {jira_project_key_us} AND type = 'Story' AND created >= -52w AND \"cm groups[checkboxes]\" IN (BE, FE) ORDER BY created DESC"
-                )
+                existing_stories = jira_client.get_user_stories(jql_query=story_jql_query)
                 if existing_stories:
                     st.session_state['existing_stories'] = existing_stories
                     st.session_state['stories_fetched_at'] = time.time()